@@ -2,14 +2,22 @@ import requests
 import logging
 from typing import Dict, Optional
 
+from .pagination import PageIterator
+from .rate_limiter import PRIORITY_WRITE
+from .response_cache import ResponseCache
+from .session import GraphSession, get_shared_session
+
 class MetaAPI:
     """Meta Graph API wrapper with error handling"""
     
-    def __init__(self, access_token: str, ad_account_id: str):
+    def __init__(self, access_token: str, ad_account_id: str, session: GraphSession = None,
+                 cache: ResponseCache = None):
         self.access_token = access_token
         self.ad_account_id = ad_account_id
         self.base_url = "https://graph.facebook.com/v17.0"
         self.logger = logging.getLogger('MetaAPI')
+        self.session = session or get_shared_session()
+        self.cache = cache
         
     def _make_request(self, endpoint: str, method: str = 'GET', params: Dict = None) -> Optional[Dict]:
         """Make API request with error handling"""
@@ -22,11 +30,18 @@ class MetaAPI:
         if params:
             default_params.update(params)
             
+        return self._request_url(url, method, default_params)
+    
+    def _request_url(self, url: str, method: str = 'GET', params: Dict = None) -> Optional[Dict]:
+        """Request an absolute Graph URL, e.g. a paging.next cursor link"""
         try:
-            if method.upper() == 'GET':
-                response = requests.get(url, params=default_params, timeout=30)
+            if method.upper() == 'GET' and self.cache is not None:
+                return self.cache.get_json(
+                    url, params, lambda send_params, headers: self.session.get(url, params=send_params, headers=headers))
+            elif method.upper() == 'GET':
+                response = self.session.get(url, params=params)
             else:
-                response = requests.post(url, data=default_params, timeout=30)
+                response = self.session.post(url, data=params, priority=PRIORITY_WRITE)
                 
             response.raise_for_status()
             return response.json()
@@ -35,6 +50,20 @@ class MetaAPI:
             self.logger.error(f"API request failed: {e}")
             return None
     
+    def iter_pages(self, endpoint: str, params: Dict = None, page_size: int = 500,
+                   prefetch: bool = False) -> PageIterator:
+        """Stream every page of an edge, following paging cursors"""
+        default_params = {
+            'access_token': self.access_token,
+            'limit': page_size
+        }
+        
+        if params:
+            default_params.update(params)
+            
+        return PageIterator(lambda url, page_params: self._request_url(url, 'GET', page_params),
+                            f"{self.base_url}/{endpoint}", default_params, prefetch)
+    
     def test_connection(self) -> bool:
         """Test API connection"""
         result = self._make_request(f"{self.ad_account_id}/campaigns", params={'limit': 1})
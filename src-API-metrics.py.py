@@ -0,0 +1,351 @@
+import functools
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def endpoint_label(url: str) -> str:
+    """Graph path with ids replaced, so every campaign shares one series"""
+    parts = [p for p in urlparse(url).path.split('/') if p]
+    if parts and parts[0].startswith('v') and parts[0][1:].replace('.', '').isdigit():
+        parts = parts[1:]
+    labelled = [':account' if p.startswith('act_') else ':id' if p.isdigit() else p for p in parts]
+    return '/' + '/'.join(labelled)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _NullTimer:
+    """Shared no-op context manager handed out while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Counter:
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in values]
+
+
+class Histogram:
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        self._observe(_label_key(labels), value)
+
+    def _observe(self, key: LabelKey, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[index] += 1
+            row[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the time spent inside it"""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return self._timer(_label_key(labels))
+
+    @contextmanager
+    def _timer(self, key: LabelKey) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._observe(key, time.perf_counter() - started)
+
+    def timed(self, **labels):
+        """Decorator form of time()"""
+        key = _label_key(labels)
+
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.registry.enabled:
+                    return fn(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._observe(key, time.perf_counter() - started)
+            return wrapper
+        return decorate
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(row)) for key, row in self._values.items())
+        lines = []
+        for key, row in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', repr(bound)),))} {cumulative}")
+            cumulative += row[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Callback:
+    """Values read from the instrumented objects at scrape time only"""
+
+    def __init__(self, name: str, help_text: str, kind: str):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self._sources: Dict[LabelKey, Callable[[], Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, fn: Callable[[], Optional[float]], labels: Dict[str, str]):
+        with self._lock:
+            self._sources[_label_key(labels)] = fn
+
+    def render(self) -> List[str]:
+        with self._lock:
+            sources = sorted(self._sources.items(), key=lambda item: item[0])
+        lines = []
+        for key, fn in sources:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide counters, histograms and scrape-time callbacks
+
+    Disabled by default: inc(), observe() and timers return after one
+    attribute check, so instrumented hot paths cost next to nothing until
+    configure_metrics() turns them on. render() produces the Prometheus
+    text exposition format.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(self, name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(self, name, help_text, buckets))
+
+    def callback(self, name: str, help_text: str, fn: Callable[[], Optional[float]],
+                 kind: str = 'gauge', **labels):
+        """Report fn() under name and labels; a second fn for the same labels replaces the first"""
+        metric = self._get_or_create(name, lambda: Callback(name, help_text, kind))
+        metric.add(fn, labels)
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, metric in metrics:
+            kind = metric.kind if isinstance(metric, Callback) else \
+                'counter' if isinstance(metric, Counter) else 'histogram'
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+GRAPH_REQUEST_SECONDS = REGISTRY.histogram(
+    'vortex_graph_request_seconds', 'Graph API request latency by endpoint, one observation per HTTP attempt')
+GRAPH_REQUESTS = REGISTRY.counter(
+    'vortex_graph_requests_total', 'Graph API HTTP attempts by endpoint, method and status')
+
+
+class Span:
+    __slots__ = ('name', 'started', 'duration', 'children', 'attributes')
+
+    def __init__(self, name: str, attributes: Dict):
+        self.name = name
+        self.started = time.time()
+        self.duration = 0.0
+        self.children: List['Span'] = []
+        self.attributes = attributes
+
+    def as_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'start': self.started,
+            'duration_ms': self.duration * 1000,
+            'attributes': self.attributes,
+            'children': [child.as_dict() for child in self.children]
+        }
+
+
+class Tracer:
+    """Optional per-scan span trees, one JSON line per finished root span
+
+    Spans nest per thread; a span opened on a worker thread starts its own
+    tree. Disabled, span() hands out a shared no-op context manager.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = 'logs/traces.jsonl'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._span(name, attributes)
+
+    @contextmanager
+    def _span(self, name: str, attributes: Dict) -> Iterator[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = Span(name, attributes)
+        if stack:
+            stack[-1].children.append(span)
+        stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - started
+            stack.pop()
+            if not stack:
+                self._write(span)
+
+    def _write(self, span: Span):
+        line = json.dumps(span.as_dict(), separators=(',', ':'))
+        try:
+            with self._lock, open(self.path, 'a') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            logging.getLogger('Tracer').error(f"Could not write trace to {self.path}: {e}")
+
+
+TRACER = Tracer()
+
+
+class MetricsServer:
+    """Local HTTP endpoint serving REGISTRY for Prometheus to scrape"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = '127.0.0.1', port: int = 9464,
+                 path: str = '/metrics'):
+        self.registry = registry
+        self.path = path
+        self.logger = logging.getLogger('MetricsServer')
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-http', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Serving metrics on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if urlparse(self.path).path != server.path:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                payload = server.registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def configure_metrics(config: Dict = None) -> Optional[MetricsServer]:
+    """Apply the metrics: config section; returns the started server when enabled"""
+    config = config or {}
+    REGISTRY.enabled = config.get('enabled', False)
+    TRACER.enabled = config.get('tracing', False)
+    TRACER.path = config.get('trace_file', TRACER.path)
+    if not REGISTRY.enabled:
+        return None
+    return MetricsServer(REGISTRY, config.get('host', '127.0.0.1'), config.get('port', 9464),
+                         config.get('path', '/metrics')).start()
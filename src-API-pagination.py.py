@@ -0,0 +1,68 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+# fetch(url, params) -> parsed JSON page, or None on failure
+PageFetcher = Callable[[str, Optional[Dict]], Optional[Dict]]
+
+
+class PageIterator:
+    """Streams a Graph API edge page by page, following paging.next cursors
+
+    Only the current page (plus the prefetched one, if enabled) is held in
+    memory. `failed` is set when a page could not be fetched, so callers can
+    tell a short result from a truncated one.
+    """
+
+    def __init__(self, fetch: PageFetcher, url: str, params: Dict = None, prefetch: bool = False):
+        self.fetch = fetch
+        self.url = url
+        self.params = params
+        self.prefetch = prefetch
+        self.pages = 0
+        self.failed = False
+        self.logger = logging.getLogger('PageIterator')
+
+    def __iter__(self) -> Iterator[List[Dict]]:
+        if self.prefetch:
+            return self._iter_prefetched()
+        return self._iter_sequential()
+
+    def records(self) -> Iterator[Dict]:
+        """Iterate over individual records instead of pages"""
+        for page in self:
+            yield from page
+
+    def _next_url(self, page: Dict) -> Optional[str]:
+        return (page.get('paging') or {}).get('next')
+
+    def _fetch(self, url: str, params: Optional[Dict]) -> Optional[Dict]:
+        page = self.fetch(url, params)
+        if page is None:
+            self.failed = True
+            self.logger.error(f"Pagination stopped after {self.pages} pages of {self.url}")
+        return page
+
+    def _iter_sequential(self) -> Iterator[List[Dict]]:
+        url, params = self.url, self.params
+        while url:
+            page = self._fetch(url, params)
+            if page is None:
+                return
+            self.pages += 1
+            # paging.next already carries every query parameter
+            url, params = self._next_url(page), None
+            yield page.get('data', [])
+
+    def _iter_prefetched(self) -> Iterator[List[Dict]]:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-prefetch') as executor:
+            pending = executor.submit(self._fetch, self.url, self.params)
+            while pending is not None:
+                page = pending.result()
+                if page is None:
+                    return
+                self.pages += 1
+                next_url = self._next_url(page)
+                # Start downloading the next page while the caller works on this one
+                pending = executor.submit(self._fetch, next_url, None) if next_url else None
+                yield page.get('data', [])
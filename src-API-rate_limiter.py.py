@@ -0,0 +1,260 @@
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+# Lower value is served first; writes (pauses) never queue behind reads
+PRIORITY_WRITE = 0
+PRIORITY_READ = 10
+
+# Graph error codes that mean "slow down" rather than "bad request"
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80000, 80001, 80002, 80003, 80004, 80005, 80006, 80008, 80009, 80014}
+
+USAGE_HEADERS = ('X-Business-Use-Case-Usage', 'X-Ad-Account-Usage', 'X-App-Usage')
+
+_ACCOUNT_PATH = re.compile(r'/(act_\d+)(?:/|$)')
+
+
+class _Usage:
+    """Latest usage reading and throttle deadline for one counter"""
+
+    __slots__ = ('usage_pct', 'blocked_until')
+
+    def __init__(self):
+        self.usage_pct = 0.0
+        self.blocked_until = 0.0
+
+    def update(self, usage: float, regain_seconds: float):
+        self.usage_pct = usage
+        if regain_seconds:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + regain_seconds)
+
+
+class RateLimitScheduler:
+    """Priority gate and retry policy in front of every Graph request
+
+    Reads the usage headers Graph returns on each response, paces read
+    traffic before the account reaches a throttle, and retries throttled or
+    failed requests with jittered exponential backoff. Write requests skip
+    the pacing and jump the queue for a free slot.
+
+    Usage is tracked per counter the headers describe: the app as a whole,
+    each ad account, and each business id in X-Business-Use-Case-Usage. A
+    request is paced by the app counter plus those of its own account, so
+    tenants sharing the scheduler never slow down, or hide, one another.
+    Requests to object ids carry no account in the URL; they are keyed by
+    the account last seen with the same access token.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.logger = logging.getLogger('RateLimitScheduler')
+        self.max_retries = config.get('max_retries', 3)
+        self.retry_delay = config.get('retry_delay', 60)
+        self.max_backoff = config.get('max_backoff', 300)
+        self.max_in_flight = config.get('max_in_flight', 10)
+        # Start slowing reads once any usage counter passes this percentage
+        self.slowdown_at = config.get('usage_slowdown_pct', 75)
+        self.max_pace_delay = config.get('max_pace_delay', 30)
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+
+        self._app = _Usage()
+        # pacing key (ad account, or token hash until its account is known) -> usage
+        self._accounts: Dict[str, _Usage] = {}
+        self._businesses: Dict[str, _Usage] = {}
+        self._account_businesses: Dict[str, Set[str]] = {}
+        self._token_accounts: Dict[str, str] = {}
+        self.throttled_count = 0
+        self.retry_count = 0
+
+    def request_key(self, url: str, params: Optional[Dict] = None) -> Optional[str]:
+        """Pacing key for a request: its ad account, else its token's account"""
+        query = dict(parse_qsl(urlparse(url).query))
+        if isinstance(params, dict):
+            query.update(params)
+        token = query.get('access_token')
+        token_key = 'token:' + hashlib.sha256(str(token).encode()).hexdigest()[:16] if token else None
+        match = _ACCOUNT_PATH.search(urlparse(url).path)
+        with self._cond:
+            if match:
+                if token_key:
+                    self._token_accounts[token_key] = match.group(1)
+                return match.group(1)
+            if token_key:
+                return self._token_accounts.get(token_key, token_key)
+        return None
+
+    def execute(self, send: Callable[[], requests.Response], priority: int = PRIORITY_READ,
+                key: str = None) -> requests.Response:
+        """Run send() under the scheduler, retrying throttled attempts
+
+        key is the request_key() of the request, for per-account pacing.
+        """
+        attempt = 0
+        while True:
+            if priority != PRIORITY_WRITE:
+                self._pace(key)
+
+            self._acquire(priority)
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                response = None
+            finally:
+                self._release()
+
+            if response is not None:
+                self.observe(response, key)
+                if not self._should_retry(response) or attempt >= self.max_retries:
+                    return response
+
+            attempt += 1
+            delay = self._backoff(attempt)
+            with self._cond:
+                self.retry_count += 1
+            self.logger.warning(f"Graph request throttled or failed, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def observe(self, response: requests.Response, key: str = None):
+        """Update the usage counters this response's headers report"""
+        payloads = {}
+        for header in USAGE_HEADERS:
+            raw = response.headers.get(header)
+            if not raw:
+                continue
+            try:
+                payloads[header] = json.loads(raw)
+            except ValueError:
+                continue
+        if not payloads:
+            return
+
+        with self._cond:
+            if 'X-App-Usage' in payloads:
+                self._app.update(*self._parse_usage(payloads['X-App-Usage']))
+            if 'X-Ad-Account-Usage' in payloads and key:
+                self._accounts.setdefault(key, _Usage()).update(*self._parse_usage(payloads['X-Ad-Account-Usage']))
+            business_usage = payloads.get('X-Business-Use-Case-Usage')
+            if isinstance(business_usage, dict):
+                for business_id, records in business_usage.items():
+                    self._businesses.setdefault(business_id, _Usage()).update(
+                        *self._parse_usage({business_id: records}))
+                    if key:
+                        self._account_businesses.setdefault(key, set()).add(business_id)
+
+    def _parse_usage(self, payload: Dict):
+        """Highest usage percentage and regain delay in one usage header"""
+        usage, regain = 0.0, 0.0
+        # X-Business-Use-Case-Usage nests a list of counters per business id
+        records = []
+        for value in payload.values():
+            if isinstance(value, list):
+                records.extend(v for v in value if isinstance(v, dict))
+        records.append(payload)
+
+        for record in records:
+            for key in ('call_count', 'total_cputime', 'total_time', 'acc_id_util_pct'):
+                if isinstance(record.get(key), (int, float)):
+                    usage = max(usage, float(record[key]))
+            # Minutes in the BUC header, seconds in the ad account header
+            if record.get('estimated_time_to_regain_access'):
+                regain = max(regain, float(record['estimated_time_to_regain_access']) * 60)
+            if record.get('reset_time_duration') and usage >= 100:
+                regain = max(regain, float(record['reset_time_duration']))
+        return usage, regain
+
+    def _should_retry(self, response: requests.Response) -> bool:
+        if response.status_code == 429 or response.status_code >= 500:
+            return True
+        if response.status_code < 400:
+            return False
+        try:
+            code = response.json().get('error', {}).get('code')
+        except ValueError:
+            return False
+        if code in THROTTLE_ERROR_CODES:
+            with self._cond:
+                self.throttled_count += 1
+            return True
+        return False
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with equal jitter, capped at max_backoff"""
+        ceiling = min(self.retry_delay * (2 ** (attempt - 1)), self.max_backoff)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def _counters(self, key: Optional[str]) -> List[_Usage]:
+        counters = [self._app]
+        if key is not None:
+            if key in self._accounts:
+                counters.append(self._accounts[key])
+            counters.extend(self._businesses[b] for b in self._account_businesses.get(key, ()))
+        return counters
+
+    def usage(self, key: str = None) -> float:
+        """Highest usage percentage among the counters a request with key is subject to"""
+        with self._cond:
+            return max(c.usage_pct for c in self._counters(key))
+
+    def pace_delay(self, key: str = None) -> float:
+        """Seconds a read should wait given the current usage"""
+        with self._cond:
+            counters = self._counters(key)
+            blocked = max(c.blocked_until for c in counters) - time.monotonic()
+            usage = max(c.usage_pct for c in counters)
+        if blocked > 0:
+            return blocked
+        if usage < self.slowdown_at:
+            return 0.0
+        # Quadratic ramp from 0 at the threshold to max_pace_delay at 100%
+        pressure = min((usage - self.slowdown_at) / max(100 - self.slowdown_at, 1), 1.0)
+        return self.max_pace_delay * pressure * pressure
+
+    def _pace(self, key: Optional[str]):
+        delay = self.pace_delay(key)
+        if delay > 0:
+            self.logger.info(f"Graph usage at {self.usage(key):.0f}% for {key or 'the app'}, "
+                             f"delaying read by {delay:.1f}s")
+            time.sleep(delay)
+
+    def _acquire(self, priority: int):
+        with self._cond:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, entry)
+            while self._waiting[0] != entry or self._in_flight >= self.max_in_flight:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'usage_pct': max(c.usage_pct for c in
+                                 [self._app, *self._accounts.values(), *self._businesses.values()]),
+                'account_usage_pct': {key: c.usage_pct for key, c in self._accounts.items()},
+                'in_flight': self._in_flight,
+                'queued': len(self._waiting),
+                'throttled': self.throttled_count,
+                'retries': self.retry_count
+            }
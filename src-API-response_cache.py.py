@@ -0,0 +1,303 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+if TYPE_CHECKING:  # the firewall package supplies the writer; api never imports it at runtime
+    from firewall.storage import SQLiteWriter
+
+# Query parameters that identify the caller rather than the response. They
+# are left out of the key as sent; the token is keyed by its hash instead, so
+# tenants with different tokens never share a response
+UNKEYED_PARAMS = ('access_token', 'appsecret_proof')
+
+# Seconds a response is served without asking Graph again. Kinds missing
+# here, insights above all, always go to the network uncached. A TTL of 0
+# still stores the response so the next request can be a conditional one.
+DEFAULT_TTLS = {
+    'account': 3600,
+    'object': 300,
+    'campaigns': 0
+}
+
+Sender = Callable[[Optional[Dict], Dict[str, str]], requests.Response]
+
+
+class _Entry:
+    # The body is kept serialized: every caller decodes its own copy, so one
+    # that edits a campaign dict cannot change what the next caller is served
+    __slots__ = ('text', 'etag', 'fetched_at')
+
+    def __init__(self, text: str, etag: Optional[str], fetched_at: float):
+        self.text = text
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+    @property
+    def size(self) -> int:
+        return len(self.text)
+
+    def body(self) -> Dict:
+        return json.loads(self.text)
+
+
+class ResponseCache:
+    """Graph GET responses kept in memory and on disk between requests
+
+    Responses are keyed by URL, query and a hash of the access token, and
+    kept for the TTL of their endpoint kind: the ad account node, any other
+    single object, or an edge such as campaigns. Past the TTL the stored
+    copy is revalidated with If-None-Match when Graph sent an ETag, or by
+    fetching only updated_time for objects that carry one, so unchanged
+    objects cost a small response instead of a full one. The in-memory
+    copy is an LRU bounded by entry count and bytes. Stores are queued on
+    an SQLiteWriter made by writer_factory(path) and reach the file at its
+    next commit, so a restarted process starts warm; without a factory the
+    cache is memory-only.
+    """
+
+    def __init__(self, config: Dict = None, writer_factory: Callable[[str], 'SQLiteWriter'] = None):
+        config = config or {}
+        self.logger = logging.getLogger('ResponseCache')
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(config.get('ttl') or {})
+        self.max_entries = config.get('max_entries', 5000)
+        self.max_bytes = config.get('max_memory_bytes', 32 * 1024 * 1024)
+        self.max_disk_bytes = config.get('max_disk_bytes', 256 * 1024 * 1024)
+        self.path = config.get('path', 'data/graph_cache.db')
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+        # conn only reads; the writer thread owns every write after create_tables
+        self.conn = None
+        self.writer = None
+        self._disk_bytes = 0
+        if self.path and writer_factory is not None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.create_tables()
+            self.writer = writer_factory(self.path)
+
+    def create_tables(self):
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    body TEXT NOT NULL,
+                    etag TEXT,
+                    fetched_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    size INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used)')
+            self.conn.commit()
+            cursor.execute('SELECT COALESCE(SUM(size), 0) FROM response_cache')
+            self._disk_bytes = cursor.fetchone()[0]
+
+    @staticmethod
+    def endpoint_kind(url: str) -> str:
+        """'account', 'object', or the edge name such as 'campaigns' or 'insights'"""
+        parts = [p for p in urlparse(url).path.split('/') if p]
+        # Drop the version prefix, e.g. v17.0
+        if parts and parts[0].startswith('v') and parts[0][1:].replace('.', '').isdigit():
+            parts = parts[1:]
+        if len(parts) == 1:
+            return 'account' if parts[0].startswith('act_') else 'object'
+        return parts[-1] if parts else ''
+
+    @staticmethod
+    def cache_key(url: str, params: Optional[Dict]) -> str:
+        parsed = urlparse(url)
+        query = parse_qsl(parsed.query, keep_blank_values=True)
+        for name, value in (params or {}).items():
+            query.append((name, json.dumps(value) if isinstance(value, (list, dict)) else str(value)))
+        token = next((value for name, value in query if name == 'access_token'), '')
+        query = sorted((name, value) for name, value in query if name not in UNKEYED_PARAMS)
+        caller = hashlib.sha256(token.encode()).hexdigest()[:16] if token else ''
+        return json.dumps([caller, f"{parsed.netloc}{parsed.path}", query], separators=(',', ':'))
+
+    def get_json(self, url: str, params: Optional[Dict], send: Sender, revalidate: bool = False) -> Dict:
+        """Response body for a GET, from the cache where it is still valid
+
+        send(params, headers) performs the request. HTTP errors propagate
+        as requests exceptions, like response.raise_for_status() would.
+        revalidate skips the TTL and always asks Graph whether the stored
+        copy is current, for callers reacting to a change notification.
+        """
+        ttl = self.ttls.get(self.endpoint_kind(url))
+        if ttl is None:
+            response = send(params, {})
+            response.raise_for_status()
+            return response.json()
+
+        key = self.cache_key(url, params)
+        entry = self._lookup(key)
+        now = time.time()
+        if entry is not None and not revalidate and now - entry.fetched_at < ttl:
+            with self._lock:
+                self.hits += 1
+            return entry.body()
+
+        if entry is not None:
+            body = self._revalidate(key, entry, params, send)
+            if body is not None:
+                return body
+
+        response = send(params, {})
+        response.raise_for_status()
+        body = response.json()
+        with self._lock:
+            self.misses += 1
+        self._store(key, body, response.headers.get('ETag'))
+        return body
+
+    def _revalidate(self, key: str, entry: _Entry, params: Optional[Dict], send: Sender) -> Optional[Dict]:
+        """The stored body if Graph confirms it is unchanged, else None"""
+        if entry.etag:
+            response = send(params, {'If-None-Match': entry.etag})
+            if response.status_code != 304:
+                response.raise_for_status()
+                body = response.json()
+                with self._lock:
+                    self.misses += 1
+                self._store(key, body, response.headers.get('ETag'))
+                return body
+        else:
+            stored = entry.body()
+            if 'updated_time' not in stored or 'id' not in stored:
+                return None
+            check_params = dict(params or {})
+            check_params['fields'] = 'updated_time'
+            response = send(check_params, {})
+            response.raise_for_status()
+            if response.json().get('updated_time') != stored['updated_time']:
+                return None
+
+        with self._lock:
+            self.revalidated += 1
+            entry.fetched_at = time.time()
+            self._remember(key, entry)
+        if self.writer is not None:
+            self.writer.execute('UPDATE response_cache SET fetched_at = ?, last_used = ? WHERE cache_key = ?',
+                                (entry.fetched_at, entry.fetched_at, key))
+        return entry.body()
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            if self.conn is None:
+                return None
+            row = self.conn.execute(
+                'SELECT body, etag, fetched_at FROM response_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = _Entry(row[0], row[1], row[2])
+            self._remember(key, entry)
+            return entry
+
+    def _store(self, key: str, body: Dict, etag: Optional[str]):
+        now = time.time()
+        entry = _Entry(json.dumps(body, separators=(',', ':')), etag, now)
+        with self._lock:
+            self._remember(key, entry)
+        if self.writer is not None:
+            self.writer.run(lambda cursor: self._write(cursor, key, entry, now))
+
+    def _write(self, cursor: sqlite3.Cursor, key: str, entry: _Entry, now: float):
+        """Runs on the writer thread"""
+        old = cursor.execute('SELECT size FROM response_cache WHERE cache_key = ?', (key,)).fetchone()
+        cursor.execute('''
+            INSERT OR REPLACE INTO response_cache (cache_key, body, etag, fetched_at, last_used, size)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (key, entry.text, entry.etag, now, now, entry.size))
+        with self._lock:
+            self._disk_bytes += entry.size - (old[0] if old else 0)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._prune_disk(cursor)
+
+    def _remember(self, key: str, entry: _Entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _prune_disk(self, cursor: sqlite3.Cursor):
+        """Drop least recently validated rows until the file is 90% of its cap"""
+        cursor.execute('SELECT cache_key, size FROM response_cache ORDER BY last_used')
+        doomed = []
+        with self._lock:
+            for key, size in cursor.fetchall():
+                if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                    break
+                doomed.append((key,))
+                self._disk_bytes -= size
+        cursor.executemany('DELETE FROM response_cache WHERE cache_key = ?', doomed)
+        self.logger.info(f"Pruned {len(doomed)} cached responses from {self.path}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'memory_bytes': self._bytes,
+                'disk_bytes': self._disk_bytes
+            }
+
+    def close(self):
+        """Write out queued stores and close the file"""
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+_shared_caches: Dict[str, ResponseCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache(config: Dict = None, writer_factory: Callable[[str], 'SQLiteWriter'] = None) -> ResponseCache:
+    """Process-wide ResponseCache per cache file, so tenants share one LRU
+
+    writer_factory is only used by the first caller for a given file.
+    """
+    config = config or {}
+    path = config.get('path', 'data/graph_cache.db')
+    with _shared_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = cache = ResponseCache(config, writer_factory)
+            # Queued stores would otherwise die with the writer's daemon thread
+            atexit.register(cache.close)
+        return _shared_caches[path]
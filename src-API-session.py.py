@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import GRAPH_REQUEST_SECONDS, GRAPH_REQUESTS, REGISTRY, endpoint_label
+from .rate_limiter import PRIORITY_READ, RateLimitScheduler
+
+
+class GraphSession:
+    """Shared, connection-pooled HTTP session for Graph API traffic
+
+    Keeps TCP+TLS connections to graph.facebook.com alive between calls and
+    records the wall time of every request so handshake savings are visible.
+    All requests pass through the RateLimitScheduler.
+    """
+
+    def __init__(self, config: Dict = None, scheduler: RateLimitScheduler = None):
+        config = config or {}
+        self.logger = logging.getLogger('GraphSession')
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.pool_size = config.get('pool_size', 10)
+        self.timeout = (config.get('connect_timeout', 5), config.get('read_timeout', 30))
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=config.get('pool_connections', 4),
+                                   pool_maxsize=self.pool_size)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate' if config.get('compression', True) else 'identity'
+
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=config.get('latency_window', 1000))
+        self.request_count = 0
+
+    def request(self, method: str, url: str, priority: int = PRIORITY_READ, **kwargs) -> requests.Response:
+        """Send a request through the scheduler over the pooled session"""
+        kwargs.setdefault('timeout', self.timeout)
+        key = self.scheduler.request_key(url, kwargs.get('params') or kwargs.get('data'))
+        return self.scheduler.execute(lambda: self._send(method, url, **kwargs), priority, key)
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """One HTTP attempt, timed end to end"""
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.request_count += 1
+                self.latencies.append(elapsed)
+            if REGISTRY.enabled:
+                endpoint = endpoint_label(url)
+                GRAPH_REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=method)
+                GRAPH_REQUESTS.inc(endpoint=endpoint, method=method,
+                                   status=response.status_code if response is not None else 'error')
+
+    def get(self, url: str, params: Dict = None, priority: int = PRIORITY_READ, **kwargs) -> requests.Response:
+        return self.request('GET', url, priority=priority, params=params, **kwargs)
+
+    def post(self, url: str, data: Dict = None, priority: int = PRIORITY_READ, **kwargs) -> requests.Response:
+        return self.request('POST', url, priority=priority, data=data, **kwargs)
+
+    def connections_opened(self) -> int:
+        """TCP connections opened so far across all host pools"""
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def latency_stats(self) -> Dict:
+        """Latency summary over the most recent requests, in milliseconds"""
+        with self._lock:
+            samples = sorted(self.latencies)
+            last = self.latencies[-1] if self.latencies else 0.0
+            total = self.request_count
+
+        stats = {'requests': total, 'connections_opened': self.connections_opened()}
+        if not samples:
+            return stats
+
+        def percentile(p: float) -> float:
+            return samples[min(int(p * len(samples)), len(samples) - 1)] * 1000
+
+        stats.update({
+            'avg_ms': sum(samples) / len(samples) * 1000,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': samples[-1] * 1000,
+            'last_ms': last * 1000
+        })
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+_shared_session: Optional[GraphSession] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_session(config: Dict = None, rate_limit_config: Dict = None) -> GraphSession:
+    """Process-wide GraphSession; the first caller's config sizes the pool
+
+    rate_limit_config is the firewall: section (max_retries, retry_delay and
+    the pacing settings) and only applies when the session is created.
+    """
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = GraphSession(config, RateLimitScheduler(rate_limit_config))
+        return _shared_session
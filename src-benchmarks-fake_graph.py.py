@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Meta Graph API
+
+Serves a synthetic ad account so the firewall can be exercised and timed
+offline. Point a config at it with meta_api.base_url = server.base_url.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+API_VERSION = "v17.0"
+
+
+class FakeAdAccount:
+    """Synthetic ad account with deterministic campaigns and insights"""
+
+    def __init__(self, account_id: str = "act_1000", campaigns: int = 100, seed: int = 7):
+        self.account_id = account_id
+        rng = random.Random(seed)
+        self.campaigns = []
+        self.insights = {}
+        for i in range(campaigns):
+            campaign_id = str(120000000 + i)
+            daily_budget = rng.choice([2000, 5000, 10000, 25000])
+            self.campaigns.append({
+                'id': campaign_id,
+                'name': f"Campaign {i}",
+                'status': 'ACTIVE' if i % 5 else 'PAUSED',
+                'daily_budget': str(daily_budget),
+                'objective': 'OUTCOME_SALES',
+                'updated_time': 0
+            })
+            if i % 5:
+                impressions = rng.randint(1000, 50000)
+                clicks = rng.randint(10, 90)
+                self.insights[campaign_id] = {
+                    'campaign_id': campaign_id,
+                    'spend': f"{rng.uniform(5, daily_budget / 100):.2f}",
+                    'impressions': str(impressions),
+                    'clicks': str(clicks),
+                    'ctr': f"{clicks * 100.0 / impressions:.4f}",
+                    'actions': []
+                }
+        self.paused = set()
+        # Two ad sets and one ad per delivering campaign, and a fixed country
+        # split of its spend; adset_share splits campaign spend between ad sets
+        self.adsets = {
+            campaign_id: [{
+                'id': f"8{campaign_id}{k}",
+                'name': f"Ad set {k} of {campaign_id}",
+                'campaign_id': campaign_id,
+                'status': 'ACTIVE',
+                'daily_budget': str(int(self.campaign(campaign_id)['daily_budget']) // 2),
+                'updated_time': 0
+            } for k in range(2)]
+            for campaign_id in self.insights
+        }
+        self.adset_share = {}
+        self.ads = {
+            campaign_id: [{
+                'id': f"9{campaign_id}",
+                'name': f"Ad for {campaign_id}",
+                'campaign_id': campaign_id,
+                'adset_id': f"8{campaign_id}0",
+                'status': 'ACTIVE',
+                'updated_time': 0,
+                'creative': {'title': 'New collection', 'body': 'Shop the new collection today',
+                             'link_url': 'https://client-domain.com/shop'}
+            }]
+            for campaign_id in self.insights
+        }
+        self.country_split = {'US': 0.7, 'CA': 0.3}
+        # campaign_id -> its own split, overriding country_split
+        self.campaign_country_split: Dict[str, Dict[str, float]] = {}
+
+    def campaign(self, campaign_id: str) -> Dict:
+        return next(c for c in self.campaigns if c['id'] == campaign_id)
+
+    def touch(self, obj: Dict):
+        """Mark an ad set or ad as changed, like an edit in Ads Manager"""
+        obj['updated_time'] = int(time.time())
+
+    def campaign_insights(self, campaign_id: str, fields: List[str]) -> List[Dict]:
+        row = self.insights.get(campaign_id)
+        if row is None:
+            return []
+        return [{k: v for k, v in row.items() if k in fields or k == 'campaign_id'}]
+
+    def adset_insights(self, campaign_id: str) -> List[Dict]:
+        row = self.insights.get(campaign_id)
+        rows = []
+        for adset in self.adsets.get(campaign_id, []):
+            share = self.adset_share.get(adset['id'], 1.0 / len(self.adsets[campaign_id]))
+            rows.append({'adset_id': adset['id'], 'campaign_id': campaign_id,
+                         'spend': f"{float(row['spend']) * share:.2f}"})
+        return rows
+
+    def country_insights(self, campaign_id: str) -> List[Dict]:
+        row = self.insights.get(campaign_id)
+        if row is None:
+            return []
+        return [
+            {'campaign_id': campaign_id, 'country': country, 'spend': f"{float(row['spend']) * share:.2f}"}
+            for country, share in self.campaign_country_split.get(campaign_id, self.country_split).items()
+        ]
+
+
+class FakeGraphServer:
+    """Threaded HTTP server answering the Graph endpoints the firewall uses
+
+    With rate_limit set, at most that many requests are served per
+    rate_window seconds; every response reports the share used in an
+    X-App-Usage header and requests over the limit get Graph's error 17.
+    """
+
+    def __init__(self, account: FakeAdAccount = None, latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, rate_limit: int = None, rate_window: float = 1.0):
+        self.account = account or FakeAdAccount()
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.request_count = 0
+        self.throttled_count = 0
+        self.request_log = []
+        self._window_started = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/{API_VERSION}"
+
+    def start(self) -> "FakeGraphServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counters(self):
+        with self._lock:
+            self.request_count = 0
+            self.throttled_count = 0
+            self.request_log = []
+
+    def _record(self, method: str, path: str):
+        with self._lock:
+            self.request_count += 1
+            self.request_log.append((method, path))
+
+    def _admit(self) -> Optional[int]:
+        """Usage percentage after counting this request, or None when over the limit"""
+        if self.rate_limit is None:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_started >= self.rate_window:
+                self._window_started, self._window_count = now, 0
+            self._window_count += 1
+            if self._window_count > self.rate_limit:
+                self.throttled_count += 1
+                return None
+            return int(self._window_count * 100 / self.rate_limit)
+
+    # -- request routing ---------------------------------------------------
+
+    def paginate(self, path: str, query: Dict[str, str], rows: List[Dict]) -> Dict:
+        """Slice rows by limit/after and attach a cursor link like Graph does"""
+        limit = int(query.get('limit', 25))
+        offset = int(query.get('after', 0))
+        page = {'data': rows[offset:offset + limit]}
+        if offset + limit < len(rows):
+            next_query = dict(query, after=str(offset + limit))
+            page['paging'] = {
+                'cursors': {'after': str(offset + limit)},
+                'next': f"{self.base_url}/{path.strip('/')}?{urlencode(next_query)}"
+            }
+        return page
+
+    def handle_get(self, path: str, query: Dict[str, str]) -> Optional[Dict]:
+        fields = query.get('fields', '').split(',')
+        parts = path.strip('/').split('/')
+        campaign_ids = [c['id'] for c in self.account.campaigns]
+        updated_since = None
+        if 'filtering' in query:
+            # Only the campaign.id and updated_time filters the firewall sends are understood
+            for condition in json.loads(query['filtering']):
+                if condition.get('field') == 'campaign.id':
+                    campaign_ids = [c for c in campaign_ids if c in set(condition['value'])]
+                elif condition.get('field') == 'updated_time':
+                    updated_since = int(condition['value'])
+        if parts[-1] == 'campaigns' and parts[0] == self.account.account_id:
+            return self.paginate(path, query, self.account.campaigns)
+        if parts[-1] == 'ads' and parts[0] == self.account.account_id:
+            rows = [ad for campaign_id in campaign_ids for ad in self.account.ads.get(campaign_id, [])
+                    if updated_since is None or ad['updated_time'] > updated_since]
+            return self.paginate(path, query, rows)
+        if parts[-1] == 'adsets' and parts[0] == self.account.account_id:
+            rows = []
+            for campaign_id in campaign_ids:
+                for adset in self.account.adsets.get(campaign_id, []):
+                    if updated_since is not None and adset['updated_time'] <= updated_since:
+                        continue
+                    row = dict(adset)
+                    if 'ads{' in query.get('fields', '') or 'ads.limit(' in query.get('fields', ''):
+                        row['ads'] = {'data': [ad for ad in self.account.ads.get(campaign_id, [])
+                                               if ad['adset_id'] == adset['id']]}
+                    rows.append(row)
+            return self.paginate(path, query, rows)
+        if parts[-1] == 'insights' and parts[0] == self.account.account_id:
+            rows = []
+            for campaign_id in campaign_ids:
+                if query.get('breakdowns') == 'country':
+                    rows.extend(self.account.country_insights(campaign_id))
+                elif query.get('level') == 'adset':
+                    rows.extend(self.account.adset_insights(campaign_id))
+                else:
+                    rows.extend(self.account.campaign_insights(campaign_id, fields))
+            return self.paginate(path, query, rows)
+        if parts[-1] == 'insights' and len(parts) == 2:
+            return {'data': self.account.campaign_insights(parts[0], fields)}
+        if len(parts) == 1 and parts[0] == self.account.account_id:
+            return {'id': self.account.account_id, 'name': 'Fake account', 'currency': 'USD'}
+        if len(parts) == 1:
+            for campaign in self.account.campaigns:
+                if campaign['id'] == parts[0]:
+                    return dict(campaign)
+        return None
+
+    def handle_post(self, path: str, form: Dict[str, str]) -> Optional[object]:
+        parts = path.strip('/').split('/')
+        if parts == [''] and 'batch' in form:
+            replies = []
+            for sub in json.loads(form['batch']):
+                parsed = urlparse(sub['relative_url'])
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                body = self.handle_get(parsed.path, query)
+                if body is None:
+                    replies.append({'code': 404, 'body': json.dumps({'error': {'message': 'Unknown path'}})})
+                else:
+                    replies.append({'code': 200, 'body': json.dumps(body)})
+            return replies
+        if len(parts) == 1 and form.get('status') == 'PAUSED':
+            self.account.paused.add(parts[0])
+            return {'success': True}
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _split(self):
+                parsed = urlparse(self.path)
+                prefix = f"/{API_VERSION}"
+                path = parsed.path[len(prefix):] if parsed.path.startswith(prefix) else parsed.path
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                return path, query
+
+            def _reply(self, body, usage: Optional[int]):
+                if server.latency:
+                    time.sleep(server.latency)
+                etag = None
+                if usage is None:
+                    payload = json.dumps({'error': {'message': 'User request limit reached', 'code': 17}}).encode()
+                    self.send_response(400)
+                    self.send_header('X-App-Usage', json.dumps({'call_count': 100}))
+                elif body is None:
+                    payload = json.dumps({'error': {'message': 'Unsupported request', 'code': 100}}).encode()
+                    self.send_response(400)
+                else:
+                    payload = json.dumps(body).encode()
+                    etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+                    if self.command == 'GET' and self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                if etag is not None and self.command == 'GET':
+                    self.send_header('ETag', etag)
+                if server.rate_limit is not None and usage is not None:
+                    self.send_header('X-App-Usage', json.dumps({'call_count': usage}))
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                path, query = self._split()
+                server._record('GET', path)
+                usage = server._admit()
+                self._reply(server.handle_get(path, query) if usage is not None else None, usage)
+
+            def do_POST(self):
+                path, query = self._split()
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                form.update(query)
+                server._record('POST', path)
+                usage = server._admit()
+                self._reply(server.handle_post(path, form) if usage is not None else None, usage)
+
+        return Handler
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Per-campaign vs bulk insights fetch against the local fake Graph API
+
+Usage: python src/benchmarks/insights_fetch.py [campaigns] [latency_seconds] [concurrency]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_graph import FakeAdAccount, FakeGraphServer
+from firewall.core import VortexFirewall
+from firewall.monitor import SecurityMonitor
+
+
+def build_config(base_url: str, account_id: str, bulk: bool, concurrency: int = 1) -> dict:
+    return {
+        'meta_api': {'access_token': 'fake-token', 'ad_account_id': account_id, 'base_url': base_url},
+        'firewall': {'monitoring_interval': 300, 'bulk_insights': bulk, 'scan_concurrency': concurrency},
+        'security': {
+            'thresholds': {'spend_spike': 2.0, 'ctr_drop': 0.5, 'suspicious_clicks': 100, 'budget_breach': 1.1},
+            'auto_actions': {'pause_campaign_critical': False}
+        },
+        'logging': {'level': 'WARNING', 'file_path': 'logs/firewall.log'}
+    }
+
+
+def time_scan(server: FakeGraphServer, bulk: bool, concurrency: int = 1) -> dict:
+    firewall = VortexFirewall(build_config(server.base_url, server.account.account_id, bulk, concurrency))
+    monitor = SecurityMonitor(firewall)
+    server.reset_counters()
+    started = time.perf_counter()
+    monitor.run_security_scan()
+    return {'seconds': time.perf_counter() - started, 'requests': server.request_count}
+
+
+def main():
+    campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    os.chdir(tempfile.mkdtemp(prefix='vortex-bench-'))
+    os.makedirs('logs', exist_ok=True)
+
+    with FakeGraphServer(FakeAdAccount(campaigns=campaigns), latency=latency) as server:
+        per_campaign = time_scan(server, bulk=False)
+        concurrent = time_scan(server, bulk=False, concurrency=concurrency)
+        bulk = time_scan(server, bulk=True)
+
+    print(f"Campaigns: {campaigns}, simulated latency: {latency * 1000:.0f} ms")
+    print(f"Per-campaign: {per_campaign['requests']} requests in {per_campaign['seconds']:.2f}s")
+    print(f"Concurrent:   {concurrent['requests']} requests in {concurrent['seconds']:.2f}s "
+          f"({concurrency} workers)")
+    print(f"Bulk:         {bulk['requests']} requests in {bulk['seconds']:.2f}s")
+    if bulk['seconds'] > 0:
+        print(f"Speedup:      {per_campaign['seconds'] / bulk['seconds']:.1f}x bulk, "
+              f"{per_campaign['seconds'] / concurrent['seconds']:.1f}x concurrent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+End-to-end load simulation against the local fake Graph API
+
+Runs VortexFirewall, SecurityMonitor and an AlertPipeline feeding an
+AlertSystem (all channels off) over a synthetic account for a number of
+scans. Spend grows a little every scan; after the warm-up scans anomalies
+are injected into some campaigns: spend spikes, ad copy with a suspicious
+keyword, and spend moving to a disallowed country. The server can add
+latency and throttle like Graph does.
+
+Reports scan wall time, API calls per scan, sqlite rows per second, peak
+memory and how long each anomaly took to raise an alert, as JSON so runs
+can be compared over time.
+
+Usage: python src/benchmarks/load_simulation.py [--campaigns N] [--scans N] [--output FILE] ...
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_graph import FakeAdAccount, FakeGraphServer
+from benchmarks.insights_fetch import build_config
+from firewall.alert_pipeline import AlertPipeline
+from firewall.alerts import AlertSystem
+from firewall.core import VortexFirewall
+from firewall.monitor import SecurityMonitor
+
+# Alert types that count as detecting each kind of injected anomaly
+ANOMALY_ALERTS = {
+    'spend_spike': {'SPENDING_SPIKE', 'SPEND_VELOCITY', 'BUDGET_BREACH', 'CAMPAIGN_PAUSED'},
+    'suspicious_copy': {'SUSPICIOUS_CONTENT'},
+    'geo_shift': {'GEO_ANOMALY'}
+}
+
+
+def simulation_config(server: FakeGraphServer, args) -> Dict:
+    config = build_config(server.base_url, server.account.account_id, bulk=True, concurrency=args.concurrency)
+    config['firewall'].update({
+        'vectorized_scoring': args.vectorized,
+        # Throttled requests are retried quickly; the schedule is not what is measured
+        'retry_delay': 0.2,
+        'max_backoff': 2,
+        'max_pace_delay': 1
+    })
+    config['security']['auto_actions']['pause_campaign_critical'] = True
+    config['security_rules'] = {'suspicious_keywords': ['free money', 'crypto giveaway'],
+                                'allowed_countries': ['US', 'CA']}
+    config['velocity'] = {'min_sample_interval': 0}
+    config['alerts'] = {
+        'email': {'enabled': False},
+        'slack': {'enabled': False},
+        'sms': {'enabled': False},
+        'pipeline': {'flush_interval': 0.1, 'digest_window': 1.0}
+    }
+    return config
+
+
+def advance(account: FakeAdAccount, rng: random.Random):
+    """Let every delivering campaign spend a little, like time passing between scans"""
+    for row in account.insights.values():
+        row['spend'] = f"{float(row['spend']) + rng.uniform(0.1, 0.5):.2f}"
+
+
+def inject(account: FakeAdAccount, campaign_id: str, kind: str):
+    if kind == 'spend_spike':
+        row = account.insights[campaign_id]
+        row['spend'] = f"{float(row['spend']) * 4 + 100:.2f}"
+    elif kind == 'suspicious_copy':
+        ad = account.ads[campaign_id][0]
+        ad['creative']['body'] = 'Claim your free money before midnight'
+        account.touch(ad)
+    elif kind == 'geo_shift':
+        # Traffic moving to another country arrives as new spend
+        account.campaign_country_split[campaign_id] = {'US': 0.4, 'NG': 0.6}
+        row = account.insights[campaign_id]
+        row['spend'] = f"{float(row['spend']) * 1.5:.2f}"
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process (firewall and fake server together)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(p * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def run(args) -> Dict:
+    rng = random.Random(args.seed)
+    account = FakeAdAccount(campaigns=args.campaigns, seed=args.seed)
+    server = FakeGraphServer(account, latency=args.latency, rate_limit=args.rate_limit)
+    with server:
+        config = simulation_config(server, args)
+        firewall = VortexFirewall(config)
+        monitor = SecurityMonitor(firewall)
+        alert_system = AlertSystem(config)
+        pipeline = AlertPipeline(firewall, alert_system, config['alerts']['pipeline'])
+        firewall.attach_alert_pipeline(pipeline)
+
+        raised = []
+        record_alert = firewall.record_alert
+
+        def recording_alert(alert_type, message, resource_id, severity="MEDIUM"):
+            raised.append((time.time(), alert_type, resource_id))
+            record_alert(alert_type, message, resource_id, severity)
+
+        firewall.record_alert = recording_alert
+
+        delivering = sorted(account.insights)
+        targets = rng.sample(delivering, min(args.anomalies, len(delivering)))
+        kinds = list(ANOMALY_ALERTS)
+        injected = {}
+
+        scans = []
+        for scan in range(args.scans):
+            advance(account, rng)
+            if scan == args.warmup:
+                for i, campaign_id in enumerate(targets):
+                    kind = kinds[i % len(kinds)]
+                    inject(account, campaign_id, kind)
+                    injected[campaign_id] = {'kind': kind, 'injected_at': time.time()}
+
+            server.reset_counters()
+            api_calls = firewall.api_call_count
+            started = time.perf_counter()
+            stats = monitor.run_security_scan()
+            scans.append({
+                'scan': scan,
+                'wall_seconds': time.perf_counter() - started,
+                'http_requests': server.request_count,
+                'api_calls': firewall.api_call_count - api_calls,
+                'throttled': server.throttled_count,
+                'campaigns_evaluated': stats['evaluated']
+            })
+
+        pipeline.stop()
+        firewall.close()
+        writer = firewall.writer.stats()
+
+    detections = []
+    for campaign_id, anomaly in injected.items():
+        hits = [at for at, alert_type, resource_id in raised
+                if resource_id == campaign_id and at >= anomaly['injected_at']
+                and alert_type in ANOMALY_ALERTS[anomaly['kind']]]
+        detections.append({
+            'campaign_id': campaign_id,
+            'kind': anomaly['kind'],
+            'detected': bool(hits),
+            'latency_seconds': min(hits) - anomaly['injected_at'] if hits else None
+        })
+
+    walls = [s['wall_seconds'] for s in scans]
+    latencies = [d['latency_seconds'] for d in detections if d['detected']]
+    return {
+        'benchmark': 'load_simulation',
+        'version': 1,
+        'parameters': vars(args),
+        'scans': scans,
+        'detections': detections,
+        'summary': {
+            'scan_wall_avg_seconds': sum(walls) / len(walls) if walls else 0.0,
+            'scan_wall_p95_seconds': percentile(walls, 0.95),
+            'api_calls_per_scan': sum(s['api_calls'] for s in scans) / len(scans) if scans else 0.0,
+            'throttled_responses': sum(s['throttled'] for s in scans),
+            'sqlite_rows_written': writer['rows_written'],
+            'sqlite_rows_per_second': writer['rows_per_second'],
+            'sqlite_transactions': writer['transactions'],
+            'peak_rss_mb': peak_rss_mb(),
+            'anomalies_injected': len(detections),
+            'anomalies_detected': len(latencies),
+            'detection_latency_avg_seconds': sum(latencies) / len(latencies) if latencies else None,
+            'detection_latency_max_seconds': max(latencies) if latencies else None,
+            'alerts_raised': len(raised)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end firewall load simulation")
+    parser.add_argument('--campaigns', type=int, default=500)
+    parser.add_argument('--scans', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=5, help="scans before anomalies are injected")
+    parser.add_argument('--anomalies', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds added to every fake Graph response")
+    parser.add_argument('--rate-limit', type=int, default=None, help="requests per second before error 17")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--vectorized', action='store_true')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', type=Path, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    output = args.output.resolve() if args.output else None
+
+    os.chdir(tempfile.mkdtemp(prefix='vortex-bench-'))
+    os.makedirs('logs', exist_ok=True)
+    args.output = str(output) if output else None
+    report = run(args)
+
+    if output:
+        output.write_text(json.dumps(report, indent=2))
+        summary = report['summary']
+        print(f"Scan wall time: avg {summary['scan_wall_avg_seconds']:.2f}s, "
+              f"p95 {summary['scan_wall_p95_seconds']:.2f}s; "
+              f"{summary['api_calls_per_scan']:.1f} API calls per scan")
+        print(f"Anomalies detected: {summary['anomalies_detected']}/{summary['anomalies_injected']}; "
+              f"report written to {output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+SQLite write throughput: per-row commits vs WAL and the batching writer
+
+Writes the rows of one scan (baseline observations plus some alerts) three
+ways against a fresh firewall database each time:
+
+  rollback journal, commit per row   how record_alert and
+                                     _update_campaign_pattern used to write
+  WAL, commit per row                the pragmas alone
+  WAL, SQLiteWriter                  queued writes, one commit per scan
+
+Usage: python src/benchmarks/sqlite_writes.py [campaigns] [scans]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.insights_fetch import build_config
+from firewall.core import VortexFirewall
+from firewall.storage import SQLiteWriter, connect
+
+ALERT_SQL = 'INSERT INTO security_alerts (alert_type, message, resource_id, severity) VALUES (?, ?, ?, ?)'
+PATTERN_SQL = 'INSERT INTO normal_patterns (metric_type, resource_id, value) VALUES (?, ?, ?)'
+
+STORAGE = {'wal': True, 'synchronous': 'NORMAL'}
+
+
+def scan_rows(campaigns: int, scan: int) -> List[Tuple[str, Tuple]]:
+    rows = []
+    for i in range(campaigns):
+        campaign_id = str(120000000 + i)
+        rows.append((PATTERN_SQL, ('daily_spend', campaign_id, 10.0 + scan + i % 7)))
+        rows.append((PATTERN_SQL, ('ctr', campaign_id, 1.0 + (i % 5) / 10)))
+        if i % 10 == scan % 10:
+            rows.append((ALERT_SQL, ('SPENDING_SPIKE', f"Campaign {campaign_id} spending spike", campaign_id, 'MEDIUM')))
+    return rows
+
+
+def fresh_database(name: str, storage: dict) -> str:
+    """Database file with the firewall schema, created the way the firewall creates it"""
+    config = build_config('http://127.0.0.1:9', 'act_1000', bulk=True)
+    config['firewall']['database_path'] = f"data/{name}.db"
+    config['firewall']['storage'] = storage
+    firewall = VortexFirewall(config)
+    firewall.close()
+    firewall.conn.close()
+    return config['firewall']['database_path']
+
+
+def commit_per_row(conn: sqlite3.Connection, scans: List[List[Tuple[str, Tuple]]]) -> float:
+    started = time.perf_counter()
+    for rows in scans:
+        for sql, params in rows:
+            conn.execute(sql, params)
+            conn.commit()
+    return time.perf_counter() - started
+
+
+def batching_writer(writer: SQLiteWriter, scans: List[List[Tuple[str, Tuple]]]) -> float:
+    started = time.perf_counter()
+    for rows in scans:
+        for sql, params in rows:
+            writer.execute(sql, params)
+        writer.flush()
+    return time.perf_counter() - started
+
+
+def main():
+    campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    scans = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    os.chdir(tempfile.mkdtemp(prefix='vortex-bench-'))
+    os.makedirs('logs', exist_ok=True)
+    workload = [scan_rows(campaigns, scan) for scan in range(scans)]
+    total = sum(len(rows) for rows in workload)
+
+    path = fresh_database('rollback', {'wal': False, 'synchronous': 'FULL'})
+    conn = sqlite3.connect(path)
+    rollback_seconds = commit_per_row(conn, workload)
+    conn.close()
+
+    path = fresh_database('wal', STORAGE)
+    conn = connect(path, STORAGE)
+    wal_seconds = commit_per_row(conn, workload)
+    conn.close()
+
+    path = fresh_database('writer', STORAGE)
+    writer = SQLiteWriter(path, STORAGE)
+    writer_seconds = batching_writer(writer, workload)
+    transactions = writer.stats()['transactions']
+    writer.stop()
+
+    print(f"Rows: {total} over {scans} scans of {campaigns} campaigns")
+    print(f"Rollback journal, commit per row: {total / rollback_seconds:10.0f} rows/s ({rollback_seconds:.2f}s)")
+    print(f"WAL, commit per row:              {total / wal_seconds:10.0f} rows/s ({wal_seconds:.2f}s)")
+    print(f"WAL, SQLiteWriter:                {total / writer_seconds:10.0f} rows/s "
+          f"({writer_seconds:.2f}s, {transactions} transactions)")
+    print(f"Speedup: {rollback_seconds / writer_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Per-campaign checks vs the vectorized scorer on a synthetic account
+
+Seeds baselines (window averages and z-score profiles) for every campaign,
+draws insights that trip each rule some of the time, and runs both paths
+over the same data. Fails if their alerts differ in any way.
+
+Usage: python src/benchmarks/vector_scoring.py [campaigns] [seed]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.insights_fetch import build_config
+from firewall.core import VortexFirewall
+from firewall.monitor import SecurityMonitor
+from firewall.vector_scoring import VectorScorer
+
+
+class StaticSnapshot:
+    """Fixed insights in place of a ScanSnapshot, so no API is involved"""
+
+    def __init__(self, insights: Dict[str, Dict]):
+        self.insights = insights
+
+    def get_insights(self, campaign_id: str):
+        return self.insights.get(campaign_id)
+
+    def get_country_spend(self, campaign_id: str):
+        return {}
+
+    def get_ads(self, campaign_id: str):
+        return []
+
+    def get_adset_insights(self, adset_id: str):
+        return None
+
+
+def synthetic_account(firewall: VortexFirewall, campaigns: int, rng: random.Random):
+    rows, insights, observations = [], {}, []
+    for i in range(campaigns):
+        campaign_id = str(130000000 + i)
+        rows.append({'id': campaign_id, 'status': 'ACTIVE',
+                     'daily_budget': str(rng.choice([0, 20, 50, 100]))})
+        normal_spend = rng.uniform(5, 60)
+        normal_ctr = rng.uniform(0.5, 3.0)
+        # Some campaigns have no history at all, some too little for z-scores
+        for _ in range(rng.choice([0, 3, 15, 15])):
+            observations.append(('daily_spend', campaign_id, normal_spend * rng.uniform(0.8, 1.2)))
+            observations.append(('ctr', campaign_id, normal_ctr * rng.uniform(0.8, 1.2)))
+        if rng.random() < 0.1:
+            continue
+        row = {'spend': f"{normal_spend * rng.choice([0.5, 1.0, 1.3, 2.5, 4.0]):.2f}",
+               'impressions': str(rng.randint(100, 50000))}
+        if rng.random() < 0.9:
+            row['ctr'] = f"{normal_ctr * rng.choice([0.3, 0.7, 1.0, 1.1]):.4f}"
+        if rng.random() < 0.9:
+            row['clicks'] = str(rng.randint(0, 150))
+        insights[campaign_id] = row
+    firewall.baselines.record_many(observations)
+    firewall.writer.flush()
+    return rows, insights
+
+
+def collect_alerts(firewall: VortexFirewall) -> List:
+    alerts = []
+    firewall.record_alert = lambda *args: alerts.append(args)
+    return alerts
+
+
+def main():
+    campaigns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    os.chdir(tempfile.mkdtemp(prefix='vortex-bench-'))
+    os.makedirs('logs', exist_ok=True)
+
+    config = build_config('http://127.0.0.1:9', 'act_1000', bulk=True)
+    config['baselines'] = {'min_samples': 12}
+    firewall = VortexFirewall(config)
+    monitor = SecurityMonitor(firewall)
+    rows, insights = synthetic_account(firewall, campaigns, random.Random(seed))
+    snapshot = StaticSnapshot(insights)
+    alerts = collect_alerts(firewall)
+
+    scalar_seconds = []
+    for _ in range(2):
+        del alerts[:]
+        started = time.perf_counter()
+        for campaign in rows:
+            monitor.scan_campaign(campaign, snapshot)
+        scalar_seconds.append(time.perf_counter() - started)
+    scalar_alerts = list(alerts)
+
+    # A second firewall on the same database, so both paths start with cold caches
+    scorer = VectorScorer(SecurityMonitor(VortexFirewall(config)))
+    vector_seconds = []
+    for _ in range(2):
+        started = time.perf_counter()
+        verdicts = scorer.score(rows, snapshot)
+        vector_seconds.append(time.perf_counter() - started)
+    vector_alerts = [(v['type'], v['message'], v['resource_id'], v['severity']) for v in verdicts]
+
+    print(f"Campaigns: {campaigns}, alerts: {len(scalar_alerts)}")
+    print(f"Per-campaign checks: {scalar_seconds[0] * 1000:.1f} ms cold, {scalar_seconds[1] * 1000:.1f} ms warm")
+    print(f"Vectorized scorer:   {vector_seconds[0] * 1000:.1f} ms cold, {vector_seconds[1] * 1000:.1f} ms warm")
+    if scalar_alerts != vector_alerts:
+        print("MISMATCH between per-campaign and vectorized verdicts")
+        sys.exit(1)
+    print("Verdicts identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Replay signed Meta webhook events into a local WebhookReceiver
+
+Starts the fake Graph API and a receiver, spikes one campaign's spend,
+posts change events for it and reports event-to-verdict latency. One
+event with a bad signature checks that unsigned traffic is refused, and
+malformed Content-Length headers that they are answered 400.
+
+Usage: python src/benchmarks/webhook_replay.py [events] [latency_seconds]
+"""
+
+import http.client
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_graph import FakeAdAccount, FakeGraphServer
+from benchmarks.insights_fetch import build_config
+from firewall.core import VortexFirewall
+from firewall.monitor import SecurityMonitor
+from firewall.webhooks import WebhookReceiver, sign_payload
+
+APP_SECRET = "replay-secret"
+
+
+def build_event(account_id: str, object_id: str, level: str = 'CAMPAIGN',
+                field: str = 'in_process_ad_objects') -> Dict:
+    """Payload shaped like a Marketing API ad account change notification"""
+    return {
+        'object': 'ad_account',
+        'entry': [{
+            'id': account_id.replace('act_', ''),
+            'time': int(time.time()),
+            'changes': [{'field': field, 'value': {'id': object_id, 'level': level}}]
+        }]
+    }
+
+
+def replay(url: str, events: List[Dict], app_secret: str = APP_SECRET) -> List[int]:
+    """POST each event with its signature and return the status codes"""
+    statuses = []
+    with requests.Session() as session:
+        for event in events:
+            body = json.dumps(event).encode()
+            response = session.post(url, data=body, headers={
+                'Content-Type': 'application/json',
+                'X-Hub-Signature-256': sign_payload(body, app_secret)
+            })
+            statuses.append(response.status_code)
+    return statuses
+
+
+def post_with_length(url: str, content_length: str) -> int:
+    """POST with a raw Content-Length header, as a broken or hostile client might"""
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=5)
+    try:
+        conn.putrequest('POST', parsed.path)
+        conn.putheader('Content-Length', content_length)
+        conn.endheaders()
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+
+def wait_for_checks(receiver: WebhookReceiver, expected: int, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = receiver.stats()
+        if stats['campaigns_checked'] >= expected and stats['pending'] == 0:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+
+    os.chdir(tempfile.mkdtemp(prefix='vortex-bench-'))
+    os.makedirs('logs', exist_ok=True)
+
+    account = FakeAdAccount(campaigns=50)
+    with FakeGraphServer(account, latency=latency) as server:
+        config = build_config(server.base_url, account.account_id, bulk=True)
+        config['meta_api']['app_secret'] = APP_SECRET
+        firewall = VortexFirewall(config)
+        monitor = SecurityMonitor(firewall)
+        receiver = WebhookReceiver(monitor, {'port': 0, 'coalesce_window': 0.05}).start()
+
+        target = account.campaigns[1]['id']
+        firewall.baselines.record('daily_spend', target, 10.0)
+        firewall.writer.flush()
+        account.insights[target]['spend'] = '500.00'
+
+        rejected = requests.post(receiver.url, data=b'{}', headers={'X-Hub-Signature-256': 'sha256=0'})
+        malformed = [post_with_length(receiver.url, value) for value in ('abc', '-1')]
+
+        checked = 0
+        for _ in range(events):
+            replay(receiver.url, [build_event(account.account_id, target)])
+            checked += 1
+            wait_for_checks(receiver, checked)
+
+        firewall.flush_alerts()
+        with firewall.db_lock:
+            alerts = firewall.conn.execute(
+                'SELECT COUNT(*) FROM security_alerts WHERE resource_id = ?', (target,)).fetchone()[0]
+        stats = receiver.stats()
+        receiver.stop()
+
+    print(f"Events: {stats['events_received']} accepted, {stats['events_rejected']} rejected "
+          f"(bad signature answered {rejected.status_code})")
+    print(f"Event to verdict: avg {stats['latency_avg'] * 1000:.0f} ms, max {stats['latency_max'] * 1000:.0f} ms "
+          f"with {latency * 1000:.0f} ms simulated Graph latency")
+    print(f"Alerts recorded for campaign {target}: {alerts}")
+    print(f"Malformed Content-Length answered {', '.join(str(status) for status in malformed)}")
+    if malformed != [400, 400]:
+        print("MISMATCH: malformed Content-Length must be answered 400")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -138,7 +138,8 @@ class VortexDeployer:
         print("\nNext Steps:")
         print("1. Start the firewall: python src/main.py")
         print("2. Monitor logs: tail -f logs/firewall.log")
-        print("3. Check alerts in the web interface")
+        print("3. Review alerts: python src/history.py alerts (or summary, spend; --format csv to export)")
+        print("   For a dashboard, enable history_api in config/config.yaml")
         print("\nFor support: tech@vortexconsultants.com")
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from .storage import SQLiteWriter
+
+SEVERITY_ORDER = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2, 'CRITICAL': 3}
+
+
+class AlertDeduplicator:
+    """Suppression window cache in front of record_alert
+
+    An alert is recorded the first time its (type, resource, severity) key
+    is seen. Repeats are suppressed until the entry's TTL expires. An alert
+    at a higher severity than any active entry for the same type and resource
+    always breaks through. Entries live in an LRU map capped at max_entries
+    and are mirrored in alert_suppressions so a restart keeps the windows.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock, writer: SQLiteWriter, config: Dict = None):
+        config = config or {}
+        self.conn = conn
+        self.db_lock = lock
+        self.writer = writer
+        self.logger = logging.getLogger('AlertDeduplicator')
+        self.default_ttl = config.get('default_ttl', 3600)
+        self.ttl_by_type = config.get('ttl_by_type', {})
+        self.max_entries = config.get('max_entries', 10000)
+
+        self._lock = threading.Lock()
+        # key -> [expires_at, suppressed_count]
+        self._entries: "OrderedDict[Tuple[str, str, str], list]" = OrderedDict()
+        self._dirty = set()
+        self.suppressed_total = 0
+
+    def create_tables(self):
+        with self.db_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS alert_suppressions (
+                    alert_type TEXT NOT NULL,
+                    resource_id TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    suppressed_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (alert_type, resource_id, severity)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('DELETE FROM alert_suppressions WHERE expires_at <= ?', (time.time(),))
+            cursor.execute('''
+                SELECT alert_type, resource_id, severity, expires_at, suppressed_count
+                FROM alert_suppressions ORDER BY expires_at
+            ''')
+            rows = cursor.fetchall()
+            self.conn.commit()
+
+        with self._lock:
+            for alert_type, resource_id, severity, expires_at, suppressed in rows:
+                self._entries[(alert_type, resource_id, severity)] = [expires_at, suppressed]
+            self._evict()
+
+    def ttl_for(self, alert_type: str) -> float:
+        return self.ttl_by_type.get(alert_type, self.default_ttl)
+
+    def admit(self, alert_type: str, resource_id: str, severity: str) -> Tuple[bool, int]:
+        """Decide whether an alert should be recorded
+
+        Returns (record, repeats) where repeats is how many identical alerts
+        were suppressed in the window that just ended.
+        """
+        now = time.time()
+        key = (alert_type, resource_id, severity)
+        rank = SEVERITY_ORDER.get(severity, 1)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                entry[1] += 1
+                self.suppressed_total += 1
+                self._entries.move_to_end(key)
+                self._dirty.add(key)
+                return False, 0
+
+            # Escalation check: a higher active severity also covers this one
+            for other, other_rank in SEVERITY_ORDER.items():
+                if other_rank <= rank:
+                    continue
+                higher = self._entries.get((alert_type, resource_id, other))
+                if higher is not None and higher[0] > now:
+                    higher[1] += 1
+                    self.suppressed_total += 1
+                    self._dirty.add((alert_type, resource_id, other))
+                    return False, 0
+
+            repeats = entry[1] if entry is not None else 0
+            self._entries[key] = [now + self.ttl_for(alert_type), 0]
+            self._entries.move_to_end(key)
+            self._dirty.add(key)
+            self._evict()
+            return True, repeats
+
+    def _evict(self):
+        """Drop expired entries from the cold end, then cap the size"""
+        now = time.time()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            self._dirty.discard(key)
+
+    def persist(self):
+        """Queue changed entries for the writer's next commit"""
+        with self._lock:
+            rows = [key + tuple(self._entries[key]) for key in self._dirty if key in self._entries]
+            self._dirty.clear()
+        if not rows:
+            return
+
+        self.writer.executemany('''
+            INSERT OR REPLACE INTO alert_suppressions
+                (alert_type, resource_id, severity, expires_at, suppressed_count)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        self.writer.execute('DELETE FROM alert_suppressions WHERE expires_at <= ?', (time.time(),))
@@ -0,0 +1,166 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+SEVERITY_ORDER = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2, 'CRITICAL': 3}
+
+_STOP = object()
+
+
+class AlertPipeline:
+    """Queued alert path between the scan loop and storage and notifications
+
+    record_alert only enqueues. A writer thread stores alerts in batched
+    transactions. Stored alerts are grouped into per-severity digests over a
+    short window and delivered by background workers, so the scan never waits
+    on sqlite commits or SMTP round trips.
+    """
+
+    def __init__(self, firewall, alert_system, config: Dict = None):
+        config = config or {}
+        self.firewall = firewall
+        self.alert_system = alert_system
+        self.logger = logging.getLogger(firewall.logger_name('AlertPipeline'))
+        self.batch_size = config.get('batch_size', 200)
+        self.flush_interval = config.get('flush_interval', 1.0)
+        self.digest_window = config.get('digest_window', 10.0)
+        # Alerts at or above this severity skip the digest window
+        self.immediate_severity = config.get('immediate_severity', 'HIGH')
+
+        self._queue = queue.Queue()
+        self._pending_digest: List[Dict] = []
+        self._digest_lock = threading.Lock()
+        self._digest_started = None
+        self._written = threading.Condition()
+        self._submitted = 0
+        self._stored = 0
+        self.delivered = 0
+
+        self._delivery = ThreadPoolExecutor(max_workers=config.get('delivery_workers', 2),
+                                            thread_name_prefix='alert-delivery')
+        self._writer = threading.Thread(target=self._run_writer, name='alert-writer', daemon=True)
+        self._writer.start()
+
+    def submit(self, alert_type: str, message: str, resource_id: str, severity: str):
+        """Queue an alert; returns immediately"""
+        with self._written:
+            self._submitted += 1
+        self._queue.put({
+            'type': alert_type,
+            'message': message,
+            'resource_id': resource_id,
+            'severity': severity,
+            'queued_at': time.time()
+        })
+
+    @property
+    def depth(self) -> int:
+        """Alerts submitted but not yet stored"""
+        with self._written:
+            return self._submitted - self._stored
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Wait until every submitted alert is stored; delivery is not awaited"""
+        deadline = time.monotonic() + timeout
+        with self._written:
+            while self._stored < self._submitted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._written.wait(remaining)
+        return True
+
+    def stop(self):
+        """Store everything queued, send the last digest and shut down workers"""
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._send_digest()
+        self._delivery.shutdown(wait=True)
+        self.alert_system.close()
+
+    def _run_writer(self):
+        while True:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            stopping = item is _STOP
+            if item is not None and not stopping:
+                batch.append(item)
+                # Drain whatever else is waiting, up to one batch
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+            if batch:
+                self._store(batch)
+                self._enqueue_delivery(batch)
+            self._maybe_send_digest()
+            if stopping:
+                return
+
+    def _store(self, batch: List[Dict]):
+        try:
+            self.firewall.store_alerts(batch)
+        except Exception as e:
+            self.logger.error(f"Failed to store {len(batch)} alerts: {e}")
+        finally:
+            with self._written:
+                self._stored += len(batch)
+                self._written.notify_all()
+
+    def _enqueue_delivery(self, batch: List[Dict]):
+        threshold = SEVERITY_ORDER.get(self.immediate_severity, 2)
+        urgent = [a for a in batch if SEVERITY_ORDER.get(a['severity'], 1) >= threshold]
+        for alert in urgent:
+            self._delivery.submit(self._deliver, [alert])
+
+        with self._digest_lock:
+            for alert in batch:
+                if SEVERITY_ORDER.get(alert['severity'], 1) < threshold:
+                    self._pending_digest.append(alert)
+            if self._pending_digest and self._digest_started is None:
+                self._digest_started = time.monotonic()
+
+    def _maybe_send_digest(self):
+        with self._digest_lock:
+            due = (self._digest_started is not None
+                   and time.monotonic() - self._digest_started >= self.digest_window)
+        if due:
+            self._send_digest()
+
+    def _send_digest(self):
+        with self._digest_lock:
+            alerts, self._pending_digest = self._pending_digest, []
+            self._digest_started = None
+        if not alerts:
+            return
+
+        # One digest per severity so recipients follow the usual routing
+        by_severity: Dict[str, List[Dict]] = {}
+        for alert in alerts:
+            by_severity.setdefault(alert['severity'], []).append(alert)
+        for group in by_severity.values():
+            self._delivery.submit(self._deliver, group)
+
+    def _deliver(self, alerts: List[Dict]):
+        try:
+            if len(alerts) == 1:
+                self.alert_system.send_alert(alerts[0])
+            else:
+                self.alert_system.send_digest(alerts)
+            with self._digest_lock:
+                self.delivered += len(alerts)
+        except Exception as e:
+            self.logger.error(f"Alert delivery failed: {e}")
@@ -1,15 +1,23 @@
 import smtplib
 import logging
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
-from typing import Dict
+import threading
+import time
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import Dict, List
 
 class AlertSystem:
     """Multi-channel alert notification system"""
     
     def __init__(self, config: Dict):
         self.config = config
-        self.logger = logging.getLogger('AlertSystem')
+        tenant_id = config.get('tenant_id')
+        self.logger = logging.getLogger(f"AlertSystem.{tenant_id}" if tenant_id else 'AlertSystem')
+        # One SMTP connection reused across alerts; reopened when it drops
+        self._smtp = None
+        self._smtp_used_at = 0.0
+        self._smtp_lock = threading.Lock()
+        self.smtp_idle_timeout = config.get('alerts', {}).get('email', {}).get('idle_timeout', 120)
         
     def send_alert(self, alert_data: Dict):
         """Send alert through configured channels"""
@@ -19,7 +27,17 @@ class AlertSystem:
         resource_id = alert_data.get('resource_id')
         
         alert_message = self.format_alert_message(alert_type, message, severity, resource_id)
-        
+        self.dispatch(alert_message, severity)
+    
+    def send_digest(self, alerts: List[Dict]):
+        """Send several related alerts as one message at their highest severity"""
+        order = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+        severity = max((a.get('severity', 'MEDIUM') for a in alerts),
+                       key=lambda s: order.index(s) if s in order else 1)
+        self.dispatch(self.format_digest_message(alerts, severity), severity)
+    
+    def dispatch(self, alert_message: str, severity: str):
+        """Deliver a formatted message through the enabled channels"""
         # Send via enabled channels
         if self.config['alerts']['email']['enabled']:
             self.send_email_alert(alert_message, severity)
@@ -45,13 +63,66 @@ Time: {self.get_current_timestamp()}
 Please review immediately if severity is HIGH or CRITICAL.
 """
     
+    def format_digest_message(self, alerts: List[Dict], severity: str) -> str:
+        """Format a digest of related alerts, grouped by resource"""
+        by_resource = {}
+        for alert in alerts:
+            by_resource.setdefault(alert.get('resource_id'), []).append(alert)
+        
+        lines = []
+        for resource_id, resource_alerts in by_resource.items():
+            lines.append(f"Resource: {resource_id}")
+            for alert in resource_alerts:
+                lines.append(f"  - [{alert.get('severity')}] {alert.get('type')}: {alert.get('message')}")
+        body = "\n".join(lines)
+        
+        return f"""
+🚨 VORTEX FIREWALL ALERT DIGEST 🚨
+
+{len(alerts)} alerts across {len(by_resource)} resources
+Highest severity: {severity}
+
+{body}
+
+Time: {self.get_current_timestamp()}
+
+Please review immediately if severity is HIGH or CRITICAL.
+"""
+    
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Open the SMTP connection, or reuse it while it is still alive"""
+        if self._smtp is not None and time.monotonic() - self._smtp_used_at > self.smtp_idle_timeout:
+            # Idle connections are often dropped by the server; check before reuse
+            try:
+                self._smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                self._smtp = None
+        
+        if self._smtp is None:
+            email_config = self.config['alerts']['email']
+            server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
+            server.starttls()
+            # Note: In production, use environment variables for credentials
+            # server.login(email_config['username'], email_config['password'])
+            self._smtp = server
+        return self._smtp
+    
+    def close(self):
+        """Close the persistent SMTP connection"""
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._smtp = None
+    
     def send_email_alert(self, message: str, severity: str):
         """Send email alert"""
         try:
-            email_config = self.config['alerts']['email']
             contacts = self.config['alert_contacts']
             
-            msg = MimeMultipart()
+            msg = MIMEMultipart()
             msg['From'] = "vortex-firewall@vortexconsultants.com"
             msg['To'] = contacts['primary']
             msg['Subject'] = f"Vortex Firewall Alert - {severity}"
@@ -59,14 +130,16 @@ Please review immediately if severity is HIGH or CRITICAL.
             if severity in ['HIGH', 'CRITICAL']:
                 msg['To'] = f"{contacts['primary']}, {contacts['emergency']}"
             
-            msg.attach(MimeText(message, 'plain'))
+            msg.attach(MIMEText(message, 'plain'))
             
-            server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
-            server.starttls()
-            # Note: In production, use environment variables for credentials
-            # server.login(email_config['username'], email_config['password'])
-            server.send_message(msg)
-            server.quit()
+            with self._smtp_lock:
+                try:
+                    self._get_smtp().send_message(msg)
+                except (smtplib.SMTPServerDisconnected, OSError):
+                    # Dropped since last use: reconnect once and retry
+                    self._smtp = None
+                    self._get_smtp().send_message(msg)
+                self._smtp_used_at = time.monotonic()
             
             self.logger.info(f"Email alert sent for {severity} issue")
             
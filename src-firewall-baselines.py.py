@@ -0,0 +1,365 @@
+import logging
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .storage import SQLITE_SECONDS, SQLiteWriter
+
+# Slot names in baseline_stats: the overall profile plus seasonal ones
+GLOBAL_SLOT = '*'
+
+
+def seasonal_slots(when: datetime) -> List[str]:
+    """Hour-of-day and day-of-week slots an observation at `when` belongs to"""
+    return [f"h{when.hour:02d}", f"d{when.weekday()}"]
+
+
+def lookup_slots(when: datetime) -> Tuple[str, ...]:
+    """Slots a z-score lookup tries in order: hour of day, day of week, overall"""
+    return tuple(seasonal_slots(when)) + (GLOBAL_SLOT,)
+
+
+class RunningStats:
+    """O(1) online statistics for one metric slot
+
+    Keeps an all-time mean and variance (Welford) alongside an exponentially
+    weighted mean and variance that tracks recent behaviour.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'ewma_mean', 'ewma_var')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 ewma_mean: float = 0.0, ewma_var: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewma_mean = ewma_mean
+        self.ewma_var = ewma_var
+
+    def update(self, value: float, alpha: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.count == 1:
+            self.ewma_mean, self.ewma_var = value, 0.0
+        else:
+            diff = value - self.ewma_mean
+            increment = alpha * diff
+            self.ewma_mean += increment
+            self.ewma_var = (1 - alpha) * (self.ewma_var + diff * increment)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def zscore(self, value: float) -> Optional[float]:
+        """Distance from the weighted mean in weighted standard deviations"""
+        if self.ewma_var <= 0:
+            return None
+        return (value - self.ewma_mean) / math.sqrt(self.ewma_var)
+
+    def as_row(self) -> Tuple:
+        return (self.count, self.mean, self.m2, self.ewma_mean, self.ewma_var)
+
+
+class BaselineStore:
+    """Bounded storage for per-campaign metric baselines
+
+    Every observation updates three tables in one transaction:
+    normal_patterns keeps raw rows for a short retention period,
+    pattern_buckets downsamples them into daily sums, and pattern_aggregates
+    keeps a running sum and count over the baseline window. Lookups read a
+    single aggregate row by primary key, independent of history length.
+
+    baseline_stats holds streaming statistics (Welford and EWMA) per metric,
+    overall and per hour-of-day and day-of-week slot, for z-score checks.
+    They are cached in memory and written through on every update.
+    Writes go through the SQLiteWriter, so the tables lag the in-memory
+    statistics until the writer's next commit.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock, writer: SQLiteWriter, config: Dict = None):
+        config = config or {}
+        self.conn = conn
+        self.lock = lock
+        self.writer = writer
+        self.logger = logging.getLogger('BaselineStore')
+        self.window_days = config.get('window_days', 30)
+        self.raw_retention_days = config.get('raw_retention_days', 7)
+        self.prune_interval = config.get('prune_interval', 3600)
+        self.ewma_alpha = config.get('ewma_alpha', 0.1)
+        # Observations a slot needs before its z-scores are trusted
+        self.min_samples = config.get('min_samples', 12)
+        self._last_prune = 0.0
+        self._stats: Dict[Tuple[str, str, str], RunningStats] = {}
+
+    def create_tables(self):
+        """Create the baseline tables and indexes, migrating old raw history"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_normal_patterns_lookup
+                ON normal_patterns (metric_type, resource_id, calculated_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_normal_patterns_age
+                ON normal_patterns (calculated_at)
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pattern_buckets (
+                    metric_type TEXT NOT NULL,
+                    resource_id TEXT NOT NULL,
+                    bucket DATE NOT NULL,
+                    sample_count INTEGER NOT NULL,
+                    value_sum REAL NOT NULL,
+                    PRIMARY KEY (metric_type, resource_id, bucket)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pattern_buckets_age
+                ON pattern_buckets (bucket)
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pattern_aggregates (
+                    metric_type TEXT NOT NULL,
+                    resource_id TEXT NOT NULL,
+                    sample_count INTEGER NOT NULL,
+                    value_sum REAL NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (metric_type, resource_id)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS baseline_stats (
+                    metric_type TEXT NOT NULL,
+                    resource_id TEXT NOT NULL,
+                    slot TEXT NOT NULL,
+                    sample_count INTEGER NOT NULL,
+                    mean REAL NOT NULL,
+                    m2 REAL NOT NULL,
+                    ewma_mean REAL NOT NULL,
+                    ewma_var REAL NOT NULL,
+                    PRIMARY KEY (metric_type, resource_id, slot)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.commit()
+            self._migrate_raw_history(cursor)
+
+    def _migrate_raw_history(self, cursor: sqlite3.Cursor):
+        """Build buckets and aggregates once from rows written before they existed"""
+        cursor.execute('SELECT 1 FROM pattern_aggregates LIMIT 1')
+        if cursor.fetchone():
+            return
+        cursor.execute('SELECT 1 FROM normal_patterns LIMIT 1')
+        if not cursor.fetchone():
+            return
+
+        self.logger.info("Downsampling existing normal_patterns history into baseline buckets")
+        cursor.execute('''
+            INSERT OR IGNORE INTO pattern_buckets (metric_type, resource_id, bucket, sample_count, value_sum)
+            SELECT metric_type, resource_id, date(calculated_at), COUNT(*), SUM(value)
+            FROM normal_patterns
+            WHERE date(calculated_at) >= date('now', ?)
+            GROUP BY metric_type, resource_id, date(calculated_at)
+        ''', (f"-{self.window_days} days",))
+        cursor.execute('''
+            INSERT OR REPLACE INTO pattern_aggregates (metric_type, resource_id, sample_count, value_sum)
+            SELECT metric_type, resource_id, SUM(sample_count), SUM(value_sum)
+            FROM pattern_buckets
+            GROUP BY metric_type, resource_id
+        ''')
+        self.conn.commit()
+
+    def record(self, metric: str, resource_id: str, value: float):
+        """Add one observation"""
+        self.record_many([(metric, resource_id, value)])
+
+    def record_many(self, observations: Iterable[Tuple[str, str, float]], when: datetime = None):
+        """Add many observations; they are committed with the rest of the scan"""
+        rows = list(observations)
+        if not rows:
+            return
+        when = when or datetime.now(timezone.utc)
+        slots = [GLOBAL_SLOT] + seasonal_slots(when)
+
+        with self.lock:
+            stat_rows = []
+            for metric, resource_id, value in rows:
+                for slot in slots:
+                    stats = self._get_stats(metric, resource_id, slot)
+                    stats.update(value, self.ewma_alpha)
+                    stat_rows.append((metric, resource_id, slot) + stats.as_row())
+
+            self.writer.executemany('''
+                INSERT OR REPLACE INTO baseline_stats
+                    (metric_type, resource_id, slot, sample_count, mean, m2, ewma_mean, ewma_var)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', stat_rows)
+            self.writer.executemany('''
+                INSERT INTO normal_patterns (metric_type, resource_id, value)
+                VALUES (?, ?, ?)
+            ''', rows)
+            self.writer.executemany('''
+                INSERT INTO pattern_buckets (metric_type, resource_id, bucket, sample_count, value_sum)
+                VALUES (?, ?, date('now'), 1, ?)
+                ON CONFLICT (metric_type, resource_id, bucket) DO UPDATE SET
+                    sample_count = sample_count + 1,
+                    value_sum = value_sum + excluded.value_sum
+            ''', rows)
+            self.writer.executemany('''
+                INSERT INTO pattern_aggregates (metric_type, resource_id, sample_count, value_sum)
+                VALUES (?, ?, 1, ?)
+                ON CONFLICT (metric_type, resource_id) DO UPDATE SET
+                    sample_count = sample_count + 1,
+                    value_sum = value_sum + excluded.value_sum,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', rows)
+
+        self.maybe_prune()
+
+    def average(self, metric: str, resource_id: str) -> Optional[float]:
+        """Mean over the baseline window, or None without history"""
+        with self.lock, SQLITE_SECONDS.time(op='read'):
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT value_sum, sample_count FROM pattern_aggregates
+                WHERE metric_type = ? AND resource_id = ?
+            ''', (metric, resource_id))
+            row = cursor.fetchone()
+
+        if not row or not row[1]:
+            return None
+        return row[0] / row[1]
+
+    def averages(self, metric: str) -> Dict[str, float]:
+        """Window mean for every resource with history, in one query"""
+        with self.lock, SQLITE_SECONDS.time(op='read'):
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT resource_id, value_sum, sample_count FROM pattern_aggregates
+                WHERE metric_type = ? AND sample_count != 0
+            ''', (metric,))
+            rows = cursor.fetchall()
+        return {resource_id: value_sum / count for resource_id, value_sum, count in rows}
+
+    def zscore_profiles(self, metric: str, resource_ids: Iterable[str],
+                        when: datetime = None) -> Dict[str, Tuple[float, float]]:
+        """(ewma_mean, ewma_var) of the profile zscore() would use, per resource
+
+        Resources zscore() would return None for are left out. Slots not yet
+        cached are loaded in one query instead of one per resource.
+        """
+        when = when or datetime.now(timezone.utc)
+        slots = lookup_slots(when)
+        resource_ids = list(resource_ids)
+        profiles = {}
+        with self.lock:
+            missing = {(metric, r, s) for r in resource_ids for s in slots} - self._stats.keys()
+            if missing:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    SELECT resource_id, slot, sample_count, mean, m2, ewma_mean, ewma_var FROM baseline_stats
+                    WHERE metric_type = ? AND slot IN (?, ?, ?)
+                ''', (metric,) + slots)
+                for resource_id, slot, *row in cursor.fetchall():
+                    key = (metric, resource_id, slot)
+                    if key in missing:
+                        self._stats[key] = RunningStats(*row)
+                        missing.discard(key)
+                for key in missing:
+                    self._stats[key] = RunningStats()
+
+            for resource_id in resource_ids:
+                for slot in slots:
+                    stats = self._stats[(metric, resource_id, slot)]
+                    if stats.count >= self.min_samples:
+                        if stats.ewma_var > 0:
+                            profiles[resource_id] = (stats.ewma_mean, stats.ewma_var)
+                        break
+        return profiles
+
+    def _get_stats(self, metric: str, resource_id: str, slot: str) -> RunningStats:
+        """Cached stats for a slot, loaded from baseline_stats on first use"""
+        key = (metric, resource_id, slot)
+        stats = self._stats.get(key)
+        if stats is None:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT sample_count, mean, m2, ewma_mean, ewma_var FROM baseline_stats
+                WHERE metric_type = ? AND resource_id = ? AND slot = ?
+            ''', key)
+            row = cursor.fetchone()
+            stats = RunningStats(*row) if row else RunningStats()
+            self._stats[key] = stats
+        return stats
+
+    def get_stats(self, metric: str, resource_id: str, slot: str = GLOBAL_SLOT) -> Optional[RunningStats]:
+        """Streaming statistics for a metric slot, or None without history"""
+        with self.lock:
+            stats = self._get_stats(metric, resource_id, slot)
+        return stats if stats.count else None
+
+    def zscore(self, metric: str, resource_id: str, value: float, when: datetime = None) -> Optional[float]:
+        """z-score of value against the baseline, seasonal where it has enough data
+
+        Prefers the hour-of-day profile, then the day-of-week one, which
+        fills up about 24 times faster, then the overall EWMA. Returns None
+        until a profile has min_samples observations.
+        """
+        when = when or datetime.now(timezone.utc)
+        with self.lock:
+            for slot in lookup_slots(when):
+                stats = self._get_stats(metric, resource_id, slot)
+                if stats.count >= self.min_samples:
+                    return stats.zscore(value)
+        return None
+
+    def maybe_prune(self):
+        """Apply retention at most once per prune_interval"""
+        now = time.monotonic()
+        if self._last_prune and now - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = now
+        self.prune()
+
+    def prune(self):
+        """Queue retention: raw rows past retention, buckets past the baseline window"""
+        self.writer.run(self._prune)
+
+    def _prune(self, cursor: sqlite3.Cursor):
+        window = f"-{self.window_days} days"
+        cursor.execute('''
+            DELETE FROM normal_patterns WHERE calculated_at < datetime('now', ?)
+        ''', (f"-{self.raw_retention_days} days",))
+        raw_deleted = cursor.rowcount
+
+        # Take expiring buckets back out of the running aggregates first
+        cursor.execute('''
+            UPDATE pattern_aggregates SET
+                sample_count = sample_count - (
+                    SELECT COALESCE(SUM(b.sample_count), 0) FROM pattern_buckets b
+                    WHERE b.metric_type = pattern_aggregates.metric_type
+                      AND b.resource_id = pattern_aggregates.resource_id
+                      AND b.bucket < date('now', ?)),
+                value_sum = value_sum - (
+                    SELECT COALESCE(SUM(b.value_sum), 0) FROM pattern_buckets b
+                    WHERE b.metric_type = pattern_aggregates.metric_type
+                      AND b.resource_id = pattern_aggregates.resource_id
+                      AND b.bucket < date('now', ?))
+            WHERE EXISTS (
+                SELECT 1 FROM pattern_buckets b
+                WHERE b.metric_type = pattern_aggregates.metric_type
+                  AND b.resource_id = pattern_aggregates.resource_id
+                  AND b.bucket < date('now', ?))
+        ''', (window, window, window))
+        cursor.execute('DELETE FROM pattern_buckets WHERE bucket < date(\'now\', ?)', (window,))
+        buckets_deleted = cursor.rowcount
+        cursor.execute('DELETE FROM pattern_aggregates WHERE sample_count <= 0')
+
+        if raw_deleted or buckets_deleted:
+            self.logger.info(f"Pruned {raw_deleted} raw baseline rows and {buckets_deleted} daily buckets")
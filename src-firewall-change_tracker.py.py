@@ -0,0 +1,143 @@
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .storage import SQLiteWriter
+
+
+class CampaignChangeTracker:
+    """Per-campaign fingerprints used to skip campaigns that cannot have changed
+
+    A fingerprint is (status, daily_budget, lifetime_budget, spend,
+    impressions). A campaign whose fingerprint matches the last evaluated one
+    is skipped, unless it is high-spend, alerted recently, or has gone
+    full_rescan_every scans without evaluation. Paused campaigns with no
+    spend and unchanged settings are skipped before their insights are even
+    requested.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock, writer: SQLiteWriter, config: Dict = None):
+        config = config or {}
+        self.conn = conn
+        self.db_lock = lock
+        self.writer = writer
+        self.logger = logging.getLogger('CampaignChangeTracker')
+        self.full_rescan_every = config.get('full_rescan_every', 12)
+        self.high_spend_threshold = config.get('high_spend_threshold', 100.0)
+        self.anomaly_hot_seconds = config.get('anomaly_hot_seconds', 3600)
+
+        self._lock = threading.Lock()
+        # campaign_id -> state dict; loaded once, written back after each scan
+        self._state: Dict[str, Dict] = {}
+        self._last_alert: Dict[str, float] = {}
+
+    def create_tables(self):
+        with self.db_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS campaign_fingerprints (
+                    campaign_id TEXT PRIMARY KEY,
+                    status TEXT,
+                    daily_budget TEXT,
+                    lifetime_budget TEXT,
+                    spend REAL,
+                    impressions INTEGER,
+                    skipped_scans INTEGER NOT NULL DEFAULT 0,
+                    last_alert_at REAL
+                ) WITHOUT ROWID
+            ''')
+            self.conn.commit()
+            cursor.execute('SELECT * FROM campaign_fingerprints')
+            rows = cursor.fetchall()
+
+        with self._lock:
+            for campaign_id, status, daily, lifetime, spend, impressions, skipped, last_alert in rows:
+                self._state[campaign_id] = {
+                    'settings': (status, daily, lifetime),
+                    'metrics': (spend, impressions),
+                    'skipped_scans': skipped
+                }
+                if last_alert:
+                    self._last_alert[campaign_id] = last_alert
+
+    @staticmethod
+    def _settings(campaign: Dict) -> Tuple:
+        return (campaign.get('status'), campaign.get('daily_budget'), campaign.get('lifetime_budget'))
+
+    @staticmethod
+    def _metrics(insights: Optional[Dict]) -> Tuple:
+        if not insights:
+            return (0.0, 0)
+        return (float(insights.get('spend', 0) or 0), int(insights.get('impressions', 0) or 0))
+
+    def note_alert(self, campaign_id: str):
+        """Mark a campaign as recently anomalous"""
+        with self._lock:
+            self._last_alert[campaign_id] = time.time()
+
+    def _is_hot(self, campaign_id: str, now: float) -> bool:
+        last_alert = self._last_alert.get(campaign_id)
+        return last_alert is not None and now - last_alert < self.anomaly_hot_seconds
+
+    def plan(self, campaigns: List[Dict], get_insights: Callable[[str], Optional[Dict]]) -> List[Dict]:
+        """Campaigns to evaluate this scan, riskiest first
+
+        get_insights is only called for campaigns that survive the
+        settings-level skip, so idle paused campaigns cost no API call.
+        """
+        now = time.time()
+        selected = []
+
+        for campaign in campaigns:
+            campaign_id = campaign['id']
+            with self._lock:
+                state = self._state.get(campaign_id)
+                hot = self._is_hot(campaign_id, now)
+            due = state is None or state['skipped_scans'] + 1 >= self.full_rescan_every
+            settings = self._settings(campaign)
+
+            if (not hot and not due and campaign.get('status') == 'PAUSED'
+                    and state['settings'] == settings and state['metrics'][0] == 0):
+                self._mark_skipped(campaign_id)
+                continue
+
+            metrics = self._metrics(get_insights(campaign_id))
+            high_spend = metrics[0] >= self.high_spend_threshold
+            unchanged = state is not None and state['settings'] == settings and state['metrics'] == metrics
+
+            if unchanged and not (hot or high_spend or due):
+                self._mark_skipped(campaign_id)
+                continue
+
+            # Recently anomalous first, then by spend
+            selected.append(((0 if hot else 1, -metrics[0]), campaign, settings, metrics, state is None))
+
+        selected.sort(key=lambda item: item[0])
+        with self._lock:
+            for _, campaign, settings, metrics, is_new in selected:
+                # Stagger new campaigns so forced rescans do not all land on one scan
+                skipped = zlib.crc32(campaign['id'].encode()) % self.full_rescan_every if is_new else 0
+                self._state[campaign['id']] = {'settings': settings, 'metrics': metrics, 'skipped_scans': skipped}
+        return [item[1] for item in selected]
+
+    def _mark_skipped(self, campaign_id: str):
+        with self._lock:
+            self._state[campaign_id]['skipped_scans'] += 1
+
+    def persist(self):
+        """Queue every fingerprint for the writer's next commit"""
+        with self._lock:
+            rows = [
+                (campaign_id,) + state['settings'] + state['metrics']
+                + (state['skipped_scans'], self._last_alert.get(campaign_id))
+                for campaign_id, state in self._state.items()
+            ]
+        self.writer.executemany('''
+            INSERT OR REPLACE INTO campaign_fingerprints
+                (campaign_id, status, daily_budget, lifetime_budget, spend, impressions,
+                 skipped_scans, last_alert_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
@@ -1,39 +1,131 @@
 import requests
+import functools
 import json
 import time
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Set, Optional
-import sqlite3
+from typing import Dict, Iterator, List, Set, Optional
+from urllib.parse import urlencode, urlparse
 import os
+import threading
+
+from api.metrics import REGISTRY
+from api.pagination import PageIterator
+from api.rate_limiter import PRIORITY_WRITE
+from api.response_cache import get_shared_cache
+from api.session import get_shared_session
+from .alert_dedup import AlertDeduplicator
+from .baselines import BaselineStore
+from .change_tracker import CampaignChangeTracker
+from .geo import CountryBaselines, CountryBreakdownCache
+from .hierarchy import AdHierarchyIndex
+from .history import create_history_indexes
+from .log_pipeline import configure_logging
+from .storage import SQLiteWriter, connect
+from .velocity import SpendVelocityTracker
+
+GRAPH_API_URL = "https://graph.facebook.com/v17.0"
+BATCH_REQUEST_LIMIT = 50
+
+ALERTS = REGISTRY.counter('vortex_alerts_total', 'Alerts raised by type and severity, suppressed repeats included')
 
 class VortexFirewall:
     """Core firewall class for Meta Ads protection"""
     
     def __init__(self, config: Dict):
         self.config = config
+        # Scans may run checks on worker threads; the sqlite connection and
+        # counters below are shared, so every access goes through these locks
+        self.db_lock = threading.RLock()
+        self._counter_lock = threading.Lock()
         self.setup_logging()
         self.setup_database()
         self.suspicious_activities = []
         self.blocked_ips = set()
+        self.alert_pipeline = None
+        # campaign_id -> time of its latest alert, suppressed repeats included
+        self.last_alert_at: Dict[str, float] = {}
+        self.base_url = self.config['meta_api'].get('base_url', GRAPH_API_URL)
+        self.api_call_count = 0
+        self.http = get_shared_session(self.config.get('http'), self.config.get('firewall'))
+        cache_config = self.config.get('response_cache', {})
+        self.response_cache = (get_shared_cache(cache_config, self._cache_writer)
+                               if cache_config.get('enabled', True) else None)
+        firewall_config = self.config.get('firewall', {})
+        self.page_size = firewall_config.get('page_size', 500)
+        self.prefetch_pages = firewall_config.get('prefetch_pages', False)
+        geo_config = self.config.get('geo', {})
+        self.country_cache = (CountryBreakdownCache(self, geo_config)
+                              if geo_config.get('enabled', True) else None)
+        velocity_config = self.config.get('velocity', {})
+        self.velocity = (SpendVelocityTracker(velocity_config)
+                         if velocity_config.get('enabled', True) else None)
+        hierarchy_config = self.config.get('hierarchy', {})
+        self.hierarchy = (AdHierarchyIndex(self, hierarchy_config)
+                          if hierarchy_config.get('enabled', False) else None)
+        self.register_metrics()
+        
+    def _cache_writer(self, path: str) -> SQLiteWriter:
+        """Writer for the response cache file; the cache is shared, so no tenant in the logger name"""
+        return SQLiteWriter(path, self.config.get('firewall', {}).get('storage'), 'ResponseCache')
+    
+    def register_metrics(self):
+        """Expose counters this firewall already keeps; they are read only when scraped"""
+        tenant = self.config.get('tenant_id', 'default')
+        REGISTRY.callback('vortex_api_calls_total', 'Graph API calls made by the firewall',
+                          lambda: self.api_call_count, kind='counter', tenant=tenant)
+        REGISTRY.callback('vortex_sqlite_write_queue_depth', 'Writes queued for the sqlite writer thread',
+                          lambda: self.writer.stats()['queued'], tenant=tenant)
+        caches = []
+        if self.response_cache is not None:
+            # One response cache is shared by every tenant in the process
+            caches.append(('response', self.response_cache, 'shared'))
+        if self.country_cache is not None:
+            caches.append(('country', self.country_cache, tenant))
+        for name, cache, owner in caches:
+            for result in ('hits', 'misses', 'revalidated'):
+                if hasattr(cache, result):
+                    REGISTRY.callback('vortex_cache_requests_total', 'Cache lookups by cache and result',
+                                      functools.partial(getattr, cache, result), kind='counter',
+                                      cache=name, result=result, tenant=owner)
+            REGISTRY.callback('vortex_cache_hit_ratio', 'Share of cache lookups answered without a full download',
+                              functools.partial(self._hit_ratio, cache), cache=name, tenant=owner)
+        
+    @staticmethod
+    def _hit_ratio(cache) -> Optional[float]:
+        served = cache.hits + getattr(cache, 'revalidated', 0)
+        total = served + cache.misses
+        return served / total if total else None
         
     def setup_logging(self):
         """Configure logging"""
-        log_config = self.config.get('logging', {})
-        logging.basicConfig(
-            level=log_config.get('level', 'INFO'),
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_config.get('file_path', 'logs/firewall.log')),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger('VortexFirewall')
+        configure_logging(self.config.get('logging', {}))
+        self.logger = logging.getLogger(self.logger_name('VortexFirewall'))
+        
+    def logger_name(self, component: str) -> str:
+        """Logger name for a component, qualified by tenant in multi-account mode"""
+        tenant_id = self.config.get('tenant_id')
+        return f"{component}.{tenant_id}" if tenant_id else component
         
     def setup_database(self):
         """Initialize SQLite database for historical data"""
-        os.makedirs('data', exist_ok=True)
-        self.conn = sqlite3.connect('data/firewall.db', check_same_thread=False)
+        db_path = self.config.get('firewall', {}).get('database_path', 'data/firewall.db')
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        storage_config = self.config.get('firewall', {}).get('storage', {})
+        # Schema and reads use this connection; every write after setup goes
+        # through the writer thread's own connection
+        self.conn = connect(db_path, storage_config)
+        self.writer = SQLiteWriter(db_path, storage_config, self.logger_name('SQLiteWriter'))
+        self.baselines = BaselineStore(self.conn, self.db_lock, self.writer, self.config.get('baselines'))
+        dedup_config = self.config.get('alerts', {}).get('dedup', {})
+        self.alert_dedup = (AlertDeduplicator(self.conn, self.db_lock, self.writer, dedup_config)
+                            if dedup_config.get('enabled', True) else None)
+        incremental_config = self.config.get('firewall', {}).get('incremental_scan', {})
+        self.change_tracker = (CampaignChangeTracker(self.conn, self.db_lock, self.writer, incremental_config)
+                               if incremental_config.get('enabled', False) else None)
+        geo_config = self.config.get('geo', {})
+        self.country_baselines = (CountryBaselines(self.conn, self.db_lock, self.writer, geo_config)
+                                  if geo_config.get('enabled', True) else None)
         self.create_tables()
         
     def create_tables(self):
@@ -62,6 +154,7 @@ class VortexFirewall:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        create_history_indexes(cursor)
         
         # Normal patterns baseline
         cursor.execute('''
@@ -75,39 +168,102 @@ class VortexFirewall:
         ''')
         
         self.conn.commit()
+        self.baselines.create_tables()
+        if self.alert_dedup is not None:
+            self.alert_dedup.create_tables()
+        if self.change_tracker is not None:
+            self.change_tracker.create_tables()
+        if self.country_baselines is not None:
+            self.country_baselines.create_tables()
+        
+    def make_meta_api_call(self, endpoint: str, params: Dict = None, fresh: bool = False) -> Optional[Dict]:
+        """Secure API call to Meta Graph API
         
-    def make_meta_api_call(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
-        """Secure API call to Meta Graph API"""
-        base_url = "https://graph.facebook.com/v17.0"
-        url = f"{base_url}/{endpoint}"
+        fresh makes a cached response be revalidated with Graph before use.
+        """
+        url = f"{self.base_url}/{endpoint}"
         
         default_params = {
             'access_token': self.config['meta_api']['access_token'],
-            'limit': 1000
+            'limit': self.page_size
         }
         
         if params:
             default_params.update(params)
             
+        return self._get_json(url, default_params, fresh)
+    
+    def _get_json(self, url: str, params: Optional[Dict] = None, fresh: bool = False) -> Optional[Dict]:
+        """GET an absolute Graph URL, e.g. a paging.next cursor link"""
+        # Log the path only; cursor links carry the access token in the query
+        endpoint = urlparse(url).path
+        
         try:
-            self.logger.info(f"Making API call to: {endpoint}")
-            response = requests.get(url, params=default_params, timeout=30)
+            if self.response_cache is not None:
+                return self.response_cache.get_json(
+                    url, params, lambda send_params, headers: self._send_get(url, send_params, headers),
+                    revalidate=fresh)
+            response = self._send_get(url, params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             self.logger.error(f"API call failed to {endpoint}: {e}")
             return None
+    
+    def _send_get(self, url: str, params: Optional[Dict], headers: Dict = None) -> requests.Response:
+        # Per-request latency and counts are in the vortex_graph_* metrics
+        self.logger.debug(f"Making API call to: {urlparse(url).path}")
+        self._count_api_call()
+        return self.http.get(url, params=params, headers=headers)
+    
+    def iter_api_pages(self, endpoint: str, params: Dict = None, page_size: int = None,
+                       prefetch: bool = None) -> PageIterator:
+        """Stream every page of a Graph edge, following paging cursors"""
+        default_params = {
+            'access_token': self.config['meta_api']['access_token'],
+            'limit': page_size or self.page_size
+        }
+        
+        if params:
+            default_params.update(params)
+            
+        if prefetch is None:
+            prefetch = self.prefetch_pages
+            
+        return PageIterator(self._get_json, f"{self.base_url}/{endpoint}", default_params, prefetch)
+    
+    def _count_api_call(self):
+        with self._counter_lock:
+            self.api_call_count += 1
             
     def get_active_campaigns(self) -> List[Dict]:
         """Fetch all active campaigns"""
+        return list(self.iter_active_campaigns())
+    
+    def iter_active_campaigns(self) -> Iterator[Dict]:
+        """Stream active campaigns across all result pages"""
         endpoint = f"{self.config['meta_api']['ad_account_id']}/campaigns"
         params = {
             'fields': 'id,name,status,daily_budget,lifetime_budget,objective',
             'effective_status': ['ACTIVE', 'PAUSED']
         }
         
-        result = self.make_meta_api_call(endpoint, params)
-        return result.get('data', []) if result else []
+        return self.iter_api_pages(endpoint, params).records()
+    
+    def get_campaign(self, campaign_id: str, fresh: bool = False) -> Optional[Dict]:
+        """Fetch a single campaign with the fields the checks read
+        
+        Pass fresh=True after a change notification: the cached copy may
+        predate the edit that triggered it.
+        """
+        # updated_time lets the response cache revalidate without a full download
+        params = {'fields': 'id,name,status,daily_budget,lifetime_budget,objective,updated_time'}
+        return self.make_meta_api_call(campaign_id, params, fresh=fresh)
+    
+    def resolve_campaign_id(self, object_id: str) -> Optional[str]:
+        """Campaign an ad set or ad belongs to"""
+        result = self.make_meta_api_call(object_id, {'fields': 'campaign_id'})
+        return result.get('campaign_id') if result else None
     
     def get_campaign_insights(self, campaign_id: str, fields: List[str] = None) -> Optional[Dict]:
         """Get campaign performance insights"""
@@ -117,60 +273,275 @@ class VortexFirewall:
         endpoint = f"{campaign_id}/insights"
         params = {
             'fields': ','.join(fields),
-            'time_range': '{"since":"' + (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d') + '","until":"' + datetime.now().strftime('%Y-%m-%d') + '"}'
+            'time_range': self._insights_time_range()
         }
         
         result = self.make_meta_api_call(endpoint, params)
         return result.get('data', [{}])[0] if result and result.get('data') else None
     
+    def get_account_insights(self, fields: List[str] = None) -> Optional[Dict[str, Dict]]:
+        """Get insights for every campaign in one account-level request
+        
+        Returns the records keyed by campaign id, or None if the request
+        failed. Campaigns without delivery in the time range have no row.
+        """
+        if fields is None:
+            fields = ['spend', 'impressions', 'clicks', 'ctr', 'actions']
+            
+        endpoint = f"{self.config['meta_api']['ad_account_id']}/insights"
+        params = {
+            'level': 'campaign',
+            'fields': ','.join(['campaign_id'] + [f for f in fields if f != 'campaign_id']),
+            'time_range': self._insights_time_range()
+        }
+        
+        pages = self.iter_api_pages(endpoint, params)
+        insights = {row['campaign_id']: row for row in pages.records() if 'campaign_id' in row}
+        # A truncated result would make missing campaigns look like zero delivery
+        return None if pages.failed else insights
+    
+    def get_adset_insights(self, campaign_ids: List[str] = None) -> Optional[Dict[str, Dict]]:
+        """Insights for every ad set in one account-level request, keyed by ad set id
+        
+        campaign_ids narrows the request to those campaigns. Returns None if
+        paging failed.
+        """
+        endpoint = f"{self.config['meta_api']['ad_account_id']}/insights"
+        params = {
+            'level': 'adset',
+            'fields': 'adset_id,campaign_id,spend,impressions,clicks,ctr',
+            'time_range': self._insights_time_range()
+        }
+        if campaign_ids is not None:
+            params['filtering'] = self._campaign_filter(campaign_ids)
+        
+        pages = self.iter_api_pages(endpoint, params)
+        insights = {row['adset_id']: row for row in pages.records() if 'adset_id' in row}
+        return None if pages.failed else insights
+    
+    def get_country_spend(self, campaign_ids: List[str] = None) -> Optional[Dict[str, Dict[str, float]]]:
+        """Spend per country for every campaign from one breakdown request
+        
+        Returns {campaign_id: {country: spend}}, or None if paging failed.
+        campaign_ids narrows the request to those campaigns.
+        """
+        endpoint = f"{self.config['meta_api']['ad_account_id']}/insights"
+        params = {
+            'level': 'campaign',
+            'breakdowns': 'country',
+            'fields': 'campaign_id,spend',
+            'time_range': self._insights_time_range()
+        }
+        if campaign_ids is not None:
+            params['filtering'] = self._campaign_filter(campaign_ids)
+        
+        pages = self.iter_api_pages(endpoint, params)
+        by_campaign: Dict[str, Dict[str, float]] = {}
+        for row in pages.records():
+            if 'campaign_id' in row and row.get('country'):
+                countries = by_campaign.setdefault(row['campaign_id'], {})
+                countries[row['country']] = countries.get(row['country'], 0.0) + float(row.get('spend', 0) or 0)
+        return None if pages.failed else by_campaign
+    
+    def get_account_ads(self, campaign_ids: List[str] = None) -> Optional[Dict[str, List[Dict]]]:
+        """Ads with their creative text and links, grouped by campaign
+        
+        Creative fields come through field expansion, so the whole account
+        is one paged request. Returns None if paging failed.
+        """
+        endpoint = f"{self.config['meta_api']['ad_account_id']}/ads"
+        params = {
+            'fields': 'id,name,campaign_id,creative{title,body,link_url,object_url}',
+            'effective_status': ['ACTIVE', 'PAUSED']
+        }
+        if campaign_ids is not None:
+            params['filtering'] = self._campaign_filter(campaign_ids)
+        
+        pages = self.iter_api_pages(endpoint, params)
+        by_campaign: Dict[str, List[Dict]] = {}
+        for ad in pages.records():
+            if 'campaign_id' in ad:
+                by_campaign.setdefault(ad['campaign_id'], []).append(ad)
+        return None if pages.failed else by_campaign
+    
+    @staticmethod
+    def _campaign_filter(campaign_ids: List[str]) -> str:
+        """Graph filtering expression limiting an account edge to some campaigns"""
+        return json.dumps([{'field': 'campaign.id', 'operator': 'IN', 'value': list(campaign_ids)}])
+    
+    def get_campaign_insights_batch(self, campaign_ids: List[str], fields: List[str] = None) -> Dict[str, Optional[Dict]]:
+        """Get insights for many campaigns through Graph batch requests
+        
+        Sends up to BATCH_REQUEST_LIMIT sub-requests per HTTP call. Campaigns
+        whose sub-request failed are left out so callers can retry them.
+        """
+        if fields is None:
+            fields = ['spend', 'impressions', 'clicks', 'ctr', 'actions']
+            
+        query = urlencode({'fields': ','.join(fields), 'time_range': self._insights_time_range()})
+        results = {}
+        
+        for start in range(0, len(campaign_ids), BATCH_REQUEST_LIMIT):
+            chunk = campaign_ids[start:start + BATCH_REQUEST_LIMIT]
+            batch = [{'method': 'GET', 'relative_url': f"{campaign_id}/insights?{query}"} for campaign_id in chunk]
+            params = {
+                'access_token': self.config['meta_api']['access_token'],
+                'batch': json.dumps(batch)
+            }
+            
+            try:
+                self.logger.info(f"Making batch API call for {len(chunk)} campaigns")
+                self._count_api_call()
+                response = self.http.post(f"{self.base_url}/", data=params)
+                response.raise_for_status()
+                replies = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self.logger.error(f"Batch API call failed: {e}")
+                continue
+                
+            for campaign_id, reply in zip(chunk, replies):
+                if not reply or reply.get('code') != 200:
+                    continue
+                try:
+                    data = json.loads(reply.get('body') or '{}').get('data')
+                except ValueError:
+                    continue
+                results[campaign_id] = data[0] if data else None
+                
+        return results
+    
+    def _insights_time_range(self) -> str:
+        """Insights window covering yesterday and today"""
+        return '{"since":"' + (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d') + '","until":"' + datetime.now().strftime('%Y-%m-%d') + '"}'
+    
     def pause_campaign(self, campaign_id: str, reason: str):
         """Pause a campaign for security reasons"""
-        endpoint = f"{campaign_id}"
+        if self._pause_object(campaign_id):
+            self.logger.warning(f"Campaign {campaign_id} paused: {reason}")
+            self.record_alert("CAMPAIGN_PAUSED", f"Campaign paused: {reason}", campaign_id, "HIGH")
+    
+    def pause_adset(self, adset_id: str, reason: str):
+        """Pause just one ad set, leaving the rest of its campaign running"""
+        if self._pause_object(adset_id):
+            self.logger.warning(f"Ad set {adset_id} paused: {reason}")
+            self.record_alert("ADSET_PAUSED", f"Ad set paused: {reason}", adset_id, "HIGH")
+    
+    def _pause_object(self, object_id: str) -> bool:
+        """Set a campaign, ad set or ad to PAUSED"""
         params = {
             'access_token': self.config['meta_api']['access_token'],
             'status': 'PAUSED'
         }
         
         try:
-            response = requests.post(url=f"https://graph.facebook.com/v17.0/{endpoint}", data=params)
+            self._count_api_call()
+            # Write priority: an emergency pause never waits behind insight reads
+            response = self.http.post(f"{self.base_url}/{object_id}", data=params, priority=PRIORITY_WRITE)
             if response.status_code == 200:
-                self.logger.warning(f"Campaign {campaign_id} paused: {reason}")
-                self.record_alert("CAMPAIGN_PAUSED", f"Campaign paused: {reason}", campaign_id, "HIGH")
-            else:
-                self.logger.error(f"Failed to pause campaign {campaign_id}: {response.text}")
+                return True
+            self.logger.error(f"Failed to pause {object_id}: {response.text}")
         except Exception as e:
-            self.logger.error(f"Error pausing campaign {campaign_id}: {e}")
+            self.logger.error(f"Error pausing {object_id}: {e}")
+        return False
+    
+    def attach_alert_pipeline(self, pipeline):
+        """Route alerts through a background AlertPipeline instead of inline writes"""
+        self.alert_pipeline = pipeline
+        REGISTRY.callback('vortex_alert_queue_depth', 'Alerts submitted to the pipeline but not yet stored',
+                          lambda: pipeline.depth, tenant=self.config.get('tenant_id', 'default'))
     
     def record_alert(self, alert_type: str, message: str, resource_id: str, severity: str = "MEDIUM"):
         """Record security alert in database"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO security_alerts (alert_type, message, resource_id, severity)
-            VALUES (?, ?, ?, ?)
-        ''', (alert_type, message, resource_id, severity))
-        self.conn.commit()
+        ALERTS.inc(type=alert_type, severity=severity)
+        self.last_alert_at[resource_id] = time.time()
+        if self.change_tracker is not None:
+            # Even suppressed repeats keep the campaign on the hot list
+            self.change_tracker.note_alert(resource_id)
+        
+        if self.alert_dedup is not None:
+            record, repeats = self.alert_dedup.admit(alert_type, resource_id, severity)
+            if not record:
+                return
+            if repeats:
+                message = f"{message} (repeated {repeats} times since last notification)"
+        
+        if self.alert_pipeline is not None:
+            # Stored in a batch and delivered by the pipeline's workers
+            self.alert_pipeline.submit(alert_type, message, resource_id, severity)
+            return
+        
+        self.store_alerts([{
+            'type': alert_type,
+            'message': message,
+            'resource_id': resource_id,
+            'severity': severity
+        }])
         
         # Trigger alert notifications
         self.trigger_alert_notification(alert_type, message, resource_id, severity)
     
+    def store_alerts(self, alerts: List[Dict]):
+        """Queue alerts for the writer's next commit"""
+        self.writer.executemany('''
+            INSERT INTO security_alerts (alert_type, message, resource_id, severity)
+            VALUES (?, ?, ?, ?)
+        ''', [(a['type'], a['message'], a['resource_id'], a['severity']) for a in alerts])
+    
+    def flush_alerts(self):
+        """Wait for queued alerts and every other scan write to be committed (not delivered)"""
+        if self.alert_pipeline is not None:
+            self.alert_pipeline.flush()
+        if self.alert_dedup is not None:
+            self.alert_dedup.persist()
+        if not self.writer.flush():
+            self.logger.warning(f"Scan writes not committed within the flush timeout; "
+                                f"{self.writer.stats()['queued']} still queued")
+    
+    def close(self):
+        """Commit outstanding writes and stop the writer thread"""
+        if not self.writer.flush():
+            self.logger.warning(f"Writer still has {self.writer.stats()['queued']} writes queued at shutdown; "
+                                f"waiting for them")
+        self.writer.stop()
+    
     def trigger_alert_notification(self, alert_type: str, message: str, resource_id: str, severity: str):
         """Trigger external alert notifications"""
-        # This will be implemented in alerts.py
+        # Without a pipeline attached alerts are only stored
         pass
     
-    def update_normal_patterns(self):
-        """Update baseline normal patterns from historical data"""
-        campaigns = self.get_active_campaigns()
+    def update_normal_patterns(self, snapshot=None, campaigns: List[Dict] = None):
+        """Update baseline normal patterns from historical data
+        
+        When called with the scan's ScanSnapshot the campaigns and insights
+        already fetched by the checks are reused instead of re-requested.
+        `campaigns` limits the update to the campaigns a scan evaluated.
+        """
+        if campaigns is None:
+            campaigns = snapshot.get_campaigns() if snapshot else self.get_active_campaigns()
+        observations = []
         for campaign in campaigns:
-            insights = self.get_campaign_insights(campaign['id'])
+            if snapshot:
+                insights = snapshot.get_insights(campaign['id'])
+            else:
+                insights = self.get_campaign_insights(campaign['id'])
             if insights and 'spend' in insights:
-                self._update_campaign_pattern(campaign['id'], 'daily_spend', float(insights['spend']))
+                observations.append(('daily_spend', campaign['id'], float(insights['spend'])))
+            if insights and 'ctr' in insights:
+                observations.append(('ctr', campaign['id'], float(insights['ctr'])))
+        
+        if snapshot and self.hierarchy is not None:
+            for campaign in campaigns:
+                for adset in self.hierarchy.adsets_for(campaign['id']):
+                    adset_insights = snapshot.get_adset_insights(adset['id'])
+                    if adset_insights and 'spend' in adset_insights:
+                        observations.append(('adset_spend', adset['id'], float(adset_insights['spend'])))
+        
+        # One transaction for the whole scan instead of a commit per campaign
+        self.baselines.record_many(observations)
+        
+        if snapshot and self.country_baselines is not None:
+            self.country_baselines.update_many(snapshot.new_country_spend(c['id'] for c in campaigns))
     
     def _update_campaign_pattern(self, campaign_id: str, metric: str, value: float):
         """Update pattern for specific campaign metric"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLICE INTO normal_patterns (metric_type, resource_id, value)
-            VALUES (?, ?, ?)
-        ''', (metric, campaign_id, value))
-        self.conn.commit()
\ No newline at end of file
+        self.baselines.record(metric, campaign_id, value)
\ No newline at end of file
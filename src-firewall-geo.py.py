@@ -0,0 +1,193 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .storage import SQLiteWriter
+
+FILTER_CHUNK = 100
+
+
+class CountryBreakdownCache:
+    """Country spend breakdowns kept between scans
+
+    A campaign's breakdown is only re-requested when its total spend has
+    grown by more than min_spend_change (a fraction) since the cached copy,
+    or the copy is older than max_age. Spend added since the fetch is then
+    always under that fraction of the total, so cached country shares are
+    off by at most that much, while an active campaign is not downloaded
+    again on every scan. Spend is only compared where the caller already
+    knows it, so the cache never forces an insights request of its own.
+
+    Stale campaigns are fetched with a campaign.id filter. Only an
+    unscoped full scan with most of the account stale uses one
+    account-wide request; a webhook check or scheduler batch never
+    downloads the rest of the account.
+    """
+
+    def __init__(self, firewall, config: Dict = None):
+        config = config or {}
+        self.firewall = firewall
+        self.logger = logging.getLogger(firewall.logger_name('CountryBreakdownCache'))
+        self.max_age = config.get('breakdown_max_age', 3600)
+        self.min_spend_change = config.get('breakdown_min_spend_change', 0.05)
+        self._lock = threading.Lock()
+        # campaign_id -> (spend when fetched or None, {country: spend}, fetched_at)
+        self._entries: Dict[str, Tuple[Optional[float], Dict[str, float], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, campaigns: List[Dict], known_spend: Callable[[str], Optional[float]],
+            scoped: bool = False) -> Tuple[Dict[str, Dict[str, float]], Set[str]]:
+        """{campaign_id: {country: spend}} for campaigns, fetching only what changed
+
+        Also returns the ids whose breakdown was fetched by this call rather
+        than served from the cache. scoped means campaigns is a subset of
+        the account, so the fetch is always filtered to them.
+        """
+        now = time.time()
+        spends = {c['id']: known_spend(c['id']) for c in campaigns}
+        with self._lock:
+            stale = [
+                campaign_id for campaign_id, spend in spends.items()
+                if spend != 0 and (campaign_id not in self._entries
+                                   or self._spend_moved(self._entries[campaign_id][0], spend)
+                                   or now - self._entries[campaign_id][2] > self.max_age)
+            ]
+            self.hits += len(spends) - len(stale)
+            self.misses += len(stale)
+
+        refreshed = set()
+        if stale:
+            fetched = self._fetch(stale, whole_account=not scoped and len(stale) > len(campaigns) / 2)
+            # On a failed fetch the previous breakdown, if any, is kept
+            if fetched is not None:
+                with self._lock:
+                    for campaign_id in stale:
+                        self._entries[campaign_id] = (spends[campaign_id], fetched.get(campaign_id, {}), now)
+                refreshed.update(stale)
+
+        with self._lock:
+            for campaign_id in [k for k, v in self._entries.items() if now - v[2] > 2 * self.max_age]:
+                del self._entries[campaign_id]
+            return {
+                campaign_id: self._entries[campaign_id][1] if spend != 0 and campaign_id in self._entries else {}
+                for campaign_id, spend in spends.items()
+            }, refreshed
+
+    def _spend_moved(self, cached: Optional[float], spend: Optional[float]) -> bool:
+        if spend is None:
+            return False
+        if not cached:
+            return spend != cached
+        # Insights windows roll over at midnight, so a drop is a change too
+        return spend < cached or spend - cached > cached * self.min_spend_change
+
+    def _fetch(self, campaign_ids: List[str], whole_account: bool) -> Optional[Dict[str, Dict[str, float]]]:
+        if whole_account:
+            return self.firewall.get_country_spend()
+        results = {}
+        for start in range(0, len(campaign_ids), FILTER_CHUNK):
+            chunk = self.firewall.get_country_spend(campaign_ids[start:start + FILTER_CHUNK])
+            if chunk is None:
+                return None
+            results.update(chunk)
+        return results
+
+
+class CountryBaselines:
+    """Compact per-campaign profile of where spend usually comes from
+
+    Each campaign keeps an exponentially weighted share per country. Shares
+    under min_share are dropped and at most max_countries are kept, so a
+    profile stays a handful of rows however many countries ever appeared.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock, writer: SQLiteWriter, config: Dict = None):
+        config = config or {}
+        self.conn = conn
+        self.db_lock = lock
+        self.writer = writer
+        self.logger = logging.getLogger('CountryBaselines')
+        self.alpha = config.get('ewma_alpha', 0.2)
+        self.min_share = config.get('min_share', 0.01)
+        self.max_countries = config.get('max_countries', 15)
+        self.min_observations = config.get('min_observations', 6)
+
+        self._lock = threading.Lock()
+        # campaign_id -> (observations, {country: share})
+        self._profiles: Dict[str, Tuple[int, Dict[str, float]]] = {}
+
+    def create_tables(self):
+        with self.db_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS country_baselines (
+                    campaign_id TEXT NOT NULL,
+                    country TEXT NOT NULL,
+                    share REAL NOT NULL,
+                    PRIMARY KEY (campaign_id, country)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS country_profiles (
+                    campaign_id TEXT PRIMARY KEY,
+                    observations INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self.conn.commit()
+            cursor.execute('SELECT campaign_id, observations FROM country_profiles')
+            profiles = {campaign_id: (observations, {}) for campaign_id, observations in cursor.fetchall()}
+            cursor.execute('SELECT campaign_id, country, share FROM country_baselines')
+            for campaign_id, country, share in cursor.fetchall():
+                if campaign_id in profiles:
+                    profiles[campaign_id][1][country] = share
+
+        with self._lock:
+            self._profiles = profiles
+
+    def profile(self, campaign_id: str) -> Optional[Dict[str, float]]:
+        """Usual country shares, or None until min_observations scans were seen"""
+        with self._lock:
+            observations, shares = self._profiles.get(campaign_id, (0, {}))
+            return dict(shares) if observations >= self.min_observations else None
+
+    def update_many(self, distributions: Dict[str, Dict[str, float]]):
+        """Fold one scan's country spend into each campaign's profile
+
+        Callers pass only breakdowns that are new since the last update and
+        did not raise a GEO_ANOMALY, so a cached copy is not counted twice
+        and an unexpected country is not learned the scan it appears.
+        """
+        changed = []
+        with self._lock:
+            for campaign_id, country_spend in distributions.items():
+                total = sum(country_spend.values())
+                if total <= 0:
+                    continue
+                observations, shares = self._profiles.get(campaign_id, (0, {}))
+                current = {c: s / total for c, s in country_spend.items()}
+                if observations == 0:
+                    updated = current
+                else:
+                    updated = {
+                        c: (1 - self.alpha) * shares.get(c, 0.0) + self.alpha * current.get(c, 0.0)
+                        for c in set(shares) | set(current)
+                    }
+                kept = sorted(((s, c) for c, s in updated.items() if s >= self.min_share), reverse=True)
+                shares = {c: s for s, c in kept[:self.max_countries]}
+                self._profiles[campaign_id] = (observations + 1, shares)
+                changed.append((campaign_id, observations + 1, shares))
+        if not changed:
+            return
+
+        self.writer.executemany('DELETE FROM country_baselines WHERE campaign_id = ?',
+                                [(campaign_id,) for campaign_id, _, _ in changed])
+        self.writer.executemany('''
+            INSERT INTO country_baselines (campaign_id, country, share) VALUES (?, ?, ?)
+        ''', [(campaign_id, country, share)
+              for campaign_id, _, shares in changed for country, share in shares.items()])
+        self.writer.executemany('''
+            INSERT OR REPLACE INTO country_profiles (campaign_id, observations) VALUES (?, ?)
+        ''', [(campaign_id, observations) for campaign_id, observations, _ in changed])
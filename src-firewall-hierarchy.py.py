@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+ADSET_FIELDS = 'id,name,campaign_id,status,daily_budget,lifetime_budget,updated_time'
+AD_FIELDS = 'id,name,campaign_id,adset_id,status,updated_time,creative{title,body,link_url,object_url}'
+LIVE_STATUSES = ('ACTIVE', 'PAUSED')
+# Graph leaves archived and deleted objects out unless asked for them by
+# effective_status, so incremental queries list every status there is
+UPDATE_STATUSES = ('ACTIVE', 'PAUSED', 'ARCHIVED', 'DELETED', 'CAMPAIGN_PAUSED', 'ADSET_PAUSED',
+                   'IN_PROCESS', 'WITH_ISSUES', 'DISAPPROVED', 'PENDING_REVIEW', 'PREAPPROVED',
+                   'PENDING_BILLING_INFO')
+# Margin on the updated_time watermark for clock skew against Graph
+WATERMARK_SKEW = 120
+
+
+class AdHierarchyIndex:
+    """In-memory campaign -> ad set -> ad tree for one ad account
+
+    A full load is one paged request for the account's ad sets with their
+    ads expanded inline. In between, refresh() only asks for ad sets and
+    ads whose updated_time moved past the last refresh, which is usually
+    two near-empty responses. Incremental queries include archived and
+    deleted objects, so those are evicted on the next refresh rather than
+    at the next full load. Requests run outside the index lock; lookups
+    only wait for the results to be swapped in.
+    """
+
+    def __init__(self, firewall, config: Dict = None):
+        config = config or {}
+        self.firewall = firewall
+        self.logger = logging.getLogger(firewall.logger_name('AdHierarchyIndex'))
+        self.refresh_interval = config.get('refresh_interval', 60)
+        self.full_refresh_interval = config.get('full_refresh_interval', 3600)
+        self.nested_limit = config.get('nested_limit', 100)
+
+        self._lock = threading.RLock()
+        # Held for a whole refresh, network included; lookups never take it
+        self._refresh_lock = threading.Lock()
+        self._adsets: Dict[str, Dict] = {}
+        self._ads: Dict[str, Dict] = {}
+        self._adsets_by_campaign: Dict[str, Set[str]] = {}
+        self._ads_by_adset: Dict[str, Set[str]] = {}
+        self._last_full = 0.0
+        self._last_refresh = 0.0
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def refresh(self, force_full: bool = False) -> bool:
+        """Bring the index up to date if refresh_interval has passed
+
+        Returns False if the request failed; the index keeps its old state.
+        A call made while another refresh is running returns at once and
+        leaves the update to that one.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return True
+        try:
+            now = time.time()
+            with self._lock:
+                if not force_full and now - self._last_refresh < self.refresh_interval:
+                    return True
+                full = force_full or now - self._last_full >= self.full_refresh_interval
+                since = int(self._last_refresh - WATERMARK_SKEW)
+
+            if full:
+                adsets = self._fetch_tree()
+                if adsets is None:
+                    return False
+                with self._lock:
+                    self._replace(adsets)
+                    self._last_full = now
+                    self.full_loads += 1
+                    self._last_refresh = now
+            else:
+                adsets = self._fetch_updated('adsets', ADSET_FIELDS, since)
+                ads = self._fetch_updated('ads', AD_FIELDS, since)
+                if adsets is None or ads is None:
+                    return False
+                with self._lock:
+                    for adset in adsets:
+                        self._put_adset(adset)
+                    for ad in ads:
+                        self._put_ad(ad)
+                    self.incremental_loads += 1
+                    self._last_refresh = now
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def _account_edge(self, edge: str) -> str:
+        return f"{self.firewall.config['meta_api']['ad_account_id']}/{edge}"
+
+    def _fetch_tree(self) -> Optional[List[Dict]]:
+        params = {
+            'fields': f"{ADSET_FIELDS},ads.limit({self.nested_limit}){{{AD_FIELDS}}}",
+            'effective_status': list(LIVE_STATUSES)
+        }
+        pages = self.firewall.iter_api_pages(self._account_edge('adsets'), params)
+        adsets = list(pages.records())
+        if pages.failed:
+            return None
+
+        # Ad sets with more ads than fit inline get their remaining ads paged separately
+        for adset in adsets:
+            nested = adset.get('ads') or {}
+            if nested.get('paging', {}).get('next'):
+                more = self.firewall.iter_api_pages(f"{adset['id']}/ads", {'fields': AD_FIELDS})
+                adset['ads'] = {'data': list(more.records())}
+                if more.failed:
+                    return None
+        return adsets
+
+    def _fetch_updated(self, edge: str, fields: str, since: int) -> Optional[List[Dict]]:
+        params = {
+            'fields': fields,
+            'filtering': f'[{{"field":"updated_time","operator":"GREATER_THAN","value":{since}}}]',
+            'effective_status': list(UPDATE_STATUSES)
+        }
+        pages = self.firewall.iter_api_pages(self._account_edge(edge), params)
+        records = list(pages.records())
+        return None if pages.failed else records
+
+    def _replace(self, adsets: List[Dict]):
+        self._adsets, self._ads = {}, {}
+        self._adsets_by_campaign, self._ads_by_adset = {}, {}
+        for adset in adsets:
+            self._put_adset(adset)
+
+    def _put_adset(self, adset: Dict):
+        nested = (adset.pop('ads', None) or {}).get('data', [])
+        live = adset.get('status') in LIVE_STATUSES
+        # Deleting an ad set deletes its ads, whether or not they are reported too
+        self._drop_adset(adset['id'], keep_ads=live)
+        if live:
+            self._adsets[adset['id']] = adset
+            self._adsets_by_campaign.setdefault(adset.get('campaign_id'), set()).add(adset['id'])
+        for ad in nested:
+            ad.setdefault('adset_id', adset['id'])
+            ad.setdefault('campaign_id', adset.get('campaign_id'))
+            self._put_ad(ad)
+
+    def _drop_adset(self, adset_id: str, keep_ads: bool = False):
+        old = self._adsets.pop(adset_id, None)
+        if old is not None:
+            self._adsets_by_campaign.get(old.get('campaign_id'), set()).discard(adset_id)
+        if not keep_ads:
+            for ad_id in self._ads_by_adset.pop(adset_id, set()):
+                self._ads.pop(ad_id, None)
+
+    def _put_ad(self, ad: Dict):
+        old = self._ads.pop(ad['id'], None)
+        if old is not None:
+            self._ads_by_adset.get(old.get('adset_id'), set()).discard(ad['id'])
+        if ad.get('status') in LIVE_STATUSES:
+            self._ads[ad['id']] = ad
+            self._ads_by_adset.setdefault(ad.get('adset_id'), set()).add(ad['id'])
+
+    def adsets_for(self, campaign_id: str) -> List[Dict]:
+        with self._lock:
+            return [self._adsets[i] for i in sorted(self._adsets_by_campaign.get(campaign_id, ()))]
+
+    def ads_for_adsets(self, adset_ids: Iterable[str]) -> List[Dict]:
+        with self._lock:
+            return [self._ads[i] for adset_id in adset_ids for i in sorted(self._ads_by_adset.get(adset_id, ()))]
+
+    def ads_for_campaign(self, campaign_id: str) -> List[Dict]:
+        with self._lock:
+            return self.ads_for_adsets(sorted(self._adsets_by_campaign.get(campaign_id, ())))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'adsets': len(self._adsets),
+                'ads': len(self._ads),
+                'full_loads': self.full_loads,
+                'incremental_loads': self.incremental_loads
+            }
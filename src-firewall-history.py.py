@@ -0,0 +1,357 @@
+import csv
+import io
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .storage import connect
+
+ALERT_FIELDS = ['id', 'created_at', 'alert_type', 'severity', 'resource_id', 'message']
+SPEND_FIELDS = ['resource_id', 'day', 'samples', 'average_spend']
+MAX_PAGE_SIZE = 1000
+
+
+def create_history_indexes(cursor: sqlite3.Cursor):
+    """Indexes behind the history queries, created with the firewall schema
+
+    An index entry ends with the rowid, so (resource_id, id) and
+    (alert_type, id) hand back one resource's or type's alerts already in
+    id order. The time index turns time ranges into id ranges, and since
+    it also carries type and severity it answers summaries over a time
+    range without touching the table. Severity alone is too coarse to be
+    worth an index.
+    """
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_security_alerts_resource
+        ON security_alerts (resource_id, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_security_alerts_type
+        ON security_alerts (alert_type, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_security_alerts_time
+        ON security_alerts (created_at, alert_type, severity)
+    ''')
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[str]:
+    """ISO date or datetime as the UTC 'YYYY-MM-DD HH:MM:SS' text sqlite stores"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp {value!r}; use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class AlertHistory:
+    """Read-only queries over stored alerts and daily spend
+
+    Uses its own read-only connection, so under WAL a dashboard polling
+    this never waits on, or holds up, the writer thread. Pages are fetched
+    by keyset (id below the last one seen) rather than OFFSET, so page 500
+    costs the same as page 1, and each page is its own short read. Exports
+    walk the pages and never hold one snapshot open for the whole file.
+    """
+
+    def __init__(self, db_path: str, config: Dict = None):
+        self.db_path = db_path
+        self.conn = connect(db_path, config, read_only=True)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def alerts(self, resource_id: str = None, alert_type: str = None, severity: str = None,
+               since: str = None, until: str = None, cursor: int = None, limit: int = 100) -> Dict:
+        """One page of alerts, newest first
+
+        Pass the returned next_cursor back as cursor for the following page;
+        it is None on the last page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        for column, value in (('resource_id', resource_id), ('alert_type', alert_type)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if severity:
+            severities = [s.strip().upper() for s in severity.split(',') if s.strip()]
+            clauses.append(f"severity IN ({','.join('?' * len(severities))})")
+            params.extend(severities)
+        if cursor is not None:
+            clauses.append('id < ?')
+            params.append(int(cursor))
+
+        with self.lock:
+            bounds = self._id_bounds(parse_timestamp(since), parse_timestamp(until))
+            if bounds is None:
+                return {'alerts': [], 'next_cursor': None}
+            for op, bound in zip(('>=', '<'), bounds):
+                if bound is not None:
+                    clauses.append(f"id {op} ?")
+                    params.append(bound)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+            rows = self.conn.execute(f'''
+                SELECT {', '.join(ALERT_FIELDS)} FROM security_alerts
+                {where}
+                ORDER BY id DESC
+                LIMIT ?
+            ''', params + [limit + 1]).fetchall()
+
+        alerts = [dict(row) for row in rows[:limit]]
+        next_cursor = alerts[-1]['id'] if len(rows) > limit else None
+        return {'alerts': alerts, 'next_cursor': next_cursor}
+
+    def _id_bounds(self, since: Optional[str], until: Optional[str]) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        """Time range as an id range, or None when nothing can match
+
+        The single writer inserts alerts in order, so created_at never goes
+        down as id goes up. Each bound is a seek in the time index; the page
+        query then filters on the primary key, which combines with the
+        resource and type indexes.
+        """
+        bounds = []
+        for timestamp in (since, until):
+            if timestamp is None:
+                bounds.append(None)
+                continue
+            row = self.conn.execute('''
+                SELECT MIN(id) FROM security_alerts
+                WHERE created_at = (SELECT MIN(created_at) FROM security_alerts WHERE created_at >= ?)
+            ''', (timestamp,)).fetchone()
+            bounds.append(row[0])
+        low, high = bounds
+        if since is not None and low is None:
+            return None
+        return low, high
+
+    def iter_alerts(self, page_size: int = 500, **filters) -> Iterator[Dict]:
+        """Every matching alert, newest first, fetched a page at a time"""
+        cursor = filters.pop('cursor', None)
+        while True:
+            page = self.alerts(cursor=cursor, limit=page_size, **filters)
+            yield from page['alerts']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+    def summary(self, since: str = None, until: str = None, resource_id: str = None) -> List[Dict]:
+        """Alert counts by type and severity"""
+        clauses, params = [], []
+        for op, value in (('>=', parse_timestamp(since)), ('<', parse_timestamp(until))):
+            if value is not None:
+                clauses.append(f"created_at {op} ?")
+                params.append(value)
+        # Without statistics the planner prefers the type index to skip the
+        # GROUP BY sort and then reads every row; the time index is covering
+        source = 'security_alerts INDEXED BY idx_security_alerts_time'
+        if resource_id:
+            clauses.append('resource_id = ?')
+            params.append(resource_id)
+            source = 'security_alerts'
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self.lock:
+            rows = self.conn.execute(f'''
+                SELECT alert_type, severity, COUNT(*) AS count, MAX(created_at) AS last_seen
+                FROM {source}
+                {where}
+                GROUP BY alert_type, severity
+                ORDER BY count DESC
+            ''', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def spend(self, resource_id: str = None, since: str = None, until: str = None,
+              cursor: str = None, limit: int = 100) -> Dict:
+        """One page of daily spend averages from the baseline buckets
+
+        Buckets are keyed (metric_type, resource_id, bucket), so the table
+        itself is the covering index. since and until are days, both
+        included. The cursor is 'resource_id/day' of the last row returned.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = ["metric_type = 'daily_spend'"], []
+        if resource_id:
+            clauses.append('resource_id = ?')
+            params.append(resource_id)
+        for op, value in (('>=', since), ('<=', until)):
+            if value:
+                clauses.append(f"bucket {op} ?")
+                params.append(parse_timestamp(value)[:10])
+        if cursor:
+            last_resource, _, last_day = cursor.rpartition('/')
+            clauses.append('(resource_id, bucket) > (?, ?)')
+            params.extend([last_resource, last_day])
+        with self.lock:
+            rows = self.conn.execute(f'''
+                SELECT resource_id, bucket AS day, sample_count AS samples,
+                       value_sum / sample_count AS average_spend
+                FROM pattern_buckets
+                WHERE {' AND '.join(clauses)}
+                ORDER BY resource_id, bucket
+                LIMIT ?
+            ''', params + [limit + 1]).fetchall()
+        days = [dict(row) for row in rows[:limit]]
+        next_cursor = f"{days[-1]['resource_id']}/{days[-1]['day']}" if len(rows) > limit else None
+        return {'spend': days, 'next_cursor': next_cursor}
+
+    def iter_spend(self, page_size: int = 500, **filters) -> Iterator[Dict]:
+        cursor = filters.pop('cursor', None)
+        while True:
+            page = self.spend(cursor=cursor, limit=page_size, **filters)
+            yield from page['spend']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+
+def csv_chunks(rows: Iterable[Dict], fields: List[str]) -> Iterator[str]:
+    """CSV text a row at a time, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+def json_chunks(rows: Iterable[Dict]) -> Iterator[str]:
+    """A JSON array a row at a time, so exports never build the whole list"""
+    yield '['
+    for i, row in enumerate(rows):
+        yield (',\n' if i else '\n') + json.dumps(row, default=str)
+    yield '\n]\n'
+
+
+class HistoryServer:
+    """Local HTTP read API over one or more firewall databases
+
+    GET /alerts             a page of alerts (resource_id, type, severity,
+                            since, until, cursor, limit)
+    GET /alerts/summary     counts by type and severity
+    GET /alerts/export      every matching alert, streamed (format=csv|json)
+    GET /spend              a page of daily spend (resource_id, since, until)
+    GET /spend/export       daily spend, streamed
+
+    With several databases (one per client) pick one with tenant=.
+    """
+
+    def __init__(self, databases: Dict[str, str], config: Dict = None, storage_config: Dict = None):
+        config = config or {}
+        self.logger = logging.getLogger('HistoryServer')
+        self.histories = {name: AlertHistory(path, storage_config) for name, path in databases.items()}
+        self.httpd = ThreadingHTTPServer((config.get('host', '127.0.0.1'), config.get('port', 8090)),
+                                         self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "HistoryServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='history-http', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Serving alert history on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for history in self.histories.values():
+            history.close()
+
+    def history_for(self, tenant: Optional[str]) -> AlertHistory:
+        if tenant is None and len(self.histories) == 1:
+            return next(iter(self.histories.values()))
+        if tenant not in self.histories:
+            raise KeyError(f"Unknown tenant {tenant!r}; one of: {', '.join(sorted(self.histories))}")
+        return self.histories[tenant]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                server.logger.debug(format % args)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                try:
+                    history = server.history_for(query.pop('tenant', None))
+                    export = query.pop('format', 'json')
+                    filters = {
+                        'resource_id': query.get('resource_id'),
+                        'since': query.get('since'),
+                        'until': query.get('until')
+                    }
+                    # Bad input must fail before an export has sent its 200
+                    parse_timestamp(filters['since'])
+                    parse_timestamp(filters['until'])
+                    if url.path == '/alerts':
+                        self._send_json(history.alerts(alert_type=query.get('type'),
+                                                       severity=query.get('severity'),
+                                                       cursor=query.get('cursor'),
+                                                       limit=query.get('limit', 100), **filters))
+                    elif url.path == '/alerts/summary':
+                        self._send_json({'summary': history.summary(**filters)})
+                    elif url.path == '/alerts/export':
+                        rows = history.iter_alerts(alert_type=query.get('type'),
+                                                   severity=query.get('severity'), **filters)
+                        self._stream(rows, ALERT_FIELDS, export)
+                    elif url.path == '/spend':
+                        self._send_json(history.spend(cursor=query.get('cursor'),
+                                                      limit=query.get('limit', 100), **filters))
+                    elif url.path == '/spend/export':
+                        self._stream(history.iter_spend(**filters), SPEND_FIELDS, export)
+                    else:
+                        self._send_json({'error': 'not found'}, 404)
+                except KeyError as e:
+                    self._send_json({'error': str(e.args[0])}, 404)
+                except ValueError as e:
+                    self._send_json({'error': str(e)}, 400)
+                except sqlite3.Error as e:
+                    server.logger.error(f"History query failed: {e}")
+                    self._send_json({'error': 'database error'}, 500)
+
+            def _send_json(self, payload: Dict, status: int = 200):
+                body = json.dumps(payload, default=str).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, rows: Iterator[Dict], fields: List[str], export: str):
+                if export not in ('csv', 'json'):
+                    raise ValueError("format must be csv or json")
+                chunks = csv_chunks(rows, fields) if export == 'csv' else json_chunks(rows)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv' if export == 'csv' else 'application/json')
+                self.end_headers()
+                # Past this point an error can only cut the body short
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(chunk.encode())
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                except sqlite3.Error as e:
+                    server.logger.error(f"History export failed part way: {e}")
+
+        return Handler
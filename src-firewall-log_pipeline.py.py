@@ -0,0 +1,196 @@
+import atexit
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from api.metrics import REGISTRY
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_pipeline: Optional['LogPipeline'] = None
+_pipeline_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, so log shippers need no parsing rules"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through `burst` identical messages per logger and level every `window` seconds
+
+    The first message after a quiet window carries the number of repeats
+    that were dropped in between. Runs on the logging thread, before the
+    record is queued, so a warning repeated for every campaign costs a dict
+    lookup rather than a queue slot.
+    """
+
+    def __init__(self, burst: int = 5, window: float = 60.0, max_keys: int = 10000):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_keys = max_keys
+        self.suppressed = 0
+        # (logger, level, message) -> [window start, count, suppressed in window]
+        self._seen: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = record.created
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                if entry is None and len(self._seen) >= self.max_keys:
+                    self._prune(now)
+                self._seen[key] = [now, 1, 0]
+                if entry is not None and entry[2]:
+                    record.suppressed = entry[2]
+                    record.msg = f"{record.getMessage()} (repeated {entry[2]} more times)"
+                    record.args = None
+                return True
+            entry[1] += 1
+            if entry[1] <= self.burst:
+                return True
+            entry[2] += 1
+            self.suppressed += 1
+            return False
+
+    def _prune(self, now: float):
+        expired = [key for key, entry in self._seen.items() if now - entry[0] >= self.window]
+        for key in expired:
+            del self._seen[key]
+        if len(self._seen) >= self.max_keys:
+            self._seen.clear()
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of raising"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback here, where the arguments are
+        # still valid, but leave formatting to the listener's handlers
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class LogPipeline:
+    """Root logging through a queue drained by one listener thread
+
+    Callers only copy the record onto a bounded queue; formatting, the
+    console and the size-rotated log file are handled by the listener, so
+    a slow disk or a log storm never holds up a scan. When the queue is
+    full, records are dropped and counted.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        file_path = config.get('file_path', 'logs/firewall.log')
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            file_path, maxBytes=config.get('max_file_size', 10485760),
+            backupCount=config.get('backup_count', 5), encoding='utf-8', delay=True)
+        if config.get('compress', True):
+            file_handler.namer = lambda name: f"{name}.gz"
+            file_handler.rotator = _gzip_rotator
+        file_handler.setFormatter(JsonFormatter() if config.get('format', 'json') == 'json'
+                                  else logging.Formatter(TEXT_FORMAT))
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        rate_config = config.get('rate_limit', {})
+        self.rate_limit = RateLimitFilter(rate_config.get('burst', 5), rate_config.get('window', 60.0))
+        self.queue = queue.Queue(maxsize=config.get('queue_size', 10000))
+        self.handler = _NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(self.rate_limit)
+        self.listener = logging.handlers.QueueListener(self.queue, file_handler, console_handler)
+        self.level = config.get('level', 'INFO')
+        self._running = False
+
+    def start(self) -> "LogPipeline":
+        root = logging.getLogger()
+        root.setLevel(self.level)
+        root.addHandler(self.handler)
+        self.listener.start()
+        self._running = True
+        return self
+
+    def stop(self):
+        """Detach from the root logger and write out what is still queued"""
+        logging.getLogger().removeHandler(self.handler)
+        if not self._running:
+            return
+        self._running = False
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'suppressed': self.rate_limit.suppressed
+        }
+
+
+def configure_logging(config: Dict = None) -> LogPipeline:
+    """Install the process-wide log pipeline; later calls return the first one
+
+    Every tenant's firewall calls this, and all of them share one log file.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = LogPipeline(config).start()
+            atexit.register(_pipeline.stop)
+            REGISTRY.callback('vortex_log_records_dropped_total', 'Log records dropped because the queue was full',
+                              lambda: _pipeline.handler.dropped, kind='counter')
+            REGISTRY.callback('vortex_log_records_suppressed_total', 'Repeated log records dropped by rate limiting',
+                              lambda: _pipeline.rate_limit.suppressed, kind='counter')
+        return _pipeline
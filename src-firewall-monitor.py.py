@@ -1,34 +1,267 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
+from api.metrics import REGISTRY, TRACER
 from .core import VortexFirewall
+from .rules import RuleEngine
+from .snapshot import ScanSnapshot
+from .vector_scoring import HAVE_NUMPY, VectorScorer
+
+# Insight fields read by each check; a scan snapshot fetches their union once
+SPENDING_FIELDS = ['spend', 'impressions', 'clicks', 'ctr', 'actions']
+TRAFFIC_FIELDS = ['ctr', 'clicks', 'impressions']
+BUDGET_FIELDS = ['spend']
+
+SCAN_SECONDS = REGISTRY.histogram('vortex_scan_seconds', 'Wall time of full scans and of due-campaign batches',
+                                  buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+CHECK_SECONDS = REGISTRY.histogram('vortex_check_seconds', 'Time per SecurityMonitor check call',
+                                   buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
 
 class SecurityMonitor:
     """Real-time security monitoring engine"""
     
     def __init__(self, firewall: VortexFirewall):
         self.firewall = firewall
-        self.logger = logging.getLogger('SecurityMonitor')
+        self.logger = logging.getLogger(firewall.logger_name('SecurityMonitor'))
         self.alert_thresholds = self.firewall.config['security']['thresholds']
+        self.insight_fields = SPENDING_FIELDS + TRAFFIC_FIELDS + BUDGET_FIELDS
+        self.rules = RuleEngine(self.firewall.config, firewall.logger_name('RuleEngine'))
+        self.vector_scorer = None
+        if self.firewall.config['firewall'].get('vectorized_scoring', False):
+            if HAVE_NUMPY:
+                self.vector_scorer = VectorScorer(self)
+            else:
+                self.logger.warning("vectorized_scoring needs numpy; using per-campaign checks")
         
     def run_security_scan(self):
         """Execute comprehensive security scan"""
+        with TRACER.span('security_scan', tenant=self.firewall.config.get('tenant_id')), \
+                SCAN_SECONDS.time(kind='full'):
+            return self._run_security_scan()
+    
+    def _run_security_scan(self) -> Dict:
         self.logger.info("Starting security scan...")
+        self.rules.maybe_reload()
+        if self.firewall.hierarchy is not None:
+            self.firewall.hierarchy.refresh()
+        
+        snapshot = ScanSnapshot(self.firewall, self.insight_fields)
+        if self.firewall.config['firewall'].get('bulk_insights', True):
+            with TRACER.span('prefetch_insights'):
+                snapshot.prefetch_insights()
+        
+        campaigns = [c for c in snapshot.get_campaigns() if not self.rules.is_excluded(c)]
+        total_campaigns = len(campaigns)
+        tracker = self.firewall.change_tracker
+        if tracker is not None:
+            campaigns = tracker.plan(campaigns, snapshot.get_insights)
+        
+        with TRACER.span('evaluate', campaigns=len(campaigns)):
+            self._evaluate(campaigns, snapshot)
+        if tracker is not None:
+            tracker.persist()
+        # Alerts, baselines and fingerprints land in one transaction per scan
+        with TRACER.span('flush_writes'):
+            self.firewall.flush_alerts()
         
-        campaigns = self.firewall.get_active_campaigns()
+        stats = snapshot.summary()
+        stats['evaluated'] = len(campaigns)
+        stats['skipped_unchanged'] = total_campaigns - len(campaigns)
+        stats['http'] = self.firewall.http.latency_stats()
+        stats['rules'] = self.rules.timings(reset=True)
+        for name, timing in stats['rules'].items():
+            self.logger.debug(f"Rule {name}: {timing['calls']} calls, {timing['total_ms']:.1f} ms total, "
+                              f"{timing['max_ms']:.2f} ms max")
+        if self.firewall.response_cache is not None:
+            stats['response_cache'] = cache_stats = self.firewall.response_cache.stats()
+            self.logger.debug(f"Response cache: {cache_stats['hits']} hits, {cache_stats['revalidated']} revalidated, "
+                              f"{cache_stats['misses']} misses, {cache_stats['entries']} entries in memory")
+        self.logger.info(
+            f"Security scan completed: {stats['evaluated']}/{total_campaigns} campaigns evaluated, "
+            f"{stats['api_calls']} API calls ({stats['api_calls_saved']} saved by snapshot), "
+            f"avg latency {stats['http'].get('avg_ms', 0):.1f} ms over "
+            f"{stats['http']['connections_opened']} pooled connections"
+        )
+        return stats
+    
+    @SCAN_SECONDS.timed(kind='partial')
+    def scan_campaigns(self, campaigns: List[Dict], snapshot: Optional[ScanSnapshot] = None) -> Dict:
+        """Evaluate only the given campaigns, e.g. the ones a scheduler found due"""
+        self.rules.maybe_reload()
+        if self.firewall.hierarchy is not None:
+            self.firewall.hierarchy.refresh()
+        campaigns = [c for c in campaigns if not self.rules.is_excluded(c)]
+        if snapshot is None:
+            snapshot = ScanSnapshot(self.firewall, self.insight_fields, campaigns=campaigns)
+        snapshot.prefetch_insights()
+        self._evaluate(campaigns, snapshot)
+        self.firewall.flush_alerts()
+        
+        stats = snapshot.summary()
+        self.logger.debug(f"Evaluated {len(campaigns)} due campaigns with {stats['api_calls']} API calls")
+        return stats
+    
+    def _evaluate(self, campaigns: List[Dict], snapshot: ScanSnapshot):
+        """Run the checks over campaigns, then update baselines; callers flush the writes"""
+        concurrency = self.firewall.config['firewall'].get('scan_concurrency', 1)
         
-        for campaign in campaigns:
-            self.check_spending_anomalies(campaign)
-            self.check_traffic_quality(campaign)
-            self.check_budget_compliance(campaign)
+        if self.vector_scorer is not None and len(campaigns) > 1:
+            # Same verdicts as scan_campaign, computed for all campaigns in one pass;
+            # the checks that read past the insights still run per campaign below
+            verdicts = {}
+            for verdict in self.vector_scorer.score(campaigns, snapshot):
+                verdicts.setdefault(verdict['resource_id'], []).append(verdict)
+            check = lambda campaign: self._apply_verdicts(campaign, verdicts.get(campaign['id'], []), snapshot)
+        else:
+            check = lambda campaign: self.scan_campaign(campaign, snapshot)
+        
+        if concurrency > 1 and len(campaigns) > 1:
+            # Each campaign's checks run in order on one worker, so its alerts
+            # keep their sequence; only different campaigns overlap
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='scan') as executor:
+                list(executor.map(check, campaigns))
+        else:
+            for campaign in campaigns:
+                check(campaign)
             
-        self.firewall.update_normal_patterns()
-        self.logger.info("Security scan completed")
+        self.firewall.update_normal_patterns(snapshot, campaigns)
+    
+    def scan_campaign(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
+        """Run every check against a single campaign"""
+        self.check_spending_anomalies(campaign, snapshot)
+        self.check_spend_velocity(campaign, snapshot)
+        self.check_traffic_quality(campaign, snapshot)
+        self.check_budget_compliance(campaign, snapshot)
+        self.check_campaign_structure(campaign, snapshot)
+    
+    def _apply_verdicts(self, campaign: Dict, verdicts: List[Dict], snapshot: ScanSnapshot):
+        """scan_campaign with the vectorized verdicts standing in for the insight checks
+        
+        Keeps scan_campaign's order: spending, velocity, traffic and budget, structure.
+        """
+        for verdict in verdicts:
+            if verdict['check'] == 'spending':
+                self._record_verdict(verdict)
+        self.check_spend_velocity(campaign, snapshot)
+        for verdict in verdicts:
+            if verdict['check'] != 'spending':
+                self._record_verdict(verdict)
+        self.check_campaign_structure(campaign, snapshot)
+    
+    def _record_verdict(self, verdict: Dict):
+        self.firewall.record_alert(verdict['type'], verdict['message'], verdict['resource_id'], verdict['severity'])
+        if verdict['pause_reason']:
+            self.firewall.pause_campaign(verdict['resource_id'], verdict['pause_reason'])
+    
+    def check_campaign_structure(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
+        """Checks below campaign totals: countries, ad sets and ad content"""
+        if snapshot is None:
+            snapshot = ScanSnapshot(self.firewall, self.insight_fields, campaigns=[campaign])
+        self.check_geo_anomalies(campaign, snapshot)
+        self.check_adset_anomalies(campaign, snapshot)
+        self.check_security_rules(campaign, snapshot)
+    
+    @CHECK_SECONDS.timed(check='adset_anomalies')
+    def check_adset_anomalies(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
+        """Spend spikes and budget breaches in single ad sets, hidden in campaign totals"""
+        hierarchy = self.firewall.hierarchy
+        if hierarchy is None:
+            return
+        if snapshot is None:
+            snapshot = ScanSnapshot(self.firewall, self.insight_fields, campaigns=[campaign])
+        
+        for adset in hierarchy.adsets_for(campaign['id']):
+            adset_id = adset['id']
+            insights = snapshot.get_adset_insights(adset_id)
+            if not insights or 'spend' not in insights:
+                continue
+            spend = float(insights['spend'])
+            
+            historical_avg = self.get_historical_average(adset_id, 'adset_spend')
+            if historical_avg > 0:
+                spend_ratio = spend / historical_avg
+                if spend_ratio > self.alert_thresholds['spend_spike']:
+                    self.firewall.record_alert(
+                        "ADSET_SPEND_SPIKE",
+                        f"Ad set {adset.get('name', adset_id)} in campaign {campaign['id']} spending {spend} "
+                        f"vs average {historical_avg} (ratio: {spend_ratio:.2f})",
+                        adset_id,
+                        "HIGH" if spend_ratio > 3.0 else "MEDIUM"
+                    )
+                    # Pause only the offending ad set; the rest of the campaign keeps running
+                    if spend_ratio > 3.0 and self.firewall.config['security']['auto_actions'].get('pause_adset_high_risk'):
+                        self.firewall.pause_adset(adset_id, f"Ad set spending spike: {spend_ratio:.2f}x normal")
+            
+            daily_budget = float(adset.get('daily_budget') or 0)
+            if daily_budget > 0 and spend / daily_budget > self.alert_thresholds['budget_breach']:
+                self.firewall.record_alert(
+                    "ADSET_BUDGET_BREACH",
+                    f"Ad set {adset.get('name', adset_id)} spent {spend} vs daily budget {daily_budget} "
+                    f"(ratio: {spend / daily_budget:.2f})",
+                    adset_id,
+                    "HIGH"
+                )
+    
+    @CHECK_SECONDS.timed(check='geo_anomalies')
+    def check_geo_anomalies(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
+        """Detect spend moving to new or disallowed countries"""
+        baselines = self.firewall.country_baselines
+        if baselines is None:
+            return
+        if snapshot is None:
+            snapshot = ScanSnapshot(self.firewall, self.insight_fields, campaigns=[campaign])
+        
+        campaign_id = campaign['id']
+        country_spend = snapshot.get_country_spend(campaign_id)
+        total = sum(country_spend.values())
+        if total <= 0:
+            return
+        
+        allowed = self.rules.compiled.allowed_countries
+        usual = baselines.profile(campaign_id)
+        if not allowed and usual is None:
+            return
+        
+        flagged = {}
+        for country, spend in country_spend.items():
+            if spend <= 0:
+                continue
+            if allowed and country.upper() not in allowed:
+                flagged[country] = 'not allowed'
+            elif usual is not None and country not in usual:
+                flagged[country] = 'new'
+        
+        share = sum(country_spend[c] for c in flagged) / total
+        if share > self.rules.compiled.new_country_ratio:
+            self.firewall.record_alert(
+                "GEO_ANOMALY",
+                f"{share:.0%} of spend from unexpected countries: "
+                + ', '.join(f"{c} ({reason})" for c, reason in sorted(flagged.items())),
+                campaign_id,
+                "HIGH"
+            )
+            snapshot.flag_country_anomaly(campaign_id)
+    
+    @CHECK_SECONDS.timed(check='security_rules')
+    def check_security_rules(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
+        """Apply the client's security_rules (keywords, domains, countries)"""
+        if snapshot is None:
+            snapshot = ScanSnapshot(self.firewall, self.insight_fields, campaigns=[campaign])
+        for verdict in self.rules.evaluate(campaign, snapshot):
+            self.firewall.record_alert(verdict['type'], verdict['message'], campaign['id'], verdict['severity'])
+    
+    def _get_insights(self, campaign_id: str, fields: List[str], snapshot: Optional[ScanSnapshot]) -> Optional[Dict]:
+        """Read insights from the scan snapshot, or fetch them directly outside a scan"""
+        if snapshot is not None:
+            return snapshot.get_insights(campaign_id)
+        return self.firewall.get_campaign_insights(campaign_id, fields)
     
-    def check_spending_anomalies(self, campaign: Dict):
+    @CHECK_SECONDS.timed(check='spending_anomalies')
+    def check_spending_anomalies(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
         """Detect unusual spending patterns"""
         campaign_id = campaign['id']
-        insights = self.firewall.get_campaign_insights(campaign_id)
+        insights = self._get_insights(campaign_id, SPENDING_FIELDS, snapshot)
         
         if not insights or 'spend' not in insights:
             return
@@ -50,11 +283,59 @@ class SecurityMonitor:
                 # Auto-pause if critical
                 if spend_ratio > 3.0 and self.firewall.config['security']['auto_actions']['pause_campaign_critical']:
                     self.firewall.pause_campaign(campaign_id, f"Critical spending spike: {spend_ratio:.2f}x normal")
+                return
+        
+        # Spend well outside its usual spread for this hour, even if under the ratio
+        spend_z = self.firewall.baselines.zscore('daily_spend', campaign_id, current_spend)
+        if spend_z is not None and spend_z > self.alert_thresholds.get('spend_zscore', 4.0):
+            self.firewall.record_alert(
+                "SPENDING_SPIKE",
+                f"Campaign spending {current_spend} is {spend_z:.1f} standard deviations above its baseline",
+                campaign_id,
+                "MEDIUM"
+            )
+    
+    @CHECK_SECONDS.timed(check='spend_velocity')
+    def check_spend_velocity(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
+        """Detect spend per minute jumping since the previous scans
+        
+        Catches a hijack within one scan, while the yesterday+today total
+        the other checks read has barely moved.
+        """
+        velocity = self.firewall.velocity
+        if velocity is None:
+            return
+        campaign_id = campaign['id']
+        insights = self._get_insights(campaign_id, BUDGET_FIELDS, snapshot)
+        if not insights or 'spend' not in insights:
+            return
+        
+        # The insights window, and with it the running total, restarts at local midnight
+        reading = velocity.observe(campaign_id, float(insights['spend']), datetime.now().strftime('%Y-%m-%d'))
+        if reading is None or reading['ratio'] is None:
+            return
+        ratio = reading['ratio']
+        if ratio <= self.alert_thresholds.get('spend_velocity_spike', 4.0):
+            return
+        
+        change = (f", change: {reading['acceleration']:+.2f}/min per minute"
+                  if reading['acceleration'] is not None else "")
+        self.firewall.record_alert(
+            "SPEND_VELOCITY",
+            f"Campaign spending {reading['rate']:.2f}/min vs usual {reading['usual_rate']:.2f}/min "
+            f"(ratio: {ratio:.2f}{change})",
+            campaign_id,
+            "HIGH"
+        )
+        if (ratio > self.alert_thresholds.get('spend_velocity_pause', 8.0)
+                and self.firewall.config['security']['auto_actions']['pause_campaign_critical']):
+            self.firewall.pause_campaign(campaign_id, f"Spend velocity {ratio:.2f}x usual rate")
     
-    def check_traffic_quality(self, campaign: Dict):
+    @CHECK_SECONDS.timed(check='traffic_quality')
+    def check_traffic_quality(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
         """Analyze traffic patterns for suspicious activity"""
         campaign_id = campaign['id']
-        insights = self.firewall.get_campaign_insights(campaign_id, ['ctr', 'clicks', 'impressions'])
+        insights = self._get_insights(campaign_id, TRAFFIC_FIELDS, snapshot)
         
         if not insights:
             return
@@ -74,6 +355,15 @@ class SecurityMonitor:
                         campaign_id,
                         "MEDIUM"
                     )
+                else:
+                    ctr_z = self.firewall.baselines.zscore('ctr', campaign_id, current_ctr)
+                    if ctr_z is not None and ctr_z < -self.alert_thresholds.get('ctr_zscore', 3.0):
+                        self.firewall.record_alert(
+                            "CTR_ANOMALY",
+                            f"CTR {current_ctr} is {-ctr_z:.1f} standard deviations below its baseline",
+                            campaign_id,
+                            "MEDIUM"
+                        )
         
         # Check click velocity
         if 'clicks' in insights:
@@ -86,13 +376,14 @@ class SecurityMonitor:
                     "MEDIUM"
                 )
     
-    def check_budget_compliance(self, campaign: Dict):
+    @CHECK_SECONDS.timed(check='budget_compliance')
+    def check_budget_compliance(self, campaign: Dict, snapshot: Optional[ScanSnapshot] = None):
         """Check if campaign is exceeding budget limits"""
         campaign_id = campaign['id']
         daily_budget = float(campaign.get('daily_budget', 0))
         
         if daily_budget > 0:
-            insights = self.firewall.get_campaign_insights(campaign_id, ['spend'])
+            insights = self._get_insights(campaign_id, BUDGET_FIELDS, snapshot)
             if insights and 'spend' in insights:
                 spend = float(insights['spend'])
                 budget_ratio = spend / daily_budget
@@ -107,11 +398,5 @@ class SecurityMonitor:
     
     def get_historical_average(self, campaign_id: str, metric: str) -> float:
         """Get historical average for a metric"""
-        cursor = self.firewall.conn.cursor()
-        cursor.execute('''
-            SELECT AVG(value) FROM normal_patterns 
-            WHERE metric_type = ? AND resource_id = ?
-        ''', (metric, campaign_id))
-        
-        result = cursor.fetchone()
-        return result[0] if result and result[0] is not None else 0.0
\ No newline at end of file
+        average = self.firewall.baselines.average(metric, campaign_id)
+        return average if average is not None else 0.0
\ No newline at end of file
@@ -0,0 +1,193 @@
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional, Pattern
+from urllib.parse import urlparse
+
+import yaml
+
+CREATIVE_TEXT_FIELDS = ('title', 'body')
+CREATIVE_LINK_FIELDS = ('link_url', 'object_url')
+
+
+class CompiledRules:
+    """security_rules and monitoring settings prepared for fast matching
+
+    Keywords become one case-insensitive alternation regex, longest first so
+    "click here now" wins over "click here". Countries, domains and
+    exclusions become frozensets. allowed_countries and new_country_ratio
+    are read by SecurityMonitor.check_geo_anomalies.
+    """
+
+    def __init__(self, security_rules: Dict = None, monitoring: Dict = None, thresholds: Dict = None):
+        security_rules = security_rules or {}
+        monitoring = monitoring or {}
+        thresholds = thresholds or {}
+        self.keywords = self._compile_keywords(security_rules.get('suspicious_keywords') or [])
+        self.allowed_countries: FrozenSet[str] = frozenset(
+            str(c).upper() for c in security_rules.get('allowed_countries') or [])
+        self.approved_domains: FrozenSet[str] = frozenset(
+            self._normalise_host(d) for d in security_rules.get('approved_domains') or [])
+        self.excluded_campaigns: FrozenSet[str] = frozenset(
+            str(c).lower() for c in monitoring.get('excluded_campaigns') or [])
+        self.new_country_ratio = thresholds.get('new_country_ratio', 0.3)
+
+    @staticmethod
+    def _compile_keywords(keywords: List[str]) -> Optional[Pattern]:
+        words = sorted({str(k).strip().lower() for k in keywords if str(k).strip()}, key=len, reverse=True)
+        if not words:
+            return None
+        # Lookarounds instead of \b so keywords may start or end with punctuation
+        return re.compile(r'(?<!\w)(?:' + '|'.join(re.escape(w) for w in words) + r')(?!\w)', re.IGNORECASE)
+
+    @staticmethod
+    def _normalise_host(host: str) -> str:
+        host = str(host).strip().lower().rstrip('.')
+        return host[4:] if host.startswith('www.') else host
+
+    def domain_approved(self, url: str) -> bool:
+        """True if the URL's host or any parent domain is approved"""
+        host = urlparse(url if '//' in url else f"//{url}").hostname
+        if not host:
+            return True
+        labels = self._normalise_host(host).split('.')
+        return any('.'.join(labels[i:]) in self.approved_domains for i in range(len(labels)))
+
+    def is_excluded(self, campaign: Dict) -> bool:
+        return (str(campaign.get('id', '')).lower() in self.excluded_campaigns
+                or str(campaign.get('name', '')).lower() in self.excluded_campaigns)
+
+
+def suspicious_content_rule(rules: CompiledRules, campaign: Dict, snapshot) -> List[Dict]:
+    """Suspicious keywords in the campaign name or its ads' creative text"""
+    if rules.keywords is None:
+        return []
+    texts = [campaign.get('name') or '']
+    for ad in snapshot.get_ads(campaign['id']):
+        creative = ad.get('creative') or {}
+        texts.append(ad.get('name') or '')
+        texts.extend(creative.get(field) or '' for field in CREATIVE_TEXT_FIELDS)
+
+    found = sorted({m.group(0).lower() for text in texts for m in rules.keywords.finditer(text)})
+    if not found:
+        return []
+    return [{
+        'type': 'SUSPICIOUS_CONTENT',
+        'message': f"Suspicious keywords in campaign or ad copy: {', '.join(found)}",
+        'severity': 'MEDIUM'
+    }]
+
+
+def unapproved_domain_rule(rules: CompiledRules, campaign: Dict, snapshot) -> List[Dict]:
+    """Ads linking outside approved_domains, a common sign of a hijacked account"""
+    if not rules.approved_domains:
+        return []
+    domains = set()
+    for ad in snapshot.get_ads(campaign['id']):
+        creative = ad.get('creative') or {}
+        for field in CREATIVE_LINK_FIELDS:
+            url = creative.get(field)
+            if url and not rules.domain_approved(url):
+                domains.add(urlparse(url if '//' in url else f"//{url}").hostname)
+    if not domains:
+        return []
+    return [{
+        'type': 'UNAPPROVED_DOMAIN',
+        'message': f"Ads link to unapproved domains: {', '.join(sorted(domains))}",
+        'severity': 'HIGH'
+    }]
+
+
+DEFAULT_RULES = [
+    ('suspicious_content', suspicious_content_rule),
+    ('unapproved_domain', unapproved_domain_rule),
+]
+
+
+class RuleEngine:
+    """Client security rules evaluated per campaign behind SecurityMonitor
+
+    Rules are compiled once from the client config and recompiled when the
+    client YAML's mtime changes, so edits apply on the next scan without a
+    restart. A reload that fails to parse keeps the previous rules. Each
+    rule's evaluation time is tracked for the scan log.
+    """
+
+    def __init__(self, config: Dict, logger_name: str = 'RuleEngine'):
+        self.logger = logging.getLogger(logger_name)
+        self.thresholds = config.get('security', {}).get('thresholds', {})
+        self.path = config.get('client_config_path')
+        self._rules_lock = threading.Lock()
+        self._mtime = self._stat()
+        self.compiled = CompiledRules(config.get('security_rules'), config.get('monitoring'), self.thresholds)
+        self._rules: List = list(DEFAULT_RULES)
+        # rule name -> [calls, total seconds, max seconds]
+        self._timings: Dict[str, List[float]] = {}
+
+    def register(self, name: str, rule: Callable[[CompiledRules, Dict, object], List[Dict]]):
+        """Add a rule; it returns a list of {type, message, severity} dicts"""
+        with self._rules_lock:
+            self._rules.append((name, rule))
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime if self.path else None
+        except OSError:
+            return None
+
+    def maybe_reload(self) -> bool:
+        """Recompile the rules if the client YAML changed since the last load"""
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                client_config = yaml.safe_load(f) or {}
+            compiled = CompiledRules(client_config.get('security_rules'), client_config.get('monitoring'),
+                                     self.thresholds)
+        except Exception as e:
+            self.logger.error(f"Keeping previous security rules, reload of {self.path} failed: {e}")
+            self._mtime = mtime
+            return False
+
+        with self._rules_lock:
+            self.compiled = compiled
+            self._mtime = mtime
+        self.logger.info(f"Reloaded security rules from {self.path}")
+        return True
+
+    def is_excluded(self, campaign: Dict) -> bool:
+        return self.compiled.is_excluded(campaign)
+
+    def evaluate(self, campaign: Dict, snapshot) -> List[Dict]:
+        """Alerts every rule raises for a campaign"""
+        with self._rules_lock:
+            compiled, rules = self.compiled, list(self._rules)
+
+        verdicts = []
+        for name, rule in rules:
+            started = time.perf_counter()
+            try:
+                verdicts.extend(rule(compiled, campaign, snapshot))
+            except Exception as e:
+                self.logger.error(f"Rule {name} failed for campaign {campaign.get('id')}: {e}")
+            elapsed = time.perf_counter() - started
+            with self._rules_lock:
+                timing = self._timings.setdefault(name, [0, 0.0, 0.0])
+                timing[0] += 1
+                timing[1] += elapsed
+                timing[2] = max(timing[2], elapsed)
+        return verdicts
+
+    def timings(self, reset: bool = False) -> Dict[str, Dict]:
+        """Per-rule call count, total and max evaluation time in ms"""
+        with self._rules_lock:
+            result = {
+                name: {'calls': calls, 'total_ms': total * 1000, 'max_ms': worst * 1000}
+                for name, (calls, total, worst) in self._timings.items()
+            }
+            if reset:
+                self._timings = {}
+        return result
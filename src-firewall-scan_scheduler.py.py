@@ -0,0 +1,290 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, time as dt_time, timezone
+from typing import Dict, List, Optional
+
+from api.metrics import REGISTRY
+from .snapshot import ScanSnapshot
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+
+class WorkingHours:
+    """The client's monitoring.working_hours window, in its own timezone"""
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.logger = logging.getLogger('WorkingHours')
+        self.start = self._parse(config.get('start', '00:00'))
+        self.end = self._parse(config.get('end', '23:59'))
+        self.tz = timezone.utc
+        tz_name = config.get('timezone', 'UTC')
+        if ZoneInfo is not None and tz_name != 'UTC':
+            try:
+                self.tz = ZoneInfo(tz_name)
+            except (ZoneInfoNotFoundError, ValueError):
+                self.logger.warning(f"Unknown timezone {tz_name}, using UTC for working hours")
+
+    @staticmethod
+    def _parse(value: str) -> dt_time:
+        hours, minutes = str(value).split(':')
+        return dt_time(int(hours), int(minutes))
+
+    def contains(self, when: float) -> bool:
+        local = datetime.fromtimestamp(when, self.tz).time()
+        if self.start <= self.end:
+            return self.start <= local < self.end
+        # Window wraps midnight, e.g. 22:00-06:00
+        return local >= self.start or local < self.end
+
+
+class CampaignScanScheduler:
+    """Priority queue of per-campaign due times replacing the fixed scan loop
+
+    Every campaign has its own next-due time. Campaigns that spend fast or
+    alerted recently come round sooner, idle paused campaigns rarely, and the
+    whole schedule tightens outside the client's working hours when nobody is
+    watching the account. Due campaigns are evaluated in small batches as
+    they come due, so API load is spread evenly instead of arriving in one
+    burst per interval. New campaigns are first due at a fixed offset within
+    initial_spread, so a startup or a refresh does not queue the whole
+    account at once. With incremental_scan enabled, due campaigns whose
+    fingerprint has not changed are rescheduled without being evaluated.
+    """
+
+    def __init__(self, monitor, config: Dict = None):
+        config = config or {}
+        self.monitor = monitor
+        self.firewall = monitor.firewall
+        self.logger = logging.getLogger(self.firewall.logger_name('ScanScheduler'))
+        self.base_interval = self.firewall.config['firewall']['monitoring_interval']
+        self.min_interval = config.get('min_interval', 60)
+        self.max_interval = config.get('max_interval', self.base_interval * 6)
+        self.high_spend_rate = config.get('high_spend_rate', 50.0)
+        self.off_hours_factor = config.get('off_hours_factor', 0.5)
+        self.hot_seconds = config.get('anomaly_hot_seconds', 3600)
+        self.batch_size = config.get('batch_size', 50)
+        self.refresh_interval = config.get('refresh_interval', self.base_interval)
+        self.initial_spread = config.get('initial_spread', self.base_interval)
+        self.max_sleep = config.get('tick', 5.0)
+        self.working_hours = WorkingHours(self.firewall.config.get('monitoring', {}).get('working_hours'))
+
+        self._lock = threading.Lock()
+        # (due_at, seq, campaign_id); entries whose due_at no longer matches
+        # _due_at are stale and skipped when popped
+        self._heap: List = []
+        self._seq = itertools.count()
+        self._due_at: Dict[str, float] = {}
+        self._campaigns: Dict[str, Dict] = {}
+        # campaign_id -> (spend, observed_at) from the previous evaluation
+        self._last_spend: Dict[str, tuple] = {}
+        self._next_refresh = 0.0
+        self._lags = deque(maxlen=1000)
+        self.evaluations = 0
+        self.skipped_unchanged = 0
+        self.failed_batches = 0
+        self.register_metrics()
+
+    def register_metrics(self):
+        """Queue depth and lag as scrape-time gauges, next to the scan metrics"""
+        tenant = self.firewall.config.get('tenant_id', 'default')
+        for name, key, help_text, kind in (
+            ('vortex_scheduler_queue_depth', 'queue_depth', 'Campaigns on the adaptive schedule', 'gauge'),
+            ('vortex_scheduler_overdue', 'overdue', 'Campaigns past their due time', 'gauge'),
+            ('vortex_scheduler_lag_avg_seconds', 'lag_avg', 'Average delay between due time and evaluation', 'gauge'),
+            ('vortex_scheduler_lag_max_seconds', 'lag_max', 'Largest delay between due time and evaluation', 'gauge'),
+            ('vortex_scheduler_evaluations_total', 'evaluations', 'Campaign evaluations by the scheduler', 'counter'),
+            ('vortex_scheduler_skipped_unchanged_total', 'skipped_unchanged',
+             'Due campaigns skipped because nothing changed', 'counter'),
+            ('vortex_scheduler_failed_batches_total', 'failed_batches', 'Scheduler batches that raised', 'counter')
+        ):
+            REGISTRY.callback(name, help_text, lambda key=key: self.stats()[key], kind=kind, tenant=tenant)
+
+    def refresh_campaigns(self, now: float):
+        """Sync the schedule with the account's current campaign list"""
+        # Set first, so a refresh that raises is not retried on every tick
+        self._next_refresh = now + self.refresh_interval
+        campaigns = self.firewall.get_active_campaigns()
+        if not campaigns and self._campaigns:
+            # An empty list is more likely a failed request than an emptied account
+            self.logger.warning("Campaign refresh returned nothing, keeping the current schedule")
+            return
+
+        current = {c['id']: c for c in campaigns}
+        with self._lock:
+            for campaign_id in set(self._campaigns) - set(current):
+                del self._campaigns[campaign_id]
+                self._due_at.pop(campaign_id, None)
+                self._last_spend.pop(campaign_id, None)
+            for campaign_id, campaign in current.items():
+                if campaign_id not in self._campaigns:
+                    self._push(campaign_id, now + self._offset(campaign_id))
+                self._campaigns[campaign_id] = campaign
+
+    def _offset(self, campaign_id: str) -> float:
+        """Fixed per-campaign delay before a new campaign is first due"""
+        return zlib.crc32(campaign_id.encode()) % 1000 / 1000 * self.initial_spread
+
+    def _push(self, campaign_id: str, due_at: float):
+        self._due_at[campaign_id] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._seq), campaign_id))
+
+    def pop_due(self, now: float) -> List[Dict]:
+        """Remove and return up to batch_size campaigns whose time has come"""
+        batch = []
+        with self._lock:
+            while self._heap and len(batch) < self.batch_size:
+                due_at, _, campaign_id = self._heap[0]
+                if self._due_at.get(campaign_id) != due_at:
+                    heapq.heappop(self._heap)
+                    continue
+                if due_at > now:
+                    break
+                heapq.heappop(self._heap)
+                del self._due_at[campaign_id]
+                self._lags.append(now - due_at)
+                batch.append(self._campaigns[campaign_id])
+        return batch
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            while self._heap and self._due_at.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def retry_interval(self, now: float) -> float:
+        """Interval for a campaign whose evaluation failed before its insights were known"""
+        interval = self.base_interval
+        if not self.working_hours.contains(now):
+            interval *= self.off_hours_factor
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def interval_for(self, campaign: Dict, insights: Optional[Dict], now: float) -> float:
+        """Seconds until a campaign should be evaluated again"""
+        campaign_id = campaign['id']
+        spend = float((insights or {}).get('spend', 0) or 0)
+        last_alert = self.firewall.last_alert_at.get(campaign_id)
+
+        if last_alert is not None and now - last_alert < self.hot_seconds:
+            interval = self.min_interval
+        elif campaign.get('status') == 'PAUSED' and spend == 0:
+            interval = self.max_interval
+        else:
+            # Spend rate from the delta since the last evaluation; the first
+            # time round, the average over the insights window
+            previous = self._last_spend.get(campaign_id)
+            if previous is not None and now > previous[1] and spend >= previous[0]:
+                rate = (spend - previous[0]) * 3600 / (now - previous[1])
+            else:
+                rate = spend / 24.0
+            interval = self.base_interval / (1 + rate / self.high_spend_rate)
+
+        if not self.working_hours.contains(now):
+            interval *= self.off_hours_factor
+        self._last_spend[campaign_id] = (spend, now)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def run_due(self, now: float = None) -> int:
+        """Evaluate one batch of due campaigns and reschedule them"""
+        now = now or time.time()
+        if now >= self._next_refresh:
+            self.refresh_campaigns(now)
+
+        batch = self.pop_due(now)
+        if not batch:
+            return 0
+
+        snapshot = ScanSnapshot(self.firewall, self.monitor.insight_fields, campaigns=batch)
+        tracker = self.firewall.change_tracker
+        evaluated = batch
+        failed = False
+        try:
+            if tracker is not None:
+                snapshot.prefetch_insights()
+                evaluated = tracker.plan(batch, snapshot.get_insights)
+                tracker.persist()
+            if evaluated:
+                self.monitor.scan_campaigns(evaluated, snapshot)
+        except Exception as e:
+            # One bad batch must not stop monitoring for the rest of the account
+            failed = True
+            self.logger.exception(f"Scan of {len(batch)} due campaigns failed: {e}")
+
+        # Read insights before taking the lock: a campaign the batch fetch
+        # missed costs a request, which must not hold up pop_due or stats.
+        # After a failure only what the batch got to fetch is used
+        known = {}
+        for campaign in batch:
+            known[campaign['id']] = (snapshot.cached_insights(campaign['id']) if failed
+                                     else snapshot.get_insights(campaign['id']))
+
+        finished = time.time()
+        with self._lock:
+            for campaign in batch:
+                if campaign['id'] not in self._campaigns:
+                    continue
+                insights = known[campaign['id']]
+                if failed and insights is None:
+                    interval = self.retry_interval(finished)
+                else:
+                    interval = self.interval_for(campaign, insights, finished)
+                self._push(campaign['id'], finished + interval)
+            if failed:
+                self.failed_batches += 1
+            else:
+                self.evaluations += len(evaluated)
+                self.skipped_unchanged += len(batch) - len(evaluated)
+        return len(batch)
+
+    def stats(self) -> Dict:
+        """Queue depth and how late campaigns are being picked up"""
+        now = time.time()
+        with self._lock:
+            lags = list(self._lags)
+            overdue = sum(1 for campaign_id, due_at in self._due_at.items() if due_at <= now)
+            depth = len(self._due_at)
+        return {
+            'queue_depth': depth,
+            'overdue': overdue,
+            'lag_avg': sum(lags) / len(lags) if lags else 0.0,
+            'lag_max': max(lags) if lags else 0.0,
+            'evaluations': self.evaluations,
+            'skipped_unchanged': self.skipped_unchanged,
+            'failed_batches': self.failed_batches
+        }
+
+    def run_forever(self):
+        """Evaluate campaigns as they come due until interrupted"""
+        next_report = time.time() + self.refresh_interval
+        while True:
+            try:
+                if self.run_due():
+                    # More may already be due; keep draining before sleeping
+                    continue
+            except Exception as e:
+                # e.g. the campaign refresh; the next tick tries again
+                self.logger.exception(f"Scheduler tick failed: {e}")
+
+            now = time.time()
+            if now >= next_report:
+                stats = self.stats()
+                self.logger.info(
+                    f"Scheduler: {stats['queue_depth']} campaigns queued, {stats['overdue']} overdue, "
+                    f"lag avg {stats['lag_avg']:.1f}s max {stats['lag_max']:.1f}s, "
+                    f"{stats['evaluations']} evaluations, {stats['skipped_unchanged']} skipped unchanged"
+                )
+                with self._lock:
+                    self._lags.clear()
+                next_report = now + self.refresh_interval
+
+            wake = min(self.next_due() or now + self.max_sleep, self._next_refresh, now + self.max_sleep)
+            time.sleep(max(wake - now, 0.05))
@@ -0,0 +1,167 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+_NOT_FETCHED = object()
+
+
+class ScanSnapshot:
+    """Scan-scoped view of campaigns and insights, fetched at most once per cycle
+
+    Safe to share between scan worker threads.
+    """
+
+    def __init__(self, firewall, insight_fields: Iterable[str], campaigns: List[Dict] = None):
+        self.firewall = firewall
+        self.logger = logging.getLogger('ScanSnapshot')
+        # Union of the fields every consumer needs, order preserved for stable URLs
+        self.insight_fields = list(dict.fromkeys(insight_fields))
+        # A snapshot opened for a given subset of campaigns never lists the account
+        self._campaigns = list(campaigns) if campaigns is not None else None
+        self._scoped = campaigns is not None
+        self._insights = {}
+        self._ads = None
+        self._adset_insights = None
+        self._country_spend = None
+        # Campaigns whose breakdown was fetched for this snapshot, not served from cache
+        self._country_fetched = set()
+        self._country_flagged = set()
+        self._start_calls = firewall.api_call_count
+        self._lock = threading.RLock()
+        self.lookups = 0
+
+    def get_campaigns(self) -> List[Dict]:
+        """Active campaigns for this scan, fetched on first use"""
+        with self._lock:
+            self.lookups += 1
+            return self._load_campaigns()
+
+    def _load_campaigns(self) -> List[Dict]:
+        with self._lock:
+            if self._campaigns is None:
+                self._campaigns = self.firewall.get_active_campaigns()
+            return self._campaigns
+
+    def prefetch_insights(self):
+        """Load insights for all campaigns in bulk instead of one request each
+
+        Tries the account-level insights edge first and falls back to Graph
+        batch requests. Campaigns the bulk calls could not cover are fetched
+        individually on first use.
+        """
+        campaign_ids = [c['id'] for c in self._load_campaigns() if c['id'] not in self._insights]
+        if not campaign_ids:
+            return
+
+        # For a handful of campaigns a batch request is cheaper than the whole account
+        by_campaign = None if self._scoped else self.firewall.get_account_insights(self.insight_fields)
+        if by_campaign is not None:
+            for campaign_id in campaign_ids:
+                # No row means no delivery in the window, same as an empty per-campaign reply
+                self._insights[campaign_id] = by_campaign.get(campaign_id)
+            return
+
+        if not self._scoped:
+            self.logger.warning("Account-level insights failed, falling back to batch requests")
+        self._insights.update(self.firewall.get_campaign_insights_batch(campaign_ids, self.insight_fields))
+
+    def get_insights(self, campaign_id: str) -> Optional[Dict]:
+        """Insights record for a campaign; every caller gets the same record"""
+        with self._lock:
+            self.lookups += 1
+            insights = self._insights.get(campaign_id, _NOT_FETCHED)
+        if insights is _NOT_FETCHED:
+            # Fetch outside the lock so workers on other campaigns are not serialised
+            insights = self.firewall.get_campaign_insights(campaign_id, self.insight_fields)
+            with self._lock:
+                insights = self._insights.setdefault(campaign_id, insights)
+        return insights
+
+    def cached_insights(self, campaign_id: str) -> Optional[Dict]:
+        """Insights already fetched for a campaign, None when they never were"""
+        with self._lock:
+            insights = self._insights.get(campaign_id, _NOT_FETCHED)
+        return None if insights is _NOT_FETCHED else insights
+
+    def _scope(self) -> Optional[List[str]]:
+        """Campaign ids to filter account-wide requests by, None for the whole account"""
+        return [c['id'] for c in self._campaigns] if self._scoped else None
+
+    def get_ads(self, campaign_id: str) -> List[Dict]:
+        """Ads of a campaign; the whole account's ads are fetched on first use"""
+        hierarchy = self.firewall.hierarchy
+        if hierarchy is not None:
+            # The hierarchy index already holds every ad, kept current incrementally
+            return hierarchy.ads_for_campaign(campaign_id)
+        with self._lock:
+            self.lookups += 1
+            if self._ads is None:
+                self._ads = self.firewall.get_account_ads(self._scope()) or {}
+            return self._ads.get(campaign_id, [])
+
+    def _known_spend(self, campaign_id: str) -> Optional[float]:
+        """Spend from insights already fetched, without requesting any"""
+        with self._lock:
+            insights = self._insights.get(campaign_id, _NOT_FETCHED)
+        if insights is _NOT_FETCHED:
+            return None
+        return float((insights or {}).get('spend', 0) or 0)
+
+    def get_adset_insights(self, adset_id: str) -> Optional[Dict]:
+        """Insights for an ad set, from one account-wide level=adset request"""
+        with self._lock:
+            self.lookups += 1
+            if self._adset_insights is None:
+                self._adset_insights = self.firewall.get_adset_insights(self._scope()) or {}
+            return self._adset_insights.get(adset_id)
+
+    def get_country_spend(self, campaign_id: str) -> Dict[str, float]:
+        """Spend by country for a campaign, from one account-wide breakdown"""
+        with self._lock:
+            self.lookups += 1
+            return self._load_country_spend().get(campaign_id, {})
+
+    def _load_country_spend(self) -> Dict[str, Dict[str, float]]:
+        """Called with the lock held"""
+        if self._country_spend is None:
+            cache = self.firewall.country_cache
+            if cache is not None:
+                self._country_spend, self._country_fetched = cache.get(
+                    self._load_campaigns(), self._known_spend, self._scoped)
+            else:
+                self._country_spend = self.firewall.get_country_spend(self._scope()) or {}
+                self._country_fetched = set(self._country_spend)
+        return self._country_spend
+
+    def flag_country_anomaly(self, campaign_id: str):
+        """Keep a campaign's breakdown out of its country profile this scan"""
+        with self._lock:
+            self._country_flagged.add(campaign_id)
+
+    def new_country_spend(self, campaign_ids: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """Breakdowns to learn from: fetched for this snapshot and not flagged"""
+        with self._lock:
+            country_spend = self._load_country_spend()
+            return {
+                campaign_id: country_spend.get(campaign_id, {}) for campaign_id in campaign_ids
+                if campaign_id in self._country_fetched and campaign_id not in self._country_flagged
+            }
+
+    @property
+    def api_calls(self) -> int:
+        """Graph requests made since the snapshot was opened"""
+        return self.firewall.api_call_count - self._start_calls
+
+    @property
+    def api_calls_saved(self) -> int:
+        """Calls the per-check fetching would have made on top of this scan's"""
+        return max(self.lookups - self.api_calls, 0)
+
+    def summary(self) -> Dict:
+        """Call accounting for the scan log"""
+        return {
+            'campaigns': len(self._campaigns or []),
+            'api_calls': self.api_calls,
+            'lookups': self.lookups,
+            'api_calls_saved': self.api_calls_saved
+        }
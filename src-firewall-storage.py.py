@@ -0,0 +1,170 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from api.metrics import REGISTRY
+
+_STOP = object()
+
+SQLITE_SECONDS = REGISTRY.histogram(
+    'vortex_sqlite_seconds', 'Time in sqlite by operation: queued writes, commits and baseline reads',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
+
+
+def connect(db_path: str, config: Dict = None, read_only: bool = False) -> sqlite3.Connection:
+    """SQLite connection with the firewall's pragmas applied
+
+    WAL lets readers keep working while the writer commits, and with WAL
+    synchronous=NORMAL only syncs at checkpoints instead of every commit.
+    """
+    config = config or {}
+    if read_only:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {int(config.get('busy_timeout_ms', 5000))}")
+    if config.get('wal', True) and not read_only:
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f"PRAGMA synchronous = {config.get('synchronous', 'NORMAL')}")
+    conn.execute(f"PRAGMA cache_size = -{int(config.get('cache_size_kb', 16384))}")
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+class SQLiteWriter:
+    """Single thread that owns every write to the firewall database
+
+    Components queue statements instead of committing on the calling
+    thread. The writer keeps one transaction open and commits it when
+    flush() is called, normally once at the end of a scan, or earlier once
+    max_batch_rows rows or max_commit_delay seconds have accumulated.
+    """
+
+    def __init__(self, db_path: str, config: Dict = None, logger_name: str = 'SQLiteWriter'):
+        config = config or {}
+        self.db_path = db_path
+        self.config = config
+        self.logger = logging.getLogger(logger_name)
+        self.max_batch_rows = config.get('max_batch_rows', 5000)
+        self.max_commit_delay = config.get('max_commit_delay', 1.0)
+
+        self._queue = queue.Queue()
+        self._committed = threading.Condition()
+        self._submitted = 0
+        self._done = 0
+        self.rows_written = 0
+        self.transactions = 0
+        self.errors = 0
+        # Time spent executing and committing, for rows per second
+        self.busy_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def executemany(self, sql: str, rows: Iterable[Tuple]):
+        """Queue a statement for many rows; returns immediately"""
+        rows = list(rows)
+        if rows:
+            self.run(lambda cursor: cursor.executemany(sql, rows), len(rows))
+
+    def execute(self, sql: str, params: Tuple = ()):
+        """Queue a single statement; returns immediately"""
+        self.run(lambda cursor: cursor.execute(sql, params))
+
+    def run(self, work: Callable[[sqlite3.Cursor], object], rows: int = 1):
+        """Queue work(cursor) to run on the writer's connection"""
+        with self._committed:
+            self._submitted += 1
+        self._queue.put((work, rows))
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Commit everything queued so far and wait for it
+
+        Returns False if the writes were still queued after timeout seconds.
+        """
+        with self._committed:
+            target = self._submitted
+        self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        with self._committed:
+            while self._done < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._committed.wait(remaining)
+        return True
+
+    def stop(self):
+        """Commit what is queued and close the writer connection"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> Dict:
+        with self._committed:
+            return {
+                'queued': self._submitted - self._done,
+                'rows_written': self.rows_written,
+                'transactions': self.transactions,
+                'errors': self.errors,
+                'rows_per_second': self.rows_written / self.busy_seconds if self.busy_seconds else 0.0
+            }
+
+    def _run(self):
+        conn = connect(self.db_path, self.config)
+        cursor = conn.cursor()
+        pending, pending_rows, opened, busy = 0, 0, None, 0.0
+        while True:
+            timeout = None if opened is None else max(self.max_commit_delay - (time.monotonic() - opened), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP:
+                work, rows = item
+                started = time.perf_counter()
+                try:
+                    work(cursor)
+                except Exception as e:
+                    # Only the failed work is lost; the rest of the batch still commits.
+                    # Anything but a database error is a bug in the caller, so keep its traceback
+                    self.logger.error(f"Database write failed: {e}", exc_info=not isinstance(e, sqlite3.Error))
+                    with self._committed:
+                        self.errors += 1
+                elapsed = time.perf_counter() - started
+                busy += elapsed
+                SQLITE_SECONDS.observe(elapsed, op='write')
+                pending += 1
+                pending_rows += rows
+                if opened is None:
+                    opened = time.monotonic()
+                if pending_rows < self.max_batch_rows:
+                    continue
+
+            if pending:
+                self._commit(conn, pending, pending_rows, busy)
+                pending, pending_rows, opened, busy = 0, 0, None, 0.0
+            if item is _STOP:
+                conn.close()
+                return
+
+    def _commit(self, conn: sqlite3.Connection, pending: int, rows: int, busy: float):
+        started = time.perf_counter()
+        try:
+            conn.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Commit of {rows} rows failed: {e}")
+            conn.rollback()
+            rows = 0
+            with self._committed:
+                self.errors += 1
+        elapsed = time.perf_counter() - started
+        SQLITE_SECONDS.observe(elapsed, op='commit')
+        with self._committed:
+            self._done += pending
+            self.rows_written += rows
+            self.transactions += 1
+            self.busy_seconds += busy + elapsed
+            self._committed.notify_all()
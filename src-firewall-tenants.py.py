@@ -0,0 +1,118 @@
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+from .alert_pipeline import AlertPipeline
+from .alerts import AlertSystem
+from .core import VortexFirewall
+from .monitor import SecurityMonitor
+
+
+def load_tenant_configs(base_config: Dict, clients_dir: Path) -> Dict[str, Dict]:
+    """Merge each client YAML in clients_dir over the base config
+
+    The file stem becomes the tenant id. Each tenant gets its own sqlite file
+    so campaign history and alerts never mix between clients.
+    """
+    tenants = {}
+    for path in sorted(Path(clients_dir).glob('*.yaml')):
+        with open(path, 'r') as f:
+            client_config = yaml.safe_load(f) or {}
+
+        config = copy.deepcopy(base_config)
+        config.update(client_config)
+        config['tenant_id'] = path.stem
+        config['client_config_path'] = str(path)
+        config['firewall'] = dict(config.get('firewall', {}))
+        config['firewall'].setdefault('database_path', f"data/tenants/{path.stem}.db")
+        tenants[path.stem] = config
+    return tenants
+
+
+class Tenant:
+    """One client account: its own firewall, monitor, alerting and schedule"""
+
+    def __init__(self, tenant_id: str, config: Dict):
+        self.tenant_id = tenant_id
+        self.config = config
+        self.firewall = VortexFirewall(config)
+        self.monitor = SecurityMonitor(self.firewall)
+        self.alert_system = AlertSystem(config)
+        self.alert_pipeline = AlertPipeline(self.firewall, self.alert_system,
+                                            config.get('alerts', {}).get('pipeline'))
+        self.firewall.attach_alert_pipeline(self.alert_pipeline)
+        self.interval = config['firewall']['monitoring_interval']
+        self.next_due = 0.0
+        self.running = False
+        self.last_scan: Optional[Dict] = None
+        self.failures = 0
+
+
+class TenantManager:
+    """Runs scans for many client accounts fairly from one process
+
+    All tenants share the process-wide GraphSession, so they draw on one
+    connection pool and one rate-limit budget. Due tenants are dispatched
+    to a bounded worker pool in rotating order, and a tenant is never scanned
+    twice at once, so a slow account cannot starve the others.
+    """
+
+    def __init__(self, base_config: Dict, clients_dir: Path):
+        self.logger = logging.getLogger('TenantManager')
+        self.tenants: List[Tenant] = [
+            Tenant(tenant_id, config)
+            for tenant_id, config in load_tenant_configs(base_config, clients_dir).items()
+        ]
+        firewall_config = base_config.get('firewall', {})
+        self.max_workers = firewall_config.get('tenant_workers', 4)
+        self.tick = firewall_config.get('tenant_tick', 1.0)
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def due_tenants(self, now: float) -> List[Tenant]:
+        """Tenants ready to scan, starting from a rotating position"""
+        with self._lock:
+            if not self.tenants:
+                return []
+            start = self._cursor
+            self._cursor = (self._cursor + 1) % len(self.tenants)
+            ordered = self.tenants[start:] + self.tenants[:start]
+            due = [t for t in ordered if not t.running and t.next_due <= now]
+            for tenant in due:
+                tenant.running = True
+            return due
+
+    def scan_tenant(self, tenant: Tenant):
+        started = time.monotonic()
+        try:
+            tenant.last_scan = tenant.monitor.run_security_scan()
+            tenant.failures = 0
+        except Exception as e:
+            tenant.failures += 1
+            self.logger.error(f"Scan failed for tenant {tenant.tenant_id}: {e}")
+        finally:
+            with self._lock:
+                # Period is measured from scan start, so long scans do not drift
+                tenant.next_due = started + tenant.interval
+                tenant.running = False
+
+    def stop(self):
+        """Store and send every tenant's outstanding alerts"""
+        for tenant in self.tenants:
+            tenant.alert_pipeline.stop()
+            tenant.firewall.close()
+
+    def run_forever(self):
+        """Dispatch due tenant scans until interrupted"""
+        self.logger.info(f"Monitoring {len(self.tenants)} tenants with {self.max_workers} workers")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tenant') as executor:
+            while True:
+                for tenant in self.due_tenants(time.monotonic()):
+                    executor.submit(self.scan_tenant, tenant)
+                time.sleep(self.tick)
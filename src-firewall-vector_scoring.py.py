@@ -0,0 +1,151 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional; SecurityMonitor falls back to the per-campaign checks
+    np = None
+
+HAVE_NUMPY = np is not None
+
+
+def _number(insights: Optional[Dict], field: str, parse=float) -> Optional[float]:
+    if not insights or field not in insights:
+        return None
+    return parse(insights[field])
+
+
+class VectorScorer:
+    """Whole-account version of the SecurityMonitor check_* methods
+
+    Insights, window averages and z-score profiles for every campaign are
+    loaded once and compared as arrays. The thresholds, branch order and
+    alert messages are the same as the per-campaign checks, so both paths
+    produce the same alerts; only campaigns with a verdict are returned.
+    """
+
+    def __init__(self, monitor):
+        if not HAVE_NUMPY:
+            raise RuntimeError("Vectorized scoring requires numpy")
+        self.monitor = monitor
+        self.firewall = monitor.firewall
+        self.logger = logging.getLogger(self.firewall.logger_name('VectorScorer'))
+
+    def score(self, campaigns: List[Dict], snapshot) -> List[Dict]:
+        """Alerts to record, grouped by campaign in check order
+
+        Each verdict is {check, type, message, resource_id, severity,
+        pause_reason}; check names the per-campaign check it stands for
+        (spending, traffic or budget), and pause_reason is set when the
+        spending check would auto-pause.
+        """
+        thresholds = self.monitor.alert_thresholds
+        baselines = self.firewall.baselines
+        ids = [c['id'] for c in campaigns]
+        insights = [snapshot.get_insights(campaign_id) for campaign_id in ids]
+        when = datetime.now(timezone.utc)
+
+        spend_values = [_number(i, 'spend') for i in insights]
+        ctr_values = [_number(i, 'ctr') for i in insights]
+        click_values = [_number(i, 'clicks', int) for i in insights]
+        avg_spend = baselines.averages('daily_spend')
+        avg_ctr = baselines.averages('ctr')
+        spend_profiles = baselines.zscore_profiles('daily_spend', ids, when)
+        ctr_profiles = baselines.zscore_profiles('ctr', ids, when)
+
+        has_spend = np.array([v is not None for v in spend_values])
+        has_ctr = np.array([v is not None for v in ctr_values])
+        has_clicks = np.array([v is not None for v in click_values])
+        spend = np.array([v if v is not None else 0.0 for v in spend_values], dtype=float)
+        ctr = np.array([v if v is not None else 0.0 for v in ctr_values], dtype=float)
+        clicks = np.array([v if v is not None else 0 for v in click_values], dtype=np.int64)
+        budget = np.array([float(c.get('daily_budget', 0)) for c in campaigns], dtype=float)
+        spend_avg = np.array([avg_spend.get(i, 0.0) for i in ids], dtype=float)
+        ctr_avg = np.array([avg_ctr.get(i, 0.0) for i in ids], dtype=float)
+        spend_z, spend_z_ok = self._zscores(ids, spend, spend_profiles)
+        ctr_z, ctr_z_ok = self._zscores(ids, ctr, ctr_profiles)
+
+        # Spending: ratio rule first; the z-score only applies when it did not fire
+        spend_hist = has_spend & (spend_avg > 0)
+        spend_ratio = np.divide(spend, spend_avg, out=np.zeros_like(spend), where=spend_hist)
+        spike = spend_hist & (spend_ratio > thresholds['spend_spike'])
+        spend_outlier = has_spend & ~spike & spend_z_ok & (spend_z > thresholds.get('spend_zscore', 4.0))
+
+        # Traffic: same ratio-then-z-score order, only with a CTR history
+        ctr_hist = has_ctr & (ctr_avg > 0)
+        ctr_ratio = np.divide(ctr, ctr_avg, out=np.zeros_like(ctr), where=ctr_hist)
+        ctr_drop = ctr_hist & (ctr_ratio < thresholds['ctr_drop'])
+        ctr_outlier = ctr_hist & ~ctr_drop & ctr_z_ok & (ctr_z < -thresholds.get('ctr_zscore', 3.0))
+        click_flood = has_clicks & (clicks > thresholds['suspicious_clicks'])
+
+        budget_set = has_spend & (budget > 0)
+        budget_ratio = np.divide(spend, budget, out=np.zeros_like(spend), where=budget_set)
+        breach = budget_set & (budget_ratio > thresholds['budget_breach'])
+
+        flagged = np.flatnonzero(spike | spend_outlier | ctr_drop | ctr_outlier | click_flood | breach)
+        auto_pause = self.firewall.config['security']['auto_actions']['pause_campaign_critical']
+        verdicts = []
+        for i in flagged:
+            campaign_id = ids[i]
+            if spike[i]:
+                ratio = spend_values[i] / avg_spend[campaign_id]
+                verdicts.append(self._verdict(
+                    "spending", "SPENDING_SPIKE",
+                    f"Campaign spending {spend_values[i]} vs average {avg_spend[campaign_id]} (ratio: {ratio:.2f})",
+                    campaign_id, "HIGH" if ratio > 3.0 else "MEDIUM",
+                    f"Critical spending spike: {ratio:.2f}x normal" if ratio > 3.0 and auto_pause else None
+                ))
+            elif spend_outlier[i]:
+                verdicts.append(self._verdict(
+                    "spending", "SPENDING_SPIKE",
+                    f"Campaign spending {spend_values[i]} is {float(spend_z[i]):.1f} standard deviations above its baseline",
+                    campaign_id, "MEDIUM"
+                ))
+            if ctr_drop[i]:
+                verdicts.append(self._verdict(
+                    "traffic", "CTR_ANOMALY",
+                    f"CTR dropped to {ctr_values[i]} from average {avg_ctr[campaign_id]}",
+                    campaign_id, "MEDIUM"
+                ))
+            elif ctr_outlier[i]:
+                verdicts.append(self._verdict(
+                    "traffic", "CTR_ANOMALY",
+                    f"CTR {ctr_values[i]} is {-float(ctr_z[i]):.1f} standard deviations below its baseline",
+                    campaign_id, "MEDIUM"
+                ))
+            if click_flood[i]:
+                verdicts.append(self._verdict(
+                    "traffic", "HIGH_CLICK_VOLUME",
+                    f"Suspicious click volume: {click_values[i]} in last 24h",
+                    campaign_id, "MEDIUM"
+                ))
+            if breach[i]:
+                daily_budget = float(campaigns[i].get('daily_budget', 0))
+                verdicts.append(self._verdict(
+                    "budget", "BUDGET_BREACH",
+                    f"Campaign spent {spend_values[i]} vs daily budget {daily_budget} "
+                    f"(ratio: {spend_values[i] / daily_budget:.2f})",
+                    campaign_id, "HIGH"
+                ))
+        return verdicts
+
+    @staticmethod
+    def _zscores(ids: List[str], values, profiles: Dict):
+        """z-scores against each campaign's profile, and which ones exist"""
+        has_profile = np.array([i in profiles for i in ids])
+        mean = np.array([profiles[i][0] if i in profiles else 0.0 for i in ids], dtype=float)
+        var = np.array([profiles[i][1] if i in profiles else 1.0 for i in ids], dtype=float)
+        return (values - mean) / np.sqrt(var), has_profile
+
+    @staticmethod
+    def _verdict(check: str, alert_type: str, message: str, resource_id: str, severity: str,
+                 pause_reason: str = None) -> Dict:
+        return {
+            'check': check,
+            'type': alert_type,
+            'message': message,
+            'resource_id': resource_id,
+            'severity': severity,
+            'pause_reason': pause_reason
+        }
@@ -0,0 +1,107 @@
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+class _SpendRing:
+    """Last `size` (time, cumulative spend) samples of one campaign"""
+
+    __slots__ = ('times', 'spends', 'period', 'start', 'count')
+
+    def __init__(self, size: int, period: str):
+        self.times = array('d', bytes(8 * size))
+        self.spends = array('d', bytes(8 * size))
+        self.period = period
+        self.start = 0
+        self.count = 0
+
+    def append(self, when: float, spend: float):
+        size = len(self.times)
+        index = (self.start + self.count) % size
+        self.times[index] = when
+        self.spends[index] = spend
+        if self.count < size:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % size
+
+    def last(self) -> Tuple[float, float]:
+        index = (self.start + self.count - 1) % len(self.times)
+        return self.times[index], self.spends[index]
+
+    def rates(self) -> List[Tuple[float, float]]:
+        """(interval midpoint, spend per minute) between consecutive samples, oldest first"""
+        size = len(self.times)
+        rates = []
+        for k in range(1, self.count):
+            i, j = (self.start + k - 1) % size, (self.start + k) % size
+            minutes = (self.times[j] - self.times[i]) / 60
+            rate = (self.spends[j] - self.spends[i]) / minutes if minutes > 0 else 0.0
+            rates.append(((self.times[i] + self.times[j]) / 2, rate))
+        return rates
+
+
+class SpendVelocityTracker:
+    """Intraday spend rate per campaign from the deltas between scans
+
+    Insights only report a total over yesterday and today, so a hijack that
+    started minutes ago barely moves it. Each scan's total is kept in a
+    small ring buffer per campaign; the difference between the last two
+    samples is the current spend per minute, and the earlier intervals give
+    the campaign's usual rate to compare it with. The buffer restarts when
+    the insights window rolls over at midnight or the total goes backwards.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.samples = config.get('samples', 12)
+        self.min_sample_interval = config.get('min_sample_interval', 60)
+        self.min_intervals = config.get('min_intervals', 3)
+        # Usual rates below this are raised to it, so a campaign idling at
+        # almost nothing needs a real amount of spend to look like a spike
+        self.min_rate = config.get('min_rate_per_minute', 0.5)
+
+        self._lock = threading.Lock()
+        self._rings: Dict[str, _SpendRing] = {}
+
+    def observe(self, campaign_id: str, spend: float, period: str, when: float = None) -> Optional[Dict]:
+        """Add a scan's cumulative spend; returns the velocity once there is an interval
+
+        The result is {rate, usual_rate, ratio, acceleration} with rates in
+        spend per minute and acceleration in spend per minute per minute.
+        usual_rate and ratio are None until min_intervals earlier intervals
+        have been seen.
+        """
+        when = time.time() if when is None else when
+        with self._lock:
+            ring = self._rings.get(campaign_id)
+            if ring is not None and ring.count:
+                last_time, last_spend = ring.last()
+                if ring.period != period or spend < last_spend:
+                    ring = None
+                elif when - last_time < self.min_sample_interval:
+                    return None
+            if ring is None:
+                ring = self._rings[campaign_id] = _SpendRing(self.samples, period)
+            ring.append(when, spend)
+            rates = ring.rates()
+
+        if not rates:
+            return None
+        midpoint, rate = rates[-1]
+        earlier = sorted(r for _, r in rates[:-1])
+        usual_rate = ratio = None
+        # Even with min_intervals 0, the first rate has nothing to be compared with
+        if earlier and len(earlier) >= self.min_intervals:
+            usual_rate = earlier[len(earlier) // 2]
+            ratio = rate / max(usual_rate, self.min_rate)
+        acceleration = None
+        if len(rates) > 1:
+            minutes = (midpoint - rates[-2][0]) / 60
+            acceleration = (rate - rates[-2][1]) / minutes if minutes > 0 else 0.0
+        return {'rate': rate, 'usual_rate': usual_rate, 'ratio': ratio, 'acceleration': acceleration}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'campaigns': len(self._rings)}
@@ -0,0 +1,234 @@
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+_STOP = object()
+
+
+def sign_payload(body: bytes, app_secret: str) -> str:
+    """X-Hub-Signature-256 header value Meta sends with a webhook body"""
+    return 'sha256=' + hmac.new(app_secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body: bytes, header: Optional[str], app_secret: str) -> bool:
+    if not header or not header.startswith('sha256='):
+        return False
+    return hmac.compare_digest(sign_payload(body, app_secret), header)
+
+
+class WebhookReceiver:
+    """Local HTTP endpoint for Meta Marketing API webhook events
+
+    Answers the GET subscription handshake with the configured verify_token.
+    POSTed events must carry a valid X-Hub-Signature-256 for the app_secret.
+    Each event is acknowledged at once and its campaign queued. A worker
+    then checks just the affected campaigns, coalescing bursts of events
+    into one batch, so detection does not wait for the next polling pass.
+    """
+
+    def __init__(self, monitor, config: Dict = None):
+        config = config or {}
+        self.monitor = monitor
+        self.firewall = monitor.firewall
+        self.logger = logging.getLogger(self.firewall.logger_name('WebhookReceiver'))
+        self.app_secret = config.get('app_secret') or self.firewall.config['meta_api'].get('app_secret')
+        if not self.app_secret:
+            raise ValueError("Webhooks require meta_api.app_secret to verify event signatures")
+        self.verify_token = config.get('verify_token')
+        self.path = config.get('path', '/webhooks/meta')
+        self.max_body_bytes = config.get('max_body_bytes', 1048576)
+        self.coalesce_window = config.get('coalesce_window', 0.2)
+        self.account_id = str(self.firewall.config['meta_api']['ad_account_id']).replace('act_', '')
+
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.events_received = 0
+        self.events_rejected = 0
+        self.campaigns_checked = 0
+
+        self.httpd = ThreadingHTTPServer((config.get('host', '127.0.0.1'), config.get('port', 8080)),
+                                         self._handler_class())
+        self.httpd.daemon_threads = True
+        self._server_thread = None
+        self._worker = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self) -> "WebhookReceiver":
+        self._server_thread = threading.Thread(target=self.httpd.serve_forever, name='webhook-http', daemon=True)
+        self._server_thread.start()
+        self._worker = threading.Thread(target=self._run_worker, name='webhook-checks', daemon=True)
+        self._worker.start()
+        self.logger.info(f"Listening for Meta webhook events on {self.url}")
+        return self
+
+    def stop(self):
+        """Stop accepting events and finish checks already queued"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._queue.put(_STOP)
+        if self._worker is not None:
+            self._worker.join()
+
+    def verify_subscription(self, query: Dict[str, str]) -> Optional[str]:
+        """Challenge to echo for a valid subscription handshake, else None"""
+        if (query.get('hub.mode') == 'subscribe' and self.verify_token
+                and hmac.compare_digest(query.get('hub.verify_token', ''), str(self.verify_token))):
+            return query.get('hub.challenge', '')
+        return None
+
+    def affected_objects(self, payload: Dict) -> List[Dict]:
+        """Objects named by an event payload, for this account only
+
+        Ad account change events carry the object as {'id', 'level'} and
+        sometimes a campaign_id; campaign-level objects are their own campaign.
+        """
+        objects = []
+        for entry in payload.get('entry', []):
+            if str(entry.get('id', '')).replace('act_', '') != self.account_id:
+                continue
+            for change in entry.get('changes', []):
+                value = change.get('value')
+                if isinstance(value, dict):
+                    objects.append(value)
+        return objects
+
+    def handle_event(self, body: bytes, signature: Optional[str]) -> int:
+        """HTTP status for a POSTed event; valid events are queued for checking"""
+        if not verify_signature(body, signature, self.app_secret):
+            with self._lock:
+                self.events_rejected += 1
+            self.logger.warning("Rejected webhook event with a missing or invalid signature")
+            return 403
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400
+
+        received_at = time.monotonic()
+        with self._lock:
+            self.events_received += 1
+        for obj in self.affected_objects(payload):
+            self._queue.put((obj, received_at))
+        return 200
+
+    def _campaign_id(self, obj: Dict) -> Optional[str]:
+        if obj.get('campaign_id'):
+            return str(obj['campaign_id'])
+        if str(obj.get('level', 'CAMPAIGN')).upper() == 'CAMPAIGN':
+            return str(obj['id']) if obj.get('id') else None
+        # Ad sets and ads name only themselves; one lookup finds their campaign
+        return self.firewall.resolve_campaign_id(obj['id']) if obj.get('id') else None
+
+    def _run_worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            # Changes usually arrive in bursts (budget + status edits); check them together
+            deadline = time.monotonic() + self.coalesce_window
+            stopping = False
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._check(batch)
+            if stopping:
+                return
+
+    def _check(self, batch: List):
+        campaign_ids: Set[str] = set()
+        oldest = min(received_at for _, received_at in batch)
+        for obj, _ in batch:
+            campaign_id = self._campaign_id(obj)
+            if campaign_id:
+                campaign_ids.add(campaign_id)
+
+        # The event usually reports the very edit a cached copy would miss
+        campaigns = [c for c in (self.firewall.get_campaign(cid, fresh=True) for cid in sorted(campaign_ids)) if c]
+        if campaigns:
+            try:
+                self.monitor.scan_campaigns(campaigns)
+            except Exception as e:
+                self.logger.error(f"Webhook-triggered check failed: {e}")
+
+        with self._lock:
+            self.campaigns_checked += len(campaigns)
+            self._latencies.append(time.monotonic() - oldest)
+
+    def stats(self) -> Dict:
+        """Event counts and event-to-verdict latency"""
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                'events_received': self.events_received,
+                'events_rejected': self.events_rejected,
+                'campaigns_checked': self.campaigns_checked,
+                'pending': self._queue.qsize(),
+                'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_max': max(latencies) if latencies else 0.0
+            }
+
+    def _handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: str = ''):
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path != receiver.path:
+                    return self._reply(404)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                challenge = receiver.verify_subscription(query)
+                if challenge is None:
+                    return self._reply(403)
+                self._reply(200, challenge)
+
+            def do_POST(self):
+                if urlparse(self.path).path != receiver.path:
+                    return self._reply(404)
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    return self._reply(400)
+                # A negative length would make rfile.read() wait for the client to hang up
+                if length < 0:
+                    return self._reply(400)
+                if length > receiver.max_body_bytes:
+                    return self._reply(413)
+                body = self.rfile.read(length)
+                self._reply(receiver.handle_event(body, self.headers.get('X-Hub-Signature-256')))
+
+        return Handler
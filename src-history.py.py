@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Vortex Meta Ads Firewall - Alert and spend history
+
+Reads the firewall database without writing to it, so it can run while
+the firewall is scanning.
+
+  python src/history.py alerts [--resource ID] [--type T] [--severity S] [--since DATE] [--until DATE]
+  python src/history.py summary [--since DATE] [--until DATE]
+  python src/history.py spend [--resource ID] [--since DAY] [--until DAY]
+  python src/history.py serve [--port N]
+
+--format csv or json streams every matching row; the default table shows
+one page. --client NAME reads data/tenants/NAME.db.
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+from firewall.history import (ALERT_FIELDS, SPEND_FIELDS, AlertHistory, HistoryServer, csv_chunks,
+                              json_chunks)
+
+def load_settings():
+    """Database and history settings from the shared config, if present"""
+    config_path = Path('config/config.yaml')
+    if not config_path.exists():
+        return {}
+    with open(config_path, 'r') as f:
+        return yaml.safe_load(f) or {}
+
+def database_path(args, config) -> str:
+    if args.db:
+        return args.db
+    if args.client:
+        return f"data/tenants/{args.client}.db"
+    return config.get('firewall', {}).get('database_path', 'data/firewall.db')
+
+def print_table(rows, fields):
+    """Aligned columns for a terminal; long messages are cut"""
+    if not rows:
+        print("No matching rows")
+        return
+    cells = [[str(row.get(field, ''))[:80] for field in fields] for row in rows]
+    widths = [max(len(field), *(len(row[i]) for row in cells)) for i, field in enumerate(fields)]
+    print('  '.join(field.ljust(width) for field, width in zip(fields, widths)))
+    for row in cells:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+def export(rows, fields, output_format):
+    chunks = csv_chunks(rows, fields) if output_format == 'csv' else json_chunks(rows)
+    for chunk in chunks:
+        sys.stdout.write(chunk)
+
+def main():
+    parser = argparse.ArgumentParser(description="Vortex Firewall alert and spend history")
+    parser.add_argument('command', choices=['alerts', 'summary', 'spend', 'serve'])
+    parser.add_argument('--db', help="database file (default: firewall.database_path from config)")
+    parser.add_argument('--client', help="client name when running with --clients-dir")
+    parser.add_argument('--resource', help="campaign, ad set or ad id")
+    parser.add_argument('--type', help="alert type, e.g. SPENDING_SPIKE")
+    parser.add_argument('--severity', help="one severity or a comma-separated list")
+    parser.add_argument('--since', help="ISO date or time (UTC unless it has an offset)")
+    parser.add_argument('--until', help="ISO date or time; alerts before it are shown")
+    parser.add_argument('--limit', type=int, default=50, help="rows in table output")
+    parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table')
+    parser.add_argument('--host', help="serve: address to listen on")
+    parser.add_argument('--port', type=int, help="serve: port to listen on")
+    args = parser.parse_args()
+
+    config = load_settings()
+    storage_config = config.get('firewall', {}).get('storage', {})
+    db_path = database_path(args, config)
+    if not Path(db_path).exists():
+        print(f"❌ Database not found: {db_path}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'serve':
+        server_config = dict(config.get('history_api', {}))
+        server_config.update({k: v for k, v in (('host', args.host), ('port', args.port)) if v})
+        server = HistoryServer({args.client or 'default': db_path}, server_config, storage_config).start()
+        print(f"📜 Serving alert history for {db_path} on {server.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+        return
+
+    history = AlertHistory(db_path, storage_config)
+    try:
+        if args.command == 'summary':
+            print_table(history.summary(args.since, args.until, args.resource),
+                        ['alert_type', 'severity', 'count', 'last_seen'])
+        elif args.command == 'alerts':
+            filters = dict(resource_id=args.resource, alert_type=args.type, severity=args.severity,
+                           since=args.since, until=args.until)
+            if args.format == 'table':
+                print_table(history.alerts(limit=args.limit, **filters)['alerts'], ALERT_FIELDS)
+            else:
+                export(history.iter_alerts(**filters), ALERT_FIELDS, args.format)
+        else:
+            filters = dict(resource_id=args.resource, since=args.since, until=args.until)
+            if args.format == 'table':
+                print_table(history.spend(limit=args.limit, **filters)['spend'], SPEND_FIELDS)
+            else:
+                export(history.iter_spend(**filters), SPEND_FIELDS, args.format)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(2)
+    except sqlite3.Error as e:
+        print(f"❌ Could not read {db_path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        pass
+    finally:
+        history.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,34 +3,109 @@
 Vortex Meta Ads Firewall - Main Entry Point
 """
 
+import argparse
 import time
 import logging
+import sqlite3
 import yaml
 from pathlib import Path
 
 from firewall.core import VortexFirewall
 from firewall.monitor import SecurityMonitor
 from firewall.alerts import AlertSystem
+from firewall.alert_pipeline import AlertPipeline
+from api.metrics import configure_metrics
+
+def start_history_api(config, databases):
+    """Local read API over the alert databases, when enabled in config"""
+    history_config = config.get('history_api', {})
+    if not history_config.get('enabled', False):
+        return None
+    from firewall.history import HistoryServer
+    server = HistoryServer(databases, history_config, config['firewall'].get('storage')).start()
+    print(f"📜 Serving alert history on {server.url}")
+    return server
+
+def load_base_config():
+    """Load the shared firewall configuration"""
+    with open(Path('config/config.yaml'), 'r') as f:
+        return yaml.safe_load(f)
 
 def load_config():
     """Load configuration from YAML files"""
-    config_path = Path('config/config.yaml')
     client_config_path = Path('config/client_config.yaml')
     
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+    config = load_base_config()
     
     with open(client_config_path, 'r') as f:
         client_config = yaml.safe_load(f)
     
     # Merge configurations
     config.update(client_config)
+    config['client_config_path'] = str(client_config_path)
     return config
 
+def run_multi_tenant(clients_dir: Path):
+    """Monitor every client config in clients_dir from this process"""
+    from firewall.tenants import TenantManager
+    
+    try:
+        base_config = load_base_config()
+    except Exception as e:
+        print(f"❌ Failed to load configuration: {e}")
+        return
+    
+    try:
+        metrics_server = configure_metrics(base_config.get('metrics'))
+    except OSError as e:
+        print(f"❌ Metrics endpoint failed to start: {e}")
+        return
+    manager = TenantManager(base_config, clients_dir)
+    if not manager.tenants:
+        print(f"❌ No client configs found in {clients_dir}")
+        if metrics_server is not None:
+            metrics_server.stop()
+        return
+    
+    print(f"✅ Loaded {len(manager.tenants)} client accounts from {clients_dir}")
+    if metrics_server is not None:
+        print(f"📈 Serving metrics on {metrics_server.url}")
+    try:
+        history_server = start_history_api(base_config, {
+            tenant.tenant_id: tenant.firewall.config['firewall']['database_path'] for tenant in manager.tenants
+        })
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ History API failed to start: {e}")
+        manager.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        return
+    print("🔄 Starting continuous monitoring...")
+    
+    try:
+        manager.run_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Vortex Firewall stopped by user")
+    finally:
+        manager.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if history_server is not None:
+            history_server.stop()
+
 def main():
     """Main application loop"""
     print("🛡️  Starting Vortex Meta Ads Firewall...")
     
+    parser = argparse.ArgumentParser(description="Vortex Meta Ads Firewall")
+    parser.add_argument('--clients-dir', type=Path,
+                        help="Monitor every client YAML in this directory from one process")
+    args = parser.parse_args()
+    
+    if args.clients_dir:
+        run_multi_tenant(args.clients_dir)
+        return
+    
     # Load configuration
     try:
         config = load_config()
@@ -39,39 +114,87 @@ def main():
         return
     
     # Initialize components
+    try:
+        metrics_server = configure_metrics(config.get('metrics'))
+    except OSError as e:
+        print(f"❌ Metrics endpoint failed to start: {e}")
+        return
     firewall = VortexFirewall(config)
     monitor = SecurityMonitor(firewall)
     alert_system = AlertSystem(config)
+    alert_pipeline = AlertPipeline(firewall, alert_system, config['alerts'].get('pipeline'))
+    firewall.attach_alert_pipeline(alert_pipeline)
     
-    # Test Meta API connection
-    from api.meta_api import MetaAPI
-    api = MetaAPI(
-        config['meta_api']['access_token'],
-        config['meta_api']['ad_account_id']
-    )
-    
-    if not api.test_connection():
-        print("❌ Meta API connection failed. Please check your credentials.")
-        return
-    
-    print("✅ Vortex Firewall initialized successfully!")
-    print(f"📊 Monitoring interval: {config['firewall']['monitoring_interval']} seconds")
-    print("🔄 Starting continuous monitoring...")
-    
-    # Main monitoring loop
-    monitoring_interval = config['firewall']['monitoring_interval']
+    history_server = None
+    receiver = None
     
+    # The writer, alert pipeline and metrics server are running; every exit below stops them
     try:
-        while True:
-            monitor.run_security_scan()
-            print(f"✅ Security scan completed at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-            time.sleep(monitoring_interval)
-            
+        # Test Meta API connection
+        from api.meta_api import MetaAPI
+        api = MetaAPI(
+            config['meta_api']['access_token'],
+            config['meta_api']['ad_account_id'],
+            session=firewall.http,
+            cache=firewall.response_cache
+        )
+        
+        if not api.test_connection():
+            print("❌ Meta API connection failed. Please check your credentials.")
+            return
+        
+        try:
+            history_server = start_history_api(config, {
+                'default': config['firewall'].get('database_path', 'data/firewall.db')
+            })
+        except (OSError, sqlite3.Error) as e:
+            print(f"❌ History API failed to start: {e}")
+            return
+        
+        if config.get('webhooks', {}).get('enabled', False):
+            from firewall.webhooks import WebhookReceiver
+            try:
+                receiver = WebhookReceiver(monitor, config['webhooks']).start()
+            except (ValueError, OSError) as e:
+                print(f"❌ Webhook receiver failed to start: {e}")
+                return
+            print(f"📨 Receiving Meta webhook events on {receiver.url}")
+        if metrics_server is not None:
+            print(f"📈 Serving metrics on {metrics_server.url}")
+        
+        print("✅ Vortex Firewall initialized successfully!")
+        print(f"📊 Monitoring interval: {config['firewall']['monitoring_interval']} seconds")
+        print("🔄 Starting continuous monitoring...")
+        
+        # Main monitoring loop
+        monitoring_interval = config['firewall']['monitoring_interval']
+        scheduling = config['firewall'].get('scheduling', {})
+        
+        if scheduling.get('mode', 'adaptive') == 'adaptive':
+            from firewall.scan_scheduler import CampaignScanScheduler
+            CampaignScanScheduler(monitor, scheduling).run_forever()
+        else:
+            while True:
+                started = time.monotonic()
+                monitor.run_security_scan()
+                print(f"✅ Security scan completed at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+                # Period is measured from scan start, so long scans do not drift
+                time.sleep(max(monitoring_interval - (time.monotonic() - started), 0))
+        
     except KeyboardInterrupt:
         print("\n🛑 Vortex Firewall stopped by user")
     except Exception as e:
         print(f"❌ Vortex Firewall crashed: {e}")
         logging.error(f"Firewall crash: {e}")
+    finally:
+        if receiver is not None:
+            receiver.stop()
+        alert_pipeline.stop()
+        firewall.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if history_server is not None:
+            history_server.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file